@@ -0,0 +1,26 @@
+"""
+Agents
+Process-wide instances of the stateless agents
+
+RecommendationAgent and OrderHandlerAgent keep nothing between calls but
+their model name and Ollama client (thread-safe, with a keep-alive
+connection pool), so every session can share one per model.
+ConversationAgent records turn history, so each session builds its own.
+"""
+
+import threading
+
+_AGENTS = {}
+_AGENTS_LOCK = threading.Lock()
+
+
+def get_shared_agent(cls, model_name=None):
+    """The process-wide cls(model_name), built on first use"""
+    key = (cls, model_name)
+    agent = _AGENTS.get(key)
+    if agent is None:
+        with _AGENTS_LOCK:
+            agent = _AGENTS.get(key)
+            if agent is None:
+                agent = _AGENTS[key] = cls(model_name=model_name)
+    return agent
@@ -1,84 +1,234 @@
-import ollama
-import json
-from prompts.conversation_prompt import CONVERSATION_AGENT_PROMPT
+import logging
+from collections import deque
+from prompts.conversation_prompt import CONVERSATION_AGENT_PROMPT, CONVERSATION_AGENT_SCHEMA
+from utils import fastjson
+from utils.history_eviction import evict_history
+from utils.llm_cache import llm_cache, make_key
+from utils.llm_json import parse_llm_json
+from utils.ollama_batcher import get_batcher
+from utils.ollama_client import make_client, resolve_model
+from utils.prompt_template import CompiledPrompt
+
+logger = logging.getLogger(__name__)
+
+# Ollama options - num_ctx fits the ~2k-token prompt plus history, and the intent
+# JSON is short. A tight context leaves KV-cache room for more parallel slots.
+_OPTIONS = {
+    "temperature": 0.3,  # Lower temperature for consistent JSON
+    "top_p": 0.9,
+    "num_ctx": 3072,
+    "num_predict": 256,
+    "num_batch": 512,
+}
+
+# Parsed once at import; render() is .format() without re-parsing
+_PROMPT = CompiledPrompt(CONVERSATION_AGENT_PROMPT)
+
+# Turns kept in the agent's own log (callers pass the history they prompt with)
+HISTORY_MAX_TURNS = 10
+
+# Raw messages prompted alongside the session summary - the summary carries
+# what was asked for earlier, so two verbatim turns are enough
+RECENT_MESSAGES = 4
+# extracted_info fields accumulated into the session summary
+_LIST_FIELDS = ("cuisine_preference", "dietary_restrictions", "special_requirements")
+_SCALAR_FIELDS = ("spice_level", "price_range", "meal_type")
+_MAX_VALUES = 8
 
 class ConversationAgent:
-    def __init__(self, model_name="mistral:latest"):
-        self.model_name = model_name
-        self.conversation_history = []
-    
+    DEFAULT_MODEL = "mistral:latest"
+
+    def __init__(self, model_name=None):
+        self.model_name = resolve_model(model_name, self.DEFAULT_MODEL)
+        self.conversation_history = deque(maxlen=HISTORY_MAX_TURNS)
+        # Serialization memos - preferences rarely change and history messages
+        # never do, so each is dumped once instead of on every turn
+        self._prefs_cache = (None, "{}")
+        self._hist_frags = {}
+        # Running extracted_info for the session, prompted as one system
+        # message (rebuilt only when a turn adds something)
+        self._session_info = {}
+        self._summary_message = None
+        # One client per agent, reused across turns so the HTTP connection
+        # (and TLS session) is not rebuilt on every call. Async calls go
+        # through the shared batcher instead.
+        self._client = make_client()
+
     def process(self, user_input, user_preferences=None, conversation_history=None):
         """
         Process user input and classify intent
-        
+
         Args:
             user_input: User's message
             user_preferences: Dict of user preferences (optional)
             conversation_history: List of previous messages (optional)
-        
+
         Returns:
             dict: Structured response with intent and routing info
         """
-        if user_preferences is None:
-            user_preferences = {}
-        if conversation_history is None:
-            conversation_history = []
-        
-        # Format the prompt
-        prompt = CONVERSATION_AGENT_PROMPT.format(
-            user_input=user_input,
-            conversation_history=json.dumps(conversation_history[-5:]),  # Last 5 messages
-            user_preferences=json.dumps(user_preferences)
-        )
-        
+        cache_key = self._cache_key(user_input, user_preferences, conversation_history)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            self._remember(user_input, cached)
+            return cached
+
+        prompt = self._build_prompt(user_input, user_preferences, conversation_history)
         try:
             # Call Ollama
-            response = ollama.generate(
+            response = self._client.generate(
+                model=self.model_name,
+                prompt=prompt,
+                options=_OPTIONS,
+                format=CONVERSATION_AGENT_SCHEMA
+            )
+            result = self._parse_response(user_input, response['response'])
+            llm_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            logger.error("Ollama request failed: %s", e)
+            return {
+                "intent": "error",
+                "user_query": user_input,
+                "error": str(e)
+            }
+
+    async def aprocess(self, user_input, user_preferences=None, conversation_history=None):
+        """
+        Async version of process() - lets callers asyncio.gather() several
+        agent calls so their LLM latencies overlap instead of adding up
+        """
+        cache_key = self._cache_key(user_input, user_preferences, conversation_history)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            self._remember(user_input, cached)
+            return cached
+
+        prompt = self._build_prompt(user_input, user_preferences, conversation_history)
+        try:
+            response = await get_batcher().submit(
                 model=self.model_name,
                 prompt=prompt,
-                options={
-                    "temperature": 0.3,  # Lower temperature for consistent JSON
-                    "top_p": 0.9,
-                }
+                options=_OPTIONS,
+                format=CONVERSATION_AGENT_SCHEMA
             )
-            
-            # Extract response text
-            response_text = response['response']
-            
-            # Try to parse JSON
-            try:
-                # Find JSON in response (sometimes model adds extra text)
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = response_text[json_start:json_end]
-                    result = json.loads(json_str)
-                else:
-                    result = json.loads(response_text)
-                
-                # Store in history
-                self.conversation_history.append({
-                    "user": user_input,
-                    "agent": result.get("conversational_response", "")
-                })
-                
-                return result
-            
-            except json.JSONDecodeError as e:
-                print(f"JSON Parse Error: {e}")
-                print(f"Response: {response_text}")
-                # Return fallback
-                return {
-                    "intent": "error",
-                    "user_query": user_input,
-                    "error": "Failed to parse response",
-                    "raw_response": response_text
-                }
-        
+            result = self._parse_response(user_input, response['response'])
+            llm_cache.put(cache_key, result)
+            return result
+
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Ollama request failed: %s", e)
             return {
                 "intent": "error",
                 "user_query": user_input,
                 "error": str(e)
             }
+
+    def _cache_key(self, user_input, user_preferences, conversation_history):
+        """
+        Cache key for a turn - keyed on the new message and the one before it
+        rather than the whole history, so repeated phrasings still hit
+        """
+        last_message = conversation_history[-1] if conversation_history else None
+        return make_key(
+            self.model_name, _OPTIONS["temperature"], user_input,
+            fastjson.dumps(last_message, sort_keys=True),
+            self._prefs_json(user_preferences)
+        )
+
+    def _build_prompt(self, user_input, user_preferences, conversation_history):
+        """Format the prompt for a single turn"""
+        if conversation_history is None:
+            conversation_history = []
+
+        return _PROMPT.render(
+            user_input=user_input,
+            conversation_history=self._history_json(self._with_summary(conversation_history)),
+            user_preferences=self._prefs_json(user_preferences)
+        )
+
+    def _with_summary(self, conversation_history):
+        """Evicted history, led by the session summary once there is one"""
+        if self._summary_message is None:
+            return evict_history(conversation_history)
+        return [self._summary_message] + evict_history(conversation_history, window=RECENT_MESSAGES)
+
+    def _prefs_json(self, user_preferences):
+        """JSON for user_preferences, re-serialized only when a different dict is passed"""
+        if not user_preferences:
+            return "{}"
+        cached_prefs, cached_json = self._prefs_cache
+        if cached_prefs is user_preferences:
+            return cached_json
+        prefs_json = fastjson.dumps(user_preferences)
+        self._prefs_cache = (user_preferences, prefs_json)
+        return prefs_json
+
+    def _history_json(self, messages):
+        """JSON array of messages, reusing each message's fragment from earlier turns"""
+        frags = {}
+        parts = []
+        for message in messages:
+            entry = self._hist_frags.get(id(message))
+            if entry is None or entry[0] is not message:
+                entry = (message, fastjson.dumps(message))
+            frags[id(message)] = entry
+            parts.append(entry[1])
+        # Only the current window is kept, so the memo stays bounded
+        self._hist_frags = frags
+        return "[" + ",".join(parts) + "]"
+
+    def _parse_response(self, user_input, response_text):
+        """Parse the model output into a result dict"""
+        try:
+            # Tolerates prose around the JSON and truncated/malformed objects
+            result = parse_llm_json(response_text)
+
+            self._remember(user_input, result)
+            return result
+
+        except ValueError as e:
+            logger.warning("JSON parse error: %s", e)
+            logger.debug("Response: %s", response_text)
+            # Return fallback
+            return {
+                "intent": "error",
+                "user_query": user_input,
+                "error": "Failed to parse response",
+                "raw_response": response_text
+            }
+
+    def _remember(self, user_input, result):
+        """Store the turn in history"""
+        self.conversation_history.append({
+            "user": user_input,
+            "agent": result.get("conversational_response", "")
+        })
+        self._accumulate(result.get("extracted_info"))
+
+    def _accumulate(self, extracted_info):
+        """Fold a turn's extracted_info into the session summary"""
+        if not isinstance(extracted_info, dict):
+            return
+        info = self._session_info
+        changed = False
+        for field in _LIST_FIELDS:
+            values = extracted_info.get(field)
+            if not isinstance(values, list):
+                continue
+            known = info.setdefault(field, [])
+            for value in values:
+                if value and value not in known:
+                    known.append(value)
+                    changed = True
+            del known[:-_MAX_VALUES]
+        for field in _SCALAR_FIELDS:
+            value = extracted_info.get(field)
+            if value and info.get(field) != value:
+                info[field] = value
+                changed = True
+        if changed:
+            self._summary_message = {
+                "role": "system",
+                "content": "Session so far: " + fastjson.dumps({k: v for k, v in info.items() if v})
+            }
@@ -1,73 +1,133 @@
-import ollama
-import json
-from prompts.order_handler_prompt import ORDER_EXPLANATION_AGENT_PROMPT
+import logging
+from prompts.order_handler_prompt import ORDER_EXPLANATION_AGENT_PROMPT, ORDER_EXPLANATION_AGENT_SCHEMA
+from utils import fastjson
+from utils.llm_cache import llm_cache, make_key
+from utils.llm_json import parse_llm_json
+from utils.ollama_batcher import get_batcher
+from utils.ollama_client import make_client, resolve_model
+from utils.prompt_template import CompiledPrompt
+
+logger = logging.getLogger(__name__)
+
+# Ollama options - num_ctx fits the ~1.2k-token prompt plus cart and request data
+_OPTIONS = {
+    "temperature": 0.3,
+    "top_p": 0.9,
+    "num_ctx": 2048,
+    "num_predict": 384,
+    "num_batch": 512,
+}
+
+# Parsed once at import; render() is .format() without re-parsing
+_PROMPT = CompiledPrompt(ORDER_EXPLANATION_AGENT_PROMPT)
 
 class OrderHandlerAgent:
-    def __init__(self, model_name="llama3:latest"):
-        self.model_name = model_name
-    
+    DEFAULT_MODEL = "llama3:latest"
+
+    def __init__(self, model_name=None):
+        self.model_name = resolve_model(model_name, self.DEFAULT_MODEL)
+        # One client per agent, reused across turns so the HTTP connection
+        # (and TLS session) is not rebuilt on every call. Async calls go
+        # through the shared batcher instead.
+        self._client = make_client()
+
     def process(self, request_type, request_data, current_cart=None, user_dietary_info=None):
         """
         Handle order processing or provide explanations
-        
+
         Args:
             request_type: Type of request (order_processing, explanation, etc.)
             request_data: Data for the request
             current_cart: Current cart state
             user_dietary_info: User dietary information
-        
+
         Returns:
             dict: Structured response
         """
+        cache_key = self._cache_key(request_type, request_data, current_cart, user_dietary_info)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_prompt(request_type, request_data, current_cart, user_dietary_info)
+        try:
+            response = self._client.generate(
+                model=self.model_name,
+                prompt=prompt,
+                options=_OPTIONS,
+                format=ORDER_EXPLANATION_AGENT_SCHEMA
+            )
+            result = self._parse_response(response['response'])
+            llm_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            logger.error("Ollama request failed: %s", e)
+            return {
+                "action": "error",
+                "error": str(e)
+            }
+
+    async def aprocess(self, request_type, request_data, current_cart=None, user_dietary_info=None):
+        """Async version of process() for concurrent agent dispatch"""
+        cache_key = self._cache_key(request_type, request_data, current_cart, user_dietary_info)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_prompt(request_type, request_data, current_cart, user_dietary_info)
+        try:
+            response = await get_batcher().submit(
+                model=self.model_name,
+                prompt=prompt,
+                options=_OPTIONS,
+                format=ORDER_EXPLANATION_AGENT_SCHEMA
+            )
+            result = self._parse_response(response['response'])
+            llm_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            logger.error("Ollama request failed: %s", e)
+            return {
+                "action": "error",
+                "error": str(e)
+            }
+
+    def _cache_key(self, request_type, request_data, current_cart, user_dietary_info):
+        """Cache key from the prompt inputs, so a hit skips rendering"""
+        return make_key(
+            self.model_name, _OPTIONS["temperature"], request_type,
+            fastjson.dumps([request_data, current_cart or [], user_dietary_info or {}])
+        )
+
+    def _build_prompt(self, request_type, request_data, current_cart, user_dietary_info):
+        """Format the prompt for a single request"""
         if current_cart is None:
             current_cart = []
         if user_dietary_info is None:
             user_dietary_info = {}
-        
-        # Format prompt
-        prompt = ORDER_EXPLANATION_AGENT_PROMPT.format(
+
+        return _PROMPT.render(
             request_type=request_type,
-            request_data=json.dumps(request_data),
-            current_cart=json.dumps(current_cart),
-            user_dietary_info=json.dumps(user_dietary_info)
+            request_data=fastjson.dumps(request_data),
+            current_cart=fastjson.dumps(current_cart),
+            user_dietary_info=fastjson.dumps(user_dietary_info)
         )
-        
+
+    def _parse_response(self, response_text):
+        """Parse the model output into a result dict"""
         try:
-            response = ollama.generate(
-                model=self.model_name,
-                prompt=prompt,
-                options={
-                    "temperature": 0.3,
-                    "top_p": 0.9,
-                }
-            )
-            
-            response_text = response['response']
-            
-            # Parse JSON
-            try:
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = response_text[json_start:json_end]
-                    result = json.loads(json_str)
-                else:
-                    result = json.loads(response_text)
-                
-                return result
-            
-            except json.JSONDecodeError as e:
-                print(f"JSON Parse Error: {e}")
-                print(f"Response: {response_text}")
-                return {
-                    "action": "error",
-                    "error": "Failed to parse response",
-                    "raw_response": response_text
-                }
-        
-        except Exception as e:
-            print(f"Error: {e}")
+            # Tolerates prose around the JSON and truncated/malformed objects
+            result = parse_llm_json(response_text)
+
+            return result
+
+        except ValueError as e:
+            logger.warning("JSON parse error: %s", e)
+            logger.debug("Response: %s", response_text)
             return {
                 "action": "error",
-                "error": str(e)
-            }
\ No newline at end of file
+                "error": "Failed to parse response",
+                "raw_response": response_text
+            }
@@ -1,16 +1,44 @@
-import ollama
-import json
-from prompts.recommendation_prompt import RECOMMENDATION_AGENT_PROMPT
+import logging
+from prompts.recommendation_prompt import (RECOMMENDATION_AGENT_PROMPT, RECOMMENDATION_AGENT_SCHEMA,
+                                          candidate_menu)
+from utils import fastjson
+from utils.json_stream import StreamingJsonParser
+from utils.llm_cache import llm_cache, make_key
+from utils.llm_json import parse_llm_json
+from utils.ollama_batcher import get_batcher
+from utils.ollama_client import make_client, resolve_model
+from utils.prompt_template import CompiledPrompt
+
+logger = logging.getLogger(__name__)
+
+# Ollama options - num_ctx fits the ~2k-token prompt (with its menu) plus
+# preferences and past orders; num_predict leaves room for 5 recommendations
+_OPTIONS = {
+    "temperature": 0.5,
+    "top_p": 0.9,
+    "num_ctx": 4096,
+    "num_predict": 768,
+    "num_batch": 512,
+}
+
+# Parsed once at import; render() is .format() without re-parsing
+_PROMPT = CompiledPrompt(RECOMMENDATION_AGENT_PROMPT)
 
 class RecommendationAgent:
-    def __init__(self, model_name="qwen2.5:latest"):
-        self.model_name = model_name
-    
-    def recommend(self, user_request, user_preferences=None, dietary_restrictions=None, 
+    DEFAULT_MODEL = "qwen2.5:latest"
+
+    def __init__(self, model_name=None):
+        self.model_name = resolve_model(model_name, self.DEFAULT_MODEL)
+        # One client per agent, reused across turns so the HTTP connection
+        # (and TLS session) is not rebuilt on every call. Async calls go
+        # through the shared batcher instead.
+        self._client = make_client()
+
+    def recommend(self, user_request, user_preferences=None, dietary_restrictions=None,
                   past_orders=None, spice_level="", price_range=""):
         """
         Generate personalized recommendations
-        
+
         Args:
             user_request: User's request/query
             user_preferences: Dict of preferences
@@ -18,63 +46,158 @@ class RecommendationAgent:
             past_orders: List of past orders
             spice_level: Desired spice level
             price_range: Budget preference
-        
+
         Returns:
             dict: Structured recommendations
         """
+        cache_key = self._cache_key(user_request, user_preferences, dietary_restrictions,
+                                    past_orders, spice_level, price_range)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_prompt(user_request, user_preferences, dietary_restrictions,
+                                    past_orders, spice_level, price_range)
+        try:
+            response = self._client.generate(
+                model=self.model_name,
+                prompt=prompt,
+                options=_OPTIONS,
+                format=RECOMMENDATION_AGENT_SCHEMA
+            )
+            result = self._parse_response(response['response'])
+            llm_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            logger.error("Ollama request failed: %s", e)
+            return {
+                "recommendations": [],
+                "error": str(e)
+            }
+
+    async def arecommend(self, user_request, user_preferences=None, dietary_restrictions=None,
+                         past_orders=None, spice_level="", price_range=""):
+        """Async version of recommend() for concurrent agent dispatch"""
+        cache_key = self._cache_key(user_request, user_preferences, dietary_restrictions,
+                                    past_orders, spice_level, price_range)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_prompt(user_request, user_preferences, dietary_restrictions,
+                                    past_orders, spice_level, price_range)
+        try:
+            response = await get_batcher().submit(
+                model=self.model_name,
+                prompt=prompt,
+                options=_OPTIONS,
+                format=RECOMMENDATION_AGENT_SCHEMA
+            )
+            result = self._parse_response(response['response'])
+            llm_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            logger.error("Ollama request failed: %s", e)
+            return {
+                "recommendations": [],
+                "error": str(e)
+            }
+
+    def stream_recommend(self, user_request, user_preferences=None, dietary_restrictions=None,
+                         past_orders=None, spice_level="", price_range=""):
+        """
+        Streaming version of recommend()
+
+        Yields events as the model writes them:
+            {"type": "recommendation", "item": {...}}  - one per completed item
+            {"type": "done", "result": {...}}          - full parsed response
+        """
+        cache_key = self._cache_key(user_request, user_preferences, dietary_restrictions,
+                                    past_orders, spice_level, price_range)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            for item in cached.get("recommendations", []):
+                yield {"type": "recommendation", "item": item}
+            yield {"type": "done", "result": cached}
+            return
+
+        prompt = self._build_prompt(user_request, user_preferences, dietary_restrictions,
+                                    past_orders, spice_level, price_range)
+        parser = StreamingJsonParser("recommendations")
+
+        try:
+            for chunk in self._client.generate(
+                model=self.model_name,
+                prompt=prompt,
+                options=_OPTIONS,
+                format=RECOMMENDATION_AGENT_SCHEMA,
+                stream=True
+            ):
+                for item in parser.consume(chunk['response']):
+                    yield {"type": "recommendation", "item": item}
+
+            result = self._parse_response(parser.text)
+            llm_cache.put(cache_key, result)
+            yield {"type": "done", "result": result}
+
+        except Exception as e:
+            logger.error("Ollama request failed: %s", e)
+            yield {
+                "type": "done",
+                "result": {
+                    "recommendations": [],
+                    "error": str(e)
+                }
+            }
+
+    def _cache_key(self, user_request, user_preferences, dietary_restrictions,
+                   past_orders, spice_level, price_range):
+        """
+        Cache key from the prompt inputs (the prompt is a pure function of
+        them), so a hit skips shortlisting the menu and rendering
+        """
+        return make_key(
+            self.model_name, _OPTIONS["temperature"], user_request,
+            fastjson.dumps([user_preferences or {}, dietary_restrictions or [], past_orders or []]),
+            spice_level, price_range
+        )
+
+    def _build_prompt(self, user_request, user_preferences, dietary_restrictions,
+                      past_orders, spice_level, price_range):
+        """Format the prompt for a single request"""
         if user_preferences is None:
             user_preferences = {}
         if dietary_restrictions is None:
             dietary_restrictions = []
         if past_orders is None:
             past_orders = []
-        
-        # Format prompt
-        prompt = RECOMMENDATION_AGENT_PROMPT.format(
+
+        return _PROMPT.render(
+            # Menu items filtered by the hard constraints; the model only ranks these
+            candidate_menu=candidate_menu(dietary_restrictions, spice_level, price_range),
             user_request=user_request,
-            user_preferences=json.dumps(user_preferences),
-            dietary_restrictions=json.dumps(dietary_restrictions),
-            past_orders=json.dumps(past_orders),
+            user_preferences=fastjson.dumps(user_preferences),
+            dietary_restrictions=fastjson.dumps(dietary_restrictions),
+            past_orders=fastjson.dumps(past_orders),
             spice_level=spice_level,
             price_range=price_range
         )
-        
+
+    def _parse_response(self, response_text):
+        """Parse the model output into a result dict"""
         try:
-            response = ollama.generate(
-                model=self.model_name,
-                prompt=prompt,
-                options={
-                    "temperature": 0.5,
-                    "top_p": 0.9,
-                }
-            )
-            
-            response_text = response['response']
-            
-            # Parse JSON
-            try:
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = response_text[json_start:json_end]
-                    result = json.loads(json_str)
-                else:
-                    result = json.loads(response_text)
-                
-                return result
-            
-            except json.JSONDecodeError as e:
-                print(f"JSON Parse Error: {e}")
-                print(f"Response: {response_text}")
-                return {
-                    "recommendations": [],
-                    "error": "Failed to parse recommendations",
-                    "raw_response": response_text
-                }
-        
-        except Exception as e:
-            print(f"Error: {e}")
+            # Tolerates prose around the JSON and truncated/malformed objects
+            result = parse_llm_json(response_text)
+
+            return result
+
+        except ValueError as e:
+            logger.warning("JSON parse error: %s", e)
+            logger.debug("Response: %s", response_text)
             return {
                 "recommendations": [],
-                "error": str(e)
-            }
\ No newline at end of file
+                "error": "Failed to parse recommendations",
+                "raw_response": response_text
+            }
@@ -1,21 +1,44 @@
 """
-Flask Backend for Agentic Food Ordering System
+FastAPI Backend for Agentic Food Ordering System
 
 This backend integrates with your existing orchestrators (LangChain/Gemini)
 and provides REST API endpoints for the web frontend.
 
+Runs on an ASGI stack (FastAPI + uvicorn) so a slow LLM turn does not hold
+the whole server: blocking orchestrator work is pushed to the threadpool and
+the event loop keeps accepting requests.
+
 Installation:
-pip install flask flask-cors
+pip install fastapi uvicorn
 
 Usage:
 python backend_server.py
+(or: uvicorn backend_server:app --port 5000)
+
+Sessions: set REDIS_URL to share session metadata between workers (see
+session_store.py). Without it sessions live in process memory, so run a
+single worker. A session picked up by a different worker gets a fresh
+orchestrator, so its in-progress cart does not follow it.
 """
 
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import uvicorn
+import asyncio
+import logging
+import os
 import uuid
 import sys
-import traceback
+
+from session_store import SessionStore
+from utils import fastjson
+from utils.logging_setup import setup_logging
+from utils.ollama_client import resolve_model, warmup_models
+
+setup_logging()
+logger = logging.getLogger("backend_server")
 
 # Import your existing orchestrators
 try:
@@ -23,25 +46,46 @@ try:
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
-    print("⚠️ Gemini orchestrator not available")
+    logger.warning("Gemini orchestrator not available")
 
 try:
     from langchain_orchestrator import LangChainOrchestrator
     LANGCHAIN_AVAILABLE = True
 except ImportError:
     LANGCHAIN_AVAILABLE = False
-    print("⚠️ LangChain orchestrator not available")
+    logger.warning("LangChain orchestrator not available")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (stdlib json when it isn't installed)"""
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+    def render(self, content) -> bytes:
+        return fastjson.dumps_bytes(content)
+
+
+app = FastAPI(title="Agentic Food Ordering Backend", default_response_class=FastJSONResponse)
+app.add_middleware(
+    CORSMiddleware,  # Enable CORS for all routes
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
-# Session storage (in production, use Redis or database)
-sessions = {}
 
 # ============================================
 # HELPER FUNCTIONS
 # ============================================
 
+def configured_models():
+    """Distinct Ollama models the agents will use (after LLM_MODEL override)"""
+    from agents.conversation_agent import ConversationAgent
+    from agents.order_handler_agent import OrderHandlerAgent
+    from agents.recommendation_agent import RecommendationAgent
+
+    return sorted({
+        resolve_model(None, agent_class.DEFAULT_MODEL)
+        for agent_class in (ConversationAgent, OrderHandlerAgent, RecommendationAgent)
+    })
+
 def get_orchestrator(orchestrator_type: str, user_id: int):
     """Create orchestrator instance"""
     if orchestrator_type.lower() == "gemini" and GEMINI_AVAILABLE:
@@ -51,48 +95,61 @@ def get_orchestrator(orchestrator_type: str, user_id: int):
     else:
         raise ValueError(f"Orchestrator type '{orchestrator_type}' not available")
 
+async def process_message(orchestrator, message: str) -> dict:
+    """Run a turn - awaited when the orchestrator is async, else in the threadpool"""
+    if hasattr(orchestrator, 'aprocess_user_input'):
+        return await orchestrator.aprocess_user_input(message)
+    return await run_in_threadpool(orchestrator.process_user_input, message)
+
+# Session storage - Redis when REDIS_URL is set, process memory otherwise
+session_store = SessionStore(factory=get_orchestrator)
+
 # ============================================
 # API ENDPOINTS
 # ============================================
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
+@app.get('/api/health')
+async def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return {
         'status': 'ok',
         'gemini_available': GEMINI_AVAILABLE,
         'langchain_available': LANGCHAIN_AVAILABLE
-    })
+    }
 
-@app.route('/api/init', methods=['POST'])
-def initialize_session():
+@app.post('/api/init')
+async def initialize_session(request: Request):
     """Initialize a new session"""
     try:
-        data = request.json
+        data = await request.json()
         user_id = data.get('user_id', 3)
         orchestrator_type = data.get('orchestrator_type', 'langchain')
 
-        print(f"\n{'='*80}")
-        print(f"Initializing session for user {user_id} with {orchestrator_type}")
-        print(f"{'='*80}")
+        logger.info("Initializing session for user %s with %s", user_id, orchestrator_type)
 
-        # Create orchestrator
-        orchestrator = get_orchestrator(orchestrator_type, user_id)
+        # Create orchestrator (DB + vector store setup is blocking)
+        orchestrator = await run_in_threadpool(get_orchestrator, orchestrator_type, user_id)
+
+        # Load the agents' models in the background (once per process) so the
+        # first chat message doesn't wait on a cold model load
+        models = {
+            agent.model_name for agent in (orchestrator.conversation_agent,
+                                           orchestrator.recommendation_agent,
+                                           orchestrator.order_handler_agent)
+        }
+        asyncio.get_running_loop().run_in_executor(None, warmup_models, models)
 
         # Generate session ID
         session_id = str(uuid.uuid4())
 
         # Store session
-        sessions[session_id] = {
-            'orchestrator': orchestrator,
-            'user_id': user_id,
-            'orchestrator_type': orchestrator_type
-        }
+        await run_in_threadpool(session_store.create, session_id, orchestrator,
+                                user_id, orchestrator_type)
 
         # Get user data
         user_data = orchestrator.user_data
 
-        return jsonify({
+        return {
             'status': 'success',
             'session_id': session_id,
             'user_data': {
@@ -102,39 +159,37 @@ def initialize_session():
             },
             'orchestrator_type': orchestrator_type,
             'message': f"Welcome {user_data.get('name', 'Guest')}! I'm your AI food assistant. What would you like to eat today?"
-        })
+        }
 
     except Exception as e:
-        print(f"Error initializing session: {e}")
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("Error initializing session")
+        return FastJSONResponse({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, status_code=500)
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
+@app.post('/api/chat')
+async def chat(request: Request):
     """Process user message"""
     try:
-        data = request.json
+        data = await request.json()
         session_id = data.get('session_id')
         message = data.get('message')
 
-        if not session_id or session_id not in sessions:
-            return jsonify({
+        session = await run_in_threadpool(session_store.get, session_id)
+        if session is None:
+            return FastJSONResponse({
                 'status': 'error',
                 'message': 'Invalid or expired session'
-            }), 400
+            }, status_code=400)
 
         # Get orchestrator from session
-        orchestrator = sessions[session_id]['orchestrator']
+        orchestrator = session['orchestrator']
 
-        print(f"\n{'='*80}")
-        print(f"USER MESSAGE: {message}")
-        print(f"{'='*80}")
+        logger.info("USER MESSAGE: %s", message)
 
-        # Process message
-        result = orchestrator.process_user_input(message)
+        # Process message off the event loop - the LLM round trip takes seconds
+        result = await process_message(orchestrator, message)
 
         # Format response
         response = {
@@ -146,136 +201,182 @@ def chat():
             'session_id': session_id
         }
 
-        return jsonify(response)
+        return response
 
     except Exception as e:
-        print(f"Error processing chat: {e}")
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("Error processing chat")
+        return FastJSONResponse({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, status_code=500)
+
+@app.post('/api/recommend/stream')
+async def recommend_stream(request: Request):
+    """
+    Stream recommendations as NDJSON - one line per item as soon as the model
+    closes it, then a final "done" line with the full parsed response
+    """
+    try:
+        data = await request.json()
+        session_id = data.get('session_id')
+        message = data.get('message')
+
+        session = await run_in_threadpool(session_store.get, session_id)
+        if session is None:
+            return FastJSONResponse({
+                'status': 'error',
+                'message': 'Invalid or expired session'
+            }, status_code=400)
+
+        orchestrator = session['orchestrator']
+        user_data = orchestrator.user_data
+        past_orders = await run_in_threadpool(orchestrator.get_past_orders)
+
+        events = orchestrator.recommendation_agent.stream_recommend(
+            message,
+            user_preferences=user_data.get('preferences', {}),
+            dietary_restrictions=user_data.get('dietary_restrictions', []),
+            past_orders=past_orders
+        )
 
-@app.route('/api/cart', methods=['GET'])
-def get_cart():
+        # Sync generator - Starlette iterates it in the threadpool
+        lines = (fastjson.dumps_bytes(event) + b"\n" for event in events)
+        return StreamingResponse(lines, media_type='application/x-ndjson')
+
+    except Exception as e:
+        logger.exception("Error streaming recommendations")
+        return FastJSONResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status_code=500)
+
+@app.get('/api/cart')
+async def get_cart(session_id: str = None):
     """Get current cart state"""
     try:
-        session_id = request.args.get('session_id')
-
-        if not session_id or session_id not in sessions:
-            return jsonify({
+        session = await run_in_threadpool(session_store.get, session_id)
+        if session is None:
+            return FastJSONResponse({
                 'status': 'error',
                 'message': 'Invalid or expired session'
-            }), 400
+            }, status_code=400)
 
         # Get orchestrator from session
-        orchestrator = sessions[session_id]['orchestrator']
+        orchestrator = session['orchestrator']
 
         # Get cart
-        cart = orchestrator.get_cart()
+        cart = await run_in_threadpool(orchestrator.get_cart)
 
-        return jsonify({
+        return {
             'status': 'success',
             'cart': cart
-        })
+        }
 
     except Exception as e:
-        print(f"Error getting cart: {e}")
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("Error getting cart")
+        return FastJSONResponse({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, status_code=500)
 
-@app.route('/api/checkout', methods=['POST'])
-def checkout():
+@app.post('/api/checkout')
+async def checkout(request: Request):
     """Process checkout"""
     try:
-        data = request.json
+        data = await request.json()
         session_id = data.get('session_id')
 
-        if not session_id or session_id not in sessions:
-            return jsonify({
+        session = await run_in_threadpool(session_store.get, session_id)
+        if session is None:
+            return FastJSONResponse({
                 'status': 'error',
                 'message': 'Invalid or expired session'
-            }), 400
+            }, status_code=400)
 
         # Get orchestrator from session
-        orchestrator = sessions[session_id]['orchestrator']
+        orchestrator = session['orchestrator']
 
-        print(f"\n{'='*80}")
-        print(f"PROCESSING CHECKOUT")
-        print(f"{'='*80}")
+        logger.info("Processing checkout")
 
         # Process checkout
-        result = orchestrator.checkout()
+        result = await run_in_threadpool(orchestrator.checkout)
 
-        return jsonify(result)
+        return result
 
     except Exception as e:
-        print(f"Error during checkout: {e}")
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("Error during checkout")
+        return FastJSONResponse({
             'status': 'error',
             'success': False,
             'message': str(e)
-        }), 500
+        }, status_code=500)
 
-@app.route('/api/add_to_cart', methods=['POST'])
-def add_to_cart():
+@app.post('/api/add_to_cart')
+async def add_to_cart(request: Request):
     """Quick add item to cart"""
     try:
-        data = request.json
+        data = await request.json()
         session_id = data.get('session_id')
         item_name = data.get('item_name')
         quantity = data.get('quantity', 1)
 
-        if not session_id or session_id not in sessions:
-            return jsonify({
+        session = await run_in_threadpool(session_store.get, session_id)
+        if session is None:
+            return FastJSONResponse({
                 'status': 'error',
                 'message': 'Invalid or expired session'
-            }), 400
+            }, status_code=400)
 
         # Get orchestrator from session
-        orchestrator = sessions[session_id]['orchestrator']
+        orchestrator = session['orchestrator']
 
         # Add item using natural language
         message = f"add {quantity} {item_name}"
-        result = orchestrator.process_user_input(message)
+        result = await process_message(orchestrator, message)
 
-        return jsonify({
+        return {
             'status': result.get('status', 'success'),
             'message': result.get('message', ''),
             'cart': result.get('cart', {})
-        })
+        }
 
     except Exception as e:
-        print(f"Error adding to cart: {e}")
-        traceback.print_exc()
-        return jsonify({
+        logger.exception("Error adding to cart")
+        return FastJSONResponse({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, status_code=500)
 
 # ============================================
 # RUN SERVER
 # ============================================
 
 if __name__ == '__main__':
-    print("\n" + "="*80)
-    print("🚀 AGENTIC FOOD ORDERING BACKEND SERVER")
-    print("="*80)
-    print(f"Gemini Available: {GEMINI_AVAILABLE}")
-    print(f"LangChain Available: {LANGCHAIN_AVAILABLE}")
-    print("="*80)
-    print("\nServer starting on http://localhost:5000")
-    print("\nAvailable endpoints:")
-    print("  GET  /api/health")
-    print("  POST /api/init")
-    print("  POST /api/chat")
-    print("  GET  /api/cart")
-    print("  POST /api/checkout")
-    print("  POST /api/add_to_cart")
-    print("="*80 + "\n")
-
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    logger.info("🚀 AGENTIC FOOD ORDERING BACKEND SERVER")
+    logger.info("Gemini Available: %s", GEMINI_AVAILABLE)
+    logger.info("LangChain Available: %s", LANGCHAIN_AVAILABLE)
+    logger.info("Session store: %s", session_store.backend)
+    # Agents can dispatch LLM calls concurrently (aprocess/arecommend); Ollama only
+    # services them in parallel when these are set on the Ollama server
+    logger.info("OLLAMA_NUM_PARALLEL: %s", os.environ.get('OLLAMA_NUM_PARALLEL', 'unset (server default)'))
+    logger.info("OLLAMA_MAX_LOADED_MODELS: %s", os.environ.get('OLLAMA_MAX_LOADED_MODELS', 'unset (server default)'))
+    models = configured_models()
+    logger.info("Agent models: %s (set LLM_MODEL to share one)", ', '.join(models))
+    max_loaded = os.environ.get('OLLAMA_MAX_LOADED_MODELS')
+    if max_loaded and max_loaded.isdigit() and int(max_loaded) < len(models):
+        logger.warning(
+            "OLLAMA_MAX_LOADED_MODELS=%s is below the %d models in use - "
+            "Ollama will swap models between agent calls",
+            max_loaded, len(models)
+        )
+    logger.info("Server starting on http://localhost:5000")
+    logger.info("Available endpoints:")
+    logger.info("  GET  /api/health")
+    logger.info("  POST /api/init")
+    logger.info("  POST /api/chat")
+    logger.info("  POST /api/recommend/stream")
+    logger.info("  GET  /api/cart")
+    logger.info("  POST /api/checkout")
+    logger.info("  POST /api/add_to_cart")
+
+    uvicorn.run(app, port=5000, host='0.0.0.0')
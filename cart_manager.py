@@ -11,7 +11,13 @@ class CartManager:
     def __init__(self, db: DatabaseManager):
         self.db = db
         self.cart_items = []
+        # item_id -> the same entry dict as in cart_items
+        self._items_by_id = {}
         self.restaurant_id = None
+        # Restaurant details from the add_item JOIN - no separate lookup needed
+        self._restaurant = None
+        # Running sum of total_price over cart_items
+        self._subtotal = 0.0
     
     def add_item(self, item_id: int, quantity: int = 1) -> Dict:
         """
@@ -25,16 +31,25 @@ class CartManager:
             Cart state dict
         """
         
-        # Get item from database
+        # Get item from database, plus the current menu price of every line
+        # already in the cart (NULL if the item is gone) - one round trip
         query = """
-            SELECT m.item_id, m.name, m.price, m.restaurant_id,
-                   r.name as restaurant_name, r.minimum_order, r.delivery_fee
-            FROM menu_items m
-            JOIN restaurants r ON m.restaurant_id = r.restaurant_id
-            WHERE m.item_id = %s AND m.availability = TRUE
+            WITH item AS (
+                SELECT m.item_id, m.name, m.price, m.restaurant_id,
+                       r.name as restaurant_name, r.minimum_order, r.delivery_fee
+                FROM menu_items m
+                JOIN restaurants r ON m.restaurant_id = r.restaurant_id
+                WHERE m.item_id = %s AND m.availability = TRUE
+            )
+            SELECT i.*,
+                   (SELECT array_agg(mi.price ORDER BY t.ord)
+                    FROM unnest(%s::int[]) WITH ORDINALITY AS t(id, ord)
+                    LEFT JOIN menu_items mi ON mi.item_id = t.id) AS cart_prices
+            FROM item i
         """
-        
-        results = self.db.execute_query(query, (item_id,))
+
+        cart_ids = [x['item_id'] for x in self.cart_items]
+        results = self.db.execute_query(query, (item_id, cart_ids))
         
         if not results:
             return {
@@ -47,6 +62,12 @@ class CartManager:
         # Check restaurant consistency
         if self.restaurant_id is None:
             self.restaurant_id = item['restaurant_id']
+            self._restaurant = {
+                'restaurant_id': item['restaurant_id'],
+                'name': item['restaurant_name'],
+                'minimum_order': float(item['minimum_order']),
+                'delivery_fee': float(item['delivery_fee'])
+            }
         elif self.restaurant_id != item['restaurant_id']:
             return {
                 'success': False,
@@ -54,14 +75,20 @@ class CartManager:
                 'cart': self.get_cart_state()
             }
         
+        # Prices changed since earlier items were added - trust the database
+        self._reprice(item['cart_prices'] or [])
+        
         # Check if item already in cart
-        existing_item = next((x for x in self.cart_items if x['item_id'] == item_id), None)
+        existing_item = self._items_by_id.get(item_id)
         
         if existing_item:
+            delta = quantity * existing_item['unit_price']
             existing_item['quantity'] += quantity
-            existing_item['total_price'] = existing_item['quantity'] * existing_item['unit_price']
+            existing_item['total_price'] += delta
+            self._subtotal += delta
         else:
-            self.cart_items.append({
+            self._subtotal += float(item['price']) * quantity
+            entry = {
                 'item_id': item['item_id'],
                 'item_name': item['name'],
                 'restaurant_id': item['restaurant_id'],
@@ -69,7 +96,9 @@ class CartManager:
                 'quantity': quantity,
                 'unit_price': float(item['price']),
                 'total_price': float(item['price']) * quantity
-            })
+            }
+            self.cart_items.append(entry)
+            self._items_by_id[item_id] = entry
         
         cart_state = self.get_cart_state()
         
@@ -79,6 +108,22 @@ class CartManager:
             'cart': cart_state
         }
     
+    def _reprice(self, prices: List) -> None:
+        """
+        Update line prices to current menu prices
+
+        prices has one entry per cart line, in cart order; None (item no
+        longer on the menu) keeps the line's price.
+        """
+        changed = False
+        for entry, price in zip(self.cart_items, prices):
+            if price is not None and abs(float(price) - entry['unit_price']) > 0.005:
+                entry['unit_price'] = float(price)
+                entry['total_price'] = entry['unit_price'] * entry['quantity']
+                changed = True
+        if changed:
+            self._subtotal = sum(entry['total_price'] for entry in self.cart_items)
+    
     def get_cart_state(self) -> Dict:
         """Get current cart state"""
         
@@ -93,10 +138,10 @@ class CartManager:
                 'minimum_order_met': False
             }
         
-        # Get restaurant details
-        restaurant = self.db.get_restaurant_by_id(self.restaurant_id)
+        # Restaurant details cached by add_item
+        restaurant = self._restaurant
         
-        subtotal = sum(item['total_price'] for item in self.cart_items)
+        subtotal = self._subtotal
         delivery_fee = float(restaurant['delivery_fee']) if restaurant else 0
         minimum_order = float(restaurant['minimum_order']) if restaurant else 0
         
@@ -113,15 +158,65 @@ class CartManager:
     
     def get_restaurant_name(self) -> str:
         """Get current restaurant name"""
-        if self.restaurant_id:
-            restaurant = self.db.get_restaurant_by_id(self.restaurant_id)
-            return restaurant['name'] if restaurant else "Unknown"
+        if self._restaurant:
+            return self._restaurant['name']
         return "No items"
     
     def clear_cart(self):
         """Clear all items from cart"""
         self.cart_items = []
+        self._items_by_id = {}
         self.restaurant_id = None
+        self._restaurant = None
+        self._subtotal = 0.0
+
+    def remove_item(self, item_id: int) -> Dict:
+        """Remove an item from the cart entirely"""
+        existing_item = self._items_by_id.get(item_id)
+
+        if not existing_item:
+            return {
+                'success': False,
+                'message': 'Item is not in the cart',
+                'cart': self.get_cart_state()
+            }
+
+        self.cart_items.remove(existing_item)
+        del self._items_by_id[item_id]
+        self._subtotal -= existing_item['total_price']
+        if not self.cart_items:
+            self.clear_cart()  # also drops float residue and the restaurant
+
+        return {
+            'success': True,
+            'message': f"Removed {existing_item['item_name']} from cart",
+            'cart': self.get_cart_state()
+        }
+
+    def update_quantity(self, item_id: int, quantity: int) -> Dict:
+        """Set an item's quantity (0 or less removes it)"""
+        if quantity <= 0:
+            return self.remove_item(item_id)
+
+        existing_item = self._items_by_id.get(item_id)
+
+        if not existing_item:
+            return {
+                'success': False,
+                'message': 'Item is not in the cart',
+                'cart': self.get_cart_state()
+            }
+
+        new_total = quantity * existing_item['unit_price']
+        self._subtotal += new_total - existing_item['total_price']
+        existing_item['quantity'] = quantity
+        existing_item['total_price'] = new_total
+
+        return {
+            'success': True,
+            'message': f"Updated {existing_item['item_name']} to {quantity}x",
+            'cart': self.get_cart_state()
+        }
     
     def checkout(self, user_id: int, delivery_address: str, 
                  special_instructions: str = None) -> Dict:
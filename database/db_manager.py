@@ -9,11 +9,125 @@ NEW FEATURES:
 """
 
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
-from typing import List, Dict, Optional
-import json
-from config import DB_CONFIG
+from psycopg2.extras import (RealDictCursor, Json, execute_values,
+                             register_default_json, register_default_jsonb)
+from typing import Iterator, List, Dict, Optional
+import atexit
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from config import get_db_config
+from utils import fastjson
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"%s")
+
+# json/jsonb columns arrive as Python objects, decoded with orjson when available
+register_default_json(globally=True, loads=fastjson.loads)
+register_default_jsonb(globally=True, loads=fastjson.loads)
+
+# Columns that hold JSON, decoded here so callers never see them as text
+USER_JSON_COLUMNS = ('preferences', 'dietary_restrictions')
+MENU_JSON_COLUMNS = ('tags',)
+
+
+# Words too common to narrow a menu search ("%the%" matches nearly every
+# description), left out of keyword patterns and ranking
+SEARCH_STOP_WORDS = frozenset({
+    'the', 'and', 'with', 'for', 'are', 'you', 'your', 'can', 'could', 'would',
+    'should', 'have', 'has', 'some', 'something', 'anything', 'any', 'what',
+    'that', 'this', 'from', 'want', 'like', 'please', 'show', 'give', 'get',
+    'recommend', 'suggest', 'today', 'tonight', 'now', 'not', 'but', 'too',
+})
+
+
+def search_keywords(text: str) -> List[str]:
+    """Lowercased words of text worth searching the menu for"""
+    return [w for w in text.lower().split() if len(w) > 2 and w not in SEARCH_STOP_WORDS]
+
+
+def _decode_json_columns(row: Dict, columns) -> Dict:
+    """Decode JSON stored in text columns in place (json/jsonb need nothing)"""
+    for column in columns:
+        value = row.get(column)
+        if isinstance(value, str):
+            try:
+                row[column] = fastjson.loads(value) if value else None
+            except fastjson.JSONDecodeError:
+                logger.warning("Bad JSON in column %s", column)
+                row[column] = None
+    return row
+
+
+def _add_search_fields(row: Dict) -> Dict:
+    """Lowercased name and name/cuisine/description text, computed once per cached row"""
+    row['_name_lower'] = row['name'].lower()
+    row['_text_lower'] = f"{row['name']} {row.get('cuisine_type') or ''} {row.get('description') or ''}".lower()
+    return row
+
+
+# Users rarely change mid-session, so lookups are served from memory for a
+# few minutes (shared by every DatabaseManager in the process)
+USER_CACHE_TTL = 300  # seconds
+_user_cache = {}      # user_id -> (expires_at, row)
+_user_cache_lock = threading.Lock()
+
+# The menu changes rarely; the full list is shared the same way
+MENU_CACHE_TTL = 300  # seconds
+_menu_cache = (0.0, [])  # (expires_at, rows)
+_menu_cache_lock = threading.Lock()
+
+# A repeat checkout of the same cart within this window returns the first
+# order instead of placing a second one (double clicks, client retries)
+DUPLICATE_ORDER_WINDOW = 10  # seconds
+
+# psycopg2's pool closes any connection returned while minconn are already
+# idle, so minconn is the steady-state concurrency kept warm (TLS session
+# and per-connection prepared statements); bursts above it reconnect
+POOL_MIN_CONNECTIONS = int(os.environ.get("DB_POOL_MIN", "10"))
+POOL_MAX_CONNECTIONS = 50
+# How long a call waits for a free connection once all are checked out
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))  # seconds
+
+# Interaction logs are buffered and written in batches, whichever comes first
+INTERACTION_BATCH_SIZE = 20
+INTERACTION_FLUSH_INTERVAL = 5.0  # seconds
+_interaction_buffer = []          # (user_id, session_id, type, text, intent, unix_time)
+_interaction_lock = threading.Lock()
+_interaction_timer = None
+
+
+def _prepared_statements_enabled() -> bool:
+    """
+    SQL-level PREPARE only works when each client keeps its own server
+    session - not behind a transaction-mode pooler (e.g. Neon's -pooler host)
+    """
+    setting = os.environ.get("DB_PREPARED_STATEMENTS")
+    if setting is not None:
+        return setting.lower() in ("1", "true", "yes")
+    return "-pooler" not in (get_db_config()['host'] or "")
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has PREPAREd"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # SQL text -> prepared statement name (None = don't prepare);
+        # the whole dict is None when preparing is off for this connection
+        self.prepared = {}
+
+
+class PoolExhaustedError(RuntimeError):
+    """No pooled connection became free within POOL_ACQUIRE_TIMEOUT"""
 
 
 class DatabaseManager:
@@ -22,70 +136,170 @@ class DatabaseManager:
     ENHANCED: Now supports getting user address and storing item names
     """
 
-    # Connection pool (shared across instances)
+    # Connection pool (shared across instances and threads)
     _connection_pool = None
+    # getconn() fails at once when every connection is out; callers queue
+    # here instead, up to POOL_ACQUIRE_TIMEOUT
+    _pool_slots = threading.BoundedSemaphore(POOL_MAX_CONNECTIONS)
+
+    # Whether menu_items has the search_tsv column from indexes.sql (checked once)
+    _has_search_tsv = None
+
+    # Process-wide instance handed out by get_shared()
+    _shared = None
+    _shared_lock = threading.Lock()
 
     def __init__(self):
-        """Initialize database connection from pool"""
-        self.connection = None
+        """Initialize the shared connection pool"""
         self._init_pool()
-        self.get_connection()
+
+    @classmethod
+    def get_shared(cls) -> "DatabaseManager":
+        """
+        The process-wide DatabaseManager
+
+        Instances hold no per-caller state (connections are borrowed from
+        the pool per call), so orchestrators and scripts can share one.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
 
     @classmethod
     def _init_pool(cls):
         """Initialize connection pool (once)"""
         if cls._connection_pool is None:
             try:
-                cls._connection_pool = pool.SimpleConnectionPool(
-                    minconn=1,
-                    maxconn=10,
-                    **DB_CONFIG
+                connection_factory = PreparingConnection if _prepared_statements_enabled() else None
+                # Thread-safe; connections are checked out per call, so the
+                # pool is sized for concurrent requests rather than sessions
+                cls._connection_pool = pool.ThreadedConnectionPool(
+                    minconn=POOL_MIN_CONNECTIONS,
+                    maxconn=POOL_MAX_CONNECTIONS,
+                    connection_factory=connection_factory,
+                    # TCP keepalives so idle pooled TLS connections aren't
+                    # silently dropped and re-handshaken on the next query
+                    keepalives=1,
+                    keepalives_idle=30,
+                    keepalives_interval=10,
+                    keepalives_count=3,
+                    **get_db_config()
                 )
-                print("✓ Connection pool initialized")
+                logger.debug("Connection pool initialized")
             except Exception as e:
-                print(f"✗ Failed to initialize connection pool: {e}")
+                logger.error("Failed to initialize connection pool: %s", e)
                 raise
 
-    def get_connection(self):
-        """Get connection from pool with auto-reconnect"""
-        max_retries = 3
-        for attempt in range(max_retries):
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a pooled connection for one call
+
+        Connections run in autocommit mode: every write here is a single
+        statement, and reads don't leave the connection idle in a transaction.
+        Waits up to POOL_ACQUIRE_TIMEOUT for a free connection, then raises
+        PoolExhaustedError.
+        """
+        if not self._pool_slots.acquire(timeout=POOL_ACQUIRE_TIMEOUT):
+            raise PoolExhaustedError(
+                f"no database connection free after {POOL_ACQUIRE_TIMEOUT:g}s "
+                f"({POOL_MAX_CONNECTIONS} in use)"
+            )
+        try:
+            conn = self._connection_pool.getconn()
             try:
-                if self.connection is None or self.connection.closed:
-                    self.connection = self._connection_pool.getconn()
-                    print("✓ Got connection from pool")
-                return
-            except Exception as e:
-                print(f"⚠️ Connection attempt {attempt + 1} failed: {e}")
-                if attempt == max_retries - 1:
-                    raise
+                if not conn.autocommit:
+                    conn.autocommit = True
+                yield conn
+            finally:
+                # Broken connections (conn.closed) are discarded by the pool
+                self._connection_pool.putconn(conn)
+        finally:
+            self._pool_slots.release()
 
     def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
         """Execute SELECT query"""
         try:
-            self.get_connection()
-            cursor = self.connection.cursor(cursor_factory=RealDictCursor)
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-            cursor.close()
-            return results if results else []
+            with self._connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                self._execute_prepared(cursor, query, params)
+                return cursor.fetchall()
+        except PoolExhaustedError:
+            raise
         except Exception as e:
-            print(f"❌ Query error: {e}")
+            logger.error("Query error: %s", e)
             return []
 
+    def _execute_prepared(self, cursor, query: str, params):
+        """
+        Run a query through a per-connection PREPARE/EXECUTE cache so repeat
+        queries skip parsing and planning. Only positional (%s) queries are
+        prepared; anything else executes normally.
+        """
+        conn = cursor.connection
+        prepared = getattr(conn, 'prepared', None)
+        if (prepared is None or not isinstance(params, tuple) or not params
+                or '%(' in query or '%%' in query):
+            cursor.execute(query, params)
+            return
+
+        if query not in prepared:
+            if len(_PLACEHOLDER.findall(query)) != len(params):
+                prepared[query] = None
+            else:
+                name = "q_" + hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+                counter = iter(range(1, len(params) + 1))
+                pg_query = _PLACEHOLDER.sub(lambda _: f"${next(counter)}", query)
+                try:
+                    cursor.execute(f"PREPARE {name} AS {pg_query}")
+                    prepared[query] = name
+                except psycopg2.Error:
+                    conn.rollback()
+                    prepared[query] = None
+
+        name = prepared[query]
+        if name is None:
+            cursor.execute(query, params)
+            return
+
+        try:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # Server session was swapped under us - stop preparing on this connection
+            conn.rollback()
+            conn.prepared = None
+            cursor.execute(query, params)
+
     def execute_update(self, query: str, params: tuple = None) -> bool:
         """Execute INSERT/UPDATE/DELETE"""
         try:
-            self.get_connection()
-            cursor = self.connection.cursor()
-            cursor.execute(query, params)
-            self.connection.commit()
-            cursor.close()
+            with self._connection() as conn, conn.cursor() as cursor:
+                cursor.execute(query, params)
+            return True
+        except PoolExhaustedError:
+            raise
+        except Exception as e:
+            logger.error("Update error: %s", e)
+            return False
+
+    def execute_bulk_insert(self, query: str, rows: List[tuple], template: str = None,
+                            page_size: int = 100) -> bool:
+        """
+        Insert many rows in one round trip per page
+
+        query has a single "VALUES %s" placeholder that execute_values
+        expands to a multi-row VALUES list; template overrides the per-row
+        "(%s, ...)" (e.g. to add NOW()).
+        """
+        if not rows:
+            return True
+        try:
+            with self._connection() as conn, conn.cursor() as cursor:
+                execute_values(cursor, query, rows, template=template, page_size=page_size)
             return True
         except Exception as e:
-            print(f"❌ Update error: {e}")
-            if self.connection:
-                self.connection.rollback()
+            logger.error("Bulk insert error: %s", e)
             return False
 
     # ============================================
@@ -93,10 +307,26 @@ class DatabaseManager:
     # ============================================
 
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
-        """Get user by ID"""
-        query = "SELECT * FROM users WHERE user_id = %s"
+        """Get user by ID (cached for USER_CACHE_TTL seconds)"""
+        now = time.monotonic()
+        with _user_cache_lock:
+            entry = _user_cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            return dict(entry[1])
+
+        query = """
+        SELECT user_id, name, email, address, preferences, dietary_restrictions
+        FROM users
+        WHERE user_id = %s
+        """
         results = self.execute_query(query, (user_id,))
-        return results[0] if results else None
+        if not results:
+            return None
+
+        user = _decode_json_columns(dict(results[0]), USER_JSON_COLUMNS)
+        with _user_cache_lock:
+            _user_cache[user_id] = (now + USER_CACHE_TTL, user)
+        return dict(user)
 
     # 🟢 NEW METHOD: Get user address for delivery
     def get_user_address(self, user_id: int) -> str:
@@ -106,24 +336,24 @@ class DatabaseManager:
         NEW FEATURE: Extract address from user profile
         """
         try:
-            query = "SELECT name, address FROM users WHERE user_id = %s"
-            results = self.execute_query(query, (user_id,))
+            user = self.get_user_by_id(user_id)
             
-            if results:
-                user = results[0]
+            if user:
                 name = user.get('name', 'User')
                 address = user.get('address', 'Unknown Address')
                 
                 # Format: "Name, Address"
                 delivery_address = f"{name}, {address}"
-                print(f"📍 Delivery Address: {delivery_address}")
+                logger.debug("Delivery address: %s", delivery_address)
                 return delivery_address
             else:
-                print(f"⚠️ User {user_id} not found")
+                logger.warning("User %s not found", user_id)
                 return "Unknown Address"
                 
+        except PoolExhaustedError:
+            raise
         except Exception as e:
-            print(f"❌ Error fetching address: {e}")
+            logger.error("Error fetching address: %s", e)
             return "Unknown Address"
 
     # ============================================
@@ -131,8 +361,27 @@ class DatabaseManager:
     # ============================================
 
     def search_menu_items(self, search_term: str = "", cuisine_filter: str = None,
-                         dietary_restrictions: List[str] = None) -> List[Dict]:
-        """Search menu items"""
+                         dietary_restrictions: List[str] = None, keywords: List[str] = None,
+                         name_boosts: List[str] = None, text_boosts: List[str] = None,
+                         limit: int = 20) -> List[Dict]:
+        """
+        Search menu items
+
+        Args:
+            search_term: Substring the item name must contain
+            cuisine_filter: Exact cuisine_type
+            dietary_restrictions: Unused (kept for callers)
+            keywords: Only return items whose name/cuisine/description contain
+                at least one of these; best matches first (+5 per keyword)
+            name_boosts: Terms that rank an item first when in its name (+100)
+            text_boosts: Terms worth +10 each in name/cuisine/description
+            limit: Maximum rows
+        """
+        keywords = [k for k in keywords or [] if k.lower() not in SEARCH_STOP_WORDS]
+        if keywords:
+            return self._search_menu_by_keywords(keywords, name_boosts or [], text_boosts or [],
+                                                 cuisine_filter, limit)
+
         query = """
         SELECT m.item_id, m.name, m.price, m.category, m.cuisine_type,
                m.tags, m.availability, m.description, m.restaurant_id,
@@ -144,7 +393,14 @@ class DatabaseManager:
 
         params = []
 
-        if search_term:
+        use_full_text = bool(search_term) and self._full_text_available()
+
+        if use_full_text:
+            # Word matches via the tsvector index, plus the old substring
+            # match (trigram index) so partial names still hit
+            query += " AND (m.search_tsv @@ plainto_tsquery('english', %s) OR LOWER(m.name) LIKE %s)"
+            params.extend([search_term, f"%{search_term.lower()}%"])
+        elif search_term:
             query += " AND LOWER(m.name) LIKE %s"
             params.append(f"%{search_term.lower()}%")
 
@@ -152,9 +408,123 @@ class DatabaseManager:
             query += " AND m.cuisine_type = %s"
             params.append(cuisine_filter)
 
-        query += " LIMIT 20"
+        if use_full_text:
+            query += " ORDER BY ts_rank(m.search_tsv, plainto_tsquery('english', %s)) DESC, m.item_id"
+            params.append(search_term)
+
+        query += " LIMIT %s"
+        params.append(limit)
+
+        return [_decode_json_columns(row, MENU_JSON_COLUMNS)
+                for row in self.execute_query(query, tuple(params))]
+
+    def _full_text_available(self) -> bool:
+        """True once database/indexes.sql has added menu_items.search_tsv"""
+        if DatabaseManager._has_search_tsv is None:
+            rows = self.execute_query("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'menu_items' AND column_name = 'search_tsv'
+            """)
+            DatabaseManager._has_search_tsv = bool(rows)
+        return DatabaseManager._has_search_tsv
+
+    def _search_menu_by_keywords(self, keywords: List[str], name_boosts: List[str],
+                                 text_boosts: List[str], cuisine_filter: str, limit: int) -> List[Dict]:
+        """Keyword prefilter + ranking done in SQL (see database/indexes.sql)"""
+        keyword_patterns = [f"%{k.lower()}%" for k in keywords]
+        boost_patterns = [f"%{b.lower()}%" for b in name_boosts]
+        text_boost_patterns = [f"%{b.lower()}%" for b in text_boosts]
 
-        return self.execute_query(query, tuple(params) if params else None)
+        query = """
+        WITH candidates AS (
+            SELECT m.item_id, m.name, m.price, m.category, m.cuisine_type,
+                   m.tags, m.availability, m.description, m.restaurant_id,
+                   r.name as restaurant_name,
+                   LOWER(m.name) AS name_lc,
+                   LOWER(m.name || ' ' || COALESCE(m.cuisine_type, '') || ' ' ||
+                         COALESCE(m.description, '')) AS text_lc
+            FROM menu_items m
+            JOIN restaurants r ON m.restaurant_id = r.restaurant_id
+            WHERE m.availability = TRUE
+              AND (LOWER(m.name) LIKE ANY(%(kw)s)
+                   OR LOWER(m.cuisine_type) LIKE ANY(%(kw)s)
+                   OR LOWER(m.description) LIKE ANY(%(kw)s))
+              AND (%(cuisine)s::text IS NULL OR m.cuisine_type = %(cuisine)s)
+        )
+        SELECT item_id, name, price, category, cuisine_type, tags, availability,
+               description, restaurant_id, restaurant_name
+        FROM candidates c
+        ORDER BY (SELECT COUNT(*) FROM unnest(%(boost)s::text[]) b WHERE c.name_lc LIKE b) * 100
+               + (SELECT COUNT(*) FROM unnest(%(kw)s::text[]) k WHERE c.text_lc LIKE k) * 5
+               + (SELECT COUNT(*) FROM unnest(%(text_boost)s::text[]) t WHERE c.text_lc LIKE t) * 10 DESC,
+                 item_id
+        LIMIT %(limit)s
+        """
+
+        rows = self.execute_query(query, {
+            'kw': keyword_patterns,
+            'boost': boost_patterns,
+            'text_boost': text_boost_patterns,
+            'cuisine': cuisine_filter,
+            'limit': limit
+        })
+        return [_decode_json_columns(row, MENU_JSON_COLUMNS) for row in rows]
+
+    def get_all_menu_items(self) -> List[Dict]:
+        """
+        Every available menu item (cached for MENU_CACHE_TTL seconds)
+
+        The same list object is returned until the cache is refreshed, so
+        callers can build derived indexes and rebuild them when it changes.
+        Treat it as read-only. Rows also carry '_name_lower' and
+        '_text_lower' for matching without re-lowercasing.
+        """
+        global _menu_cache
+        expires_at, rows = _menu_cache
+        if expires_at > time.monotonic():
+            return rows
+
+        try:
+            # Streamed, so libpq never buffers the whole result next to the rows
+            rows = [_add_search_fields(row) for row in self.iter_menu_items()]
+        except PoolExhaustedError:
+            raise
+        except Exception as e:
+            logger.error("Menu load error: %s", e)
+            rows = []
+        if rows:
+            with _menu_cache_lock:
+                _menu_cache = (time.monotonic() + MENU_CACHE_TTL, rows)
+        return rows
+
+    def iter_menu_items(self, batch_size: int = 500) -> Iterator[Dict]:
+        """
+        Stream every available menu item through a server-side cursor
+
+        Rows are fetched batch_size at a time, so a single pass (e.g. keeping
+        only the top few) never holds the whole catalog in memory. The pooled
+        connection is held until the generator is exhausted or closed.
+        """
+        query = """
+        SELECT m.item_id, m.name, m.price, m.category, m.cuisine_type,
+               m.tags, m.availability, m.description, m.restaurant_id,
+               r.name as restaurant_name
+        FROM menu_items m
+        JOIN restaurants r ON m.restaurant_id = r.restaurant_id
+        WHERE m.availability = TRUE
+        ORDER BY m.item_id
+        """
+        with self._connection() as conn:
+            # Named cursors only live inside a transaction
+            conn.autocommit = False
+            try:
+                with conn.cursor(name="menu_iter", cursor_factory=RealDictCursor) as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(query)
+                    for row in cursor:
+                        yield _decode_json_columns(row, MENU_JSON_COLUMNS)
+            finally:
+                conn.rollback()
 
     def get_item_by_id(self, item_id: int) -> Optional[Dict]:
         """Get menu item by ID - ENHANCED to return item name"""
@@ -178,13 +548,27 @@ class DatabaseManager:
         
         ENHANCED FEATURES:
         - Stores item names in order_items
-        - Uses delivery_address if provided
+        - Uses delivery_address if provided, else the user's "Name, Address"
         - Returns order_id on success
         """
-        try:
-            self.get_connection()
-            cursor = self.connection.cursor()
+        order = self.place_order(user_id, restaurant_id, order_items, total_amount,
+                                 delivery_address, special_instructions)
+        return order['order_id'] if order else None
+
+    def place_order(self, user_id: int, restaurant_id: int, order_items: List[Dict],
+                    total_amount: float, delivery_address: str = None,
+                    special_instructions: str = None) -> Optional[Dict]:
+        """
+        Create order and return {'order_id', 'delivery_address'}
 
+        Without delivery_address the address is built from the users row
+        inside the INSERT, so checkout needs no separate address lookup.
+
+        Checkouts are serialized per user with a transaction-scoped advisory
+        lock; an identical order placed in the last DUPLICATE_ORDER_WINDOW
+        seconds is returned instead of inserting a duplicate.
+        """
+        try:
             # 🟢 NEW: Format order items with names for storage
             formatted_items = []
             for item in order_items:
@@ -197,44 +581,77 @@ class DatabaseManager:
                 }
                 formatted_items.append(formatted_item)
 
-            # Convert to JSON
-            order_items_json = json.dumps(formatted_items)
+            # Bound as a JSON parameter (serialized with orjson when available)
+            order_items_json = Json(formatted_items, dumps=fastjson.dumps)
 
-            # Insert order
+            # Insert order (address derived server-side unless given)
             query = """
             INSERT INTO orders (user_id, restaurant_id, order_items, total_amount,
                               delivery_address, special_instructions, order_status, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-            RETURNING order_id
+            VALUES (
+                %(user_id)s, %(restaurant_id)s, %(order_items)s, %(total_amount)s,
+                COALESCE(
+                    %(delivery_address)s,
+                    (SELECT CONCAT(u.name, ', ', u.address) FROM users u WHERE u.user_id = %(user_id)s),
+                    'Unknown Address'
+                ),
+                %(special_instructions)s, 'pending', NOW()
+            )
+            RETURNING order_id, delivery_address
             """
 
-            cursor.execute(query, (
-                user_id,
-                restaurant_id,
-                order_items_json,
-                total_amount,
-                delivery_address or "Not specified",
-                special_instructions or "",
-                "pending"
-            ))
-
-            order_id = cursor.fetchone()[0]
-            self.connection.commit()
-            cursor.close()
+            duplicate_query = """
+            SELECT order_id, delivery_address
+            FROM orders
+            WHERE user_id = %(user_id)s
+              AND total_amount = %(total_amount)s
+              AND order_items::jsonb = %(order_items)s::jsonb
+              AND created_at > NOW() - make_interval(secs => %(window)s)
+            ORDER BY order_id DESC
+            LIMIT 1
+            """
 
-            print(f"✓ Created order ID: {order_id}")
-            return order_id
+            params = {
+                'user_id': user_id,
+                'restaurant_id': restaurant_id,
+                'order_items': order_items_json,
+                'total_amount': total_amount,
+                'delivery_address': delivery_address or None,
+                'special_instructions': special_instructions or "",
+                'window': DUPLICATE_ORDER_WINDOW
+            }
+
+            with self._connection() as conn:
+                # One explicit transaction; the lock is released on commit/rollback
+                conn.autocommit = False
+                with conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))",
+                                   (f"checkout:{user_id}",))
+                    cursor.execute(duplicate_query, params)
+                    existing = cursor.fetchone()
+                    if existing is None:
+                        cursor.execute(query, params)
+                    order = dict(existing or cursor.fetchone())
+
+            if existing is not None:
+                logger.warning("Duplicate checkout for user %s - returning order %s",
+                               user_id, order['order_id'])
+            else:
+                logger.info("Created order ID: %s", order['order_id'])
+            return order
 
+        except PoolExhaustedError:
+            raise
         except Exception as e:
-            print(f"❌ Order creation failed: {e}")
-            if self.connection:
-                self.connection.rollback()
+            logger.error("Order creation failed: %s", e)
             return None
 
     def get_order_by_id(self, order_id: int) -> Optional[Dict]:
         """Get order details"""
         query = """
-        SELECT o.*, u.name, u.address, r.name as restaurant_name
+        SELECT o.order_id, o.user_id, o.restaurant_id, o.order_items, o.total_amount,
+               o.delivery_address, o.special_instructions, o.order_status, o.created_at,
+               u.name, u.address, r.name as restaurant_name
         FROM orders o
         JOIN users u ON o.user_id = u.user_id
         JOIN restaurants r ON o.restaurant_id = r.restaurant_id
@@ -246,7 +663,8 @@ class DatabaseManager:
     def get_user_orders(self, user_id: int, limit: int = 10) -> List[Dict]:
         """Get user's order history"""
         query = """
-        SELECT * FROM orders
+        SELECT order_id, order_items, total_amount, order_status, created_at, delivery_address
+        FROM orders
         WHERE user_id = %s
         ORDER BY created_at DESC
         LIMIT %s
@@ -263,28 +681,87 @@ class DatabaseManager:
         results = self.execute_query(query, (restaurant_id,))
         return results[0] if results else None
 
+    # ============================================
+    # STATS
+    # ============================================
+
+    def get_database_stats(self) -> Dict[str, int]:
+        """Row counts per table, in one round trip"""
+        query = """
+        SELECT (SELECT COUNT(*) FROM users) AS users,
+               (SELECT COUNT(*) FROM restaurants) AS restaurants,
+               (SELECT COUNT(*) FROM menu_items) AS menu_items,
+               (SELECT COUNT(*) FROM orders) AS orders
+        """
+        results = self.execute_query(query)
+        return dict(results[0]) if results else {}
+
     # ============================================
     # INTERACTION LOGGING
     # ============================================
 
     def log_user_interaction(self, user_id: int, session_id: str, interaction_type: str,
                             query_text: str, intent: str = None):
-        """Log user interaction for learning"""
+        """
+        Log user interaction for learning
+
+        Buffered: rows are written INTERACTION_BATCH_SIZE at a time, or
+        INTERACTION_FLUSH_INTERVAL seconds after the first unwritten one.
+        """
+        global _interaction_timer
+        row = (user_id, session_id, interaction_type, query_text, intent, time.time())
+        with _interaction_lock:
+            _interaction_buffer.append(row)
+            full = len(_interaction_buffer) >= INTERACTION_BATCH_SIZE
+            if not full and _interaction_timer is None:
+                _interaction_timer = threading.Timer(INTERACTION_FLUSH_INTERVAL, self.flush_interactions)
+                _interaction_timer.daemon = True
+                _interaction_timer.start()
+        if full:
+            self.flush_interactions()
+
+    def flush_interactions(self):
+        """Write all buffered interaction logs"""
+        global _interaction_timer
+        with _interaction_lock:
+            rows = _interaction_buffer[:]
+            _interaction_buffer.clear()
+            if _interaction_timer is not None:
+                _interaction_timer.cancel()
+                _interaction_timer = None
+        if rows:
+            self.log_user_interactions(rows)
+
+    def log_user_interactions(self, interactions: List[tuple]) -> bool:
+        """
+        Log several interactions with one multi-row INSERT
+
+        Each tuple is (user_id, session_id, interaction_type, query_text,
+        intent, created_at as a unix timestamp).
+        """
         query = """
         INSERT INTO user_interactions (user_id, session_id, interaction_type, query_text, intent, created_at)
-        VALUES (%s, %s, %s, %s, %s, NOW())
+        VALUES %s
         """
-        self.execute_update(query, (user_id, session_id, interaction_type, query_text, intent))
+        return self.execute_bulk_insert(query, interactions,
+                                        template="(%s, %s, %s, %s, %s, to_timestamp(%s))")
 
     # ============================================
     # CLEANUP
     # ============================================
 
     def disconnect(self):
-        """Close connection and return to pool"""
-        try:
-            if self.connection and not self.connection.closed:
-                self._connection_pool.putconn(self.connection)
-                print("✓ Connection returned to pool")
-        except Exception as e:
-            print(f"⚠️ Disconnect error: {e}")
\ No newline at end of file
+        """
+        Release this manager's database resources
+
+        Connections are returned to the shared pool after every call, so
+        there is nothing held per instance any more.
+        """
+        pass
+
+
+@atexit.register
+def _flush_interactions_at_exit():
+    """Drain buffered interaction logs on interpreter shutdown"""
+    if DatabaseManager._connection_pool is not None:
+        DatabaseManager().flush_interactions()
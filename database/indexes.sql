@@ -0,0 +1,25 @@
+-- Indexes for the menu keyword search (DatabaseManager.search_menu_items)
+-- Run once: psql "$DATABASE_URL" -f database/indexes.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- LOWER(...) LIKE '%term%' lookups on name / description
+CREATE INDEX IF NOT EXISTS menu_items_name_trgm
+    ON menu_items USING gin (LOWER(name) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS menu_items_description_trgm
+    ON menu_items USING gin (LOWER(description) gin_trgm_ops);
+
+-- Full-text search for search_menu_items(search_term=...), ranked with ts_rank.
+-- The app checks for this column at startup and falls back to LIKE without it.
+ALTER TABLE menu_items ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('english', name || ' ' || COALESCE(cuisine_type, '') || ' ' || COALESCE(description, ''))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS menu_items_search_tsv
+    ON menu_items USING gin (search_tsv);
+
+-- Available-items filter shared by every menu query
+CREATE INDEX IF NOT EXISTS menu_items_available_restaurant
+    ON menu_items (restaurant_id) WHERE availability = TRUE;
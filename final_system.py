@@ -1,35 +1,81 @@
-import json
+import difflib
+import heapq
+import queue
+import threading
 import uuid
 import re
+from agents import get_shared_agent
 from agents.conversation_agent import ConversationAgent
 from agents.recommendation_agent import RecommendationAgent
 from agents.order_handler_agent import OrderHandlerAgent
-from database.db_manager import DatabaseManager
+from database.db_manager import DatabaseManager, search_keywords
 from vector_store.chroma_manager import ChromaDBManager
 from cart_manager import CartManager
 
+# Add-to-cart phrasing, matched as whole words so "paddle" or "haddock" don't count
+_ADD_RE = re.compile(r'\b(?:add|to cart)\b')
+_QTY_RE = re.compile(r'\d+')
+
+# Messages whose intent is obvious skip the conversation agent's LLM call.
+# Checked in order, so "add ... to cart" is an order before it's a cart view.
+# Checkout places a real order, so it only matches a message that is nothing
+# but the command ("checkout", "place my order!"); anything looser ("let me
+# check out the menu") goes to the conversation agent.
+_FAST_INTENTS = (
+    (_ADD_RE, 'order_placement'),
+    (re.compile(r'^\s*(?:checkout|place (?:my |the )?order)\s*[.!]*\s*$'), 'checkout'),
+    (re.compile(r'\b(?:my cart|show (?:me )?(?:my |the )?cart|view cart)\b'), 'cart_view'),
+    (re.compile(r'\b(?:recommend|suggest|what should i (?:eat|order|have))\b'), 'recommendation_request'),
+)
+
+# Reply used when a recommendation request skipped the conversation agent
+_FAST_RECOMMENDATION_REPLY = "Here are some dishes you might like:"
+
 
 class FinalAgenticSystem:
     """
     COMPLETE WORKING AGENTIC SYSTEM
     """
 
+    # Dish words that rank an item first when both the query and its name contain them
+    NAME_BOOST_TERMS = ('biryani', 'paneer', 'butter', 'naan')
+    # Query words worth +10 when an item's name/cuisine/description has them
+    TEXT_BOOST_TERMS = ('spicy', 'vegetarian', 'non-vegetarian')
+
     def __init__(self, user_id: int):
         print("\n" + "="*80)
         print("🤖 INITIALIZING AGENTIC FOOD ORDERING SYSTEM")
         print("="*80)
 
         self.user_id = user_id
-        self.db = DatabaseManager()
-        self.chroma = ChromaDBManager()
+        self.db = DatabaseManager.get_shared()
+        self.chroma = ChromaDBManager.get_shared()
         self.cart = CartManager(self.db)
         self.session_id = str(uuid.uuid4())
 
         self.conversation_agent = ConversationAgent()
-        self.recommendation_agent = RecommendationAgent()
-        self.order_handler_agent = OrderHandlerAgent()
+        self.recommendation_agent = get_shared_agent(RecommendationAgent)
+        self.order_handler_agent = get_shared_agent(OrderHandlerAgent)
+
+        # Chroma writes go through a per-session queue drained by a daemon
+        # thread, so they stay off the response path
+        self._chroma_queue = queue.Queue()
+        self._chroma_writer = threading.Thread(
+            target=self._chroma_write_loop,
+            name=f"chroma-writer-{self.session_id[:8]}",
+            daemon=True
+        )
+        self._chroma_writer.start()
+
+        # Lowercased name -> menu row, rebuilt whenever the DB layer's
+        # menu cache refreshes (see _menu_index)
+        self._menu_rows = None
+        self._menu_by_name_lower = {}
 
         self.user_data = self._load_user_data()
+        # Resolved once per session (served from the user cache) instead of
+        # querying users again at checkout
+        self._delivery_address = self.db.get_user_address(self.user_id)
 
         print(f"✅ System ready for {self.user_data.get('name', 'Guest')}")
         print(f"Session: {self.session_id[:8]}...")
@@ -48,8 +94,9 @@ class FinalAgenticSystem:
                 'preferences': {}
             }
 
-        prefs = json.loads(user['preferences']) if isinstance(user['preferences'], str) else user['preferences']
-        dietary = json.loads(user['dietary_restrictions']) if isinstance(user['dietary_restrictions'], str) else user['dietary_restrictions']
+        # JSON columns come back decoded from the DB layer
+        prefs = user['preferences']
+        dietary = user['dietary_restrictions']
 
         return {
             'user_id': self.user_id,
@@ -60,82 +107,87 @@ class FinalAgenticSystem:
             'dietary_restrictions': dietary or []
         }
 
+    def _chroma_write_loop(self):
+        """Store queued conversation turns until cleanup() sends None"""
+        while True:
+            turn = self._chroma_queue.get()
+            try:
+                if turn is None:
+                    return
+                self.chroma.store_conversation(**turn)
+            except Exception as e:
+                print(f"ChromaDB: {e}")
+            finally:
+                self._chroma_queue.task_done()
+
+    def _store_conversation(self, user_message: str, agent_response: str, intent: str):
+        """Queue a conversation turn for the background Chroma writer"""
+        self._chroma_queue.put_nowait({
+            'user_id': self.user_id,
+            'session_id': self.session_id,
+            'user_message': user_message,
+            'agent_response': agent_response,
+            'intent': intent
+        })
+
     def _intelligent_filter_by_query(self, user_query: str, all_items):
         """
         🟢 FIXED: Smart filtering that PRIORITIZES matching items
         """
         query_lower = user_query.lower()
         
-        # Extract important keywords
-        keywords = [w for w in query_lower.split() if len(w) > 2]
+        # Everything that depends only on the query is worked out once,
+        # so scoring an item is one lower() plus substring checks
+        keywords = search_keywords(query_lower)
+        name_boosts = [w for w in self.NAME_BOOST_TERMS if w in query_lower]
+        text_boosts = [w for w in self.TEXT_BOOST_TERMS if w in query_lower]
         
-        # Score each item
-        scored_items = []
+        text_terms = keywords or text_boosts
         
-        for item in all_items:
-            score = 0
-            item_name = item['name'].lower()
-            item_cuisine = item.get('cuisine_type', '').lower()
-            item_desc = item.get('description', '').lower()
-            item_text = f"{item_name} {item_cuisine} {item_desc}"
-            
-            # 🟢 EXACT MATCH - HIGHEST PRIORITY
-            if 'biryani' in query_lower and 'biryani' in item_name:
-                score += 100  # BOOST BIRYANI!
-            
-            if 'paneer' in query_lower and 'paneer' in item_name:
-                score += 100
-                
-            if 'butter' in query_lower and 'butter' in item_name:
-                score += 100
-                
-            if 'naan' in query_lower and 'naan' in item_name:
-                score += 100
-            
-            for keyword in keywords:
-                if keyword in item_text:
-                    score += 5
-            
-            if 'spicy' in query_lower and 'spicy' in item_text:
-                score += 10
-            
-            if 'vegetarian' in query_lower and 'vegetarian' in item_text:
-                score += 10
-            
-            if 'non-vegetarian' in query_lower and 'non-vegetarian' in item_text:
-                score += 10
-            
-            scored_items.append((score, item))
+        def score(item):
+            total = 0
+            if name_boosts:
+                # 🟢 EXACT MATCH - HIGHEST PRIORITY
+                item_name = item.get('_name_lower') or item['name'].lower()
+                total += 100 * sum(1 for w in name_boosts if w in item_name)
+            if text_terms:
+                # Cached menu rows carry it precomputed; SQL search rows build it here
+                item_text = item.get('_text_lower')
+                if item_text is None:
+                    item_text = f"{item['name']} {item.get('cuisine_type', '')} {item.get('description', '')}".lower()
+                total += 5 * sum(1 for w in keywords if w in item_text)
+                total += 10 * sum(1 for w in text_boosts if w in item_text)
+            return total
         
-        # Sort by score DESCENDING
-        scored_items.sort(key=lambda x: x[0], reverse=True)
+        # Only the top 5 are kept instead of sorting the whole menu
+        top = heapq.nlargest(5, ((score(item), item) for item in all_items), key=lambda x: x[0])
         
         # Return only high-scoring items first
-        high_score_items = [item for score, item in scored_items if score > 0]
+        high_score_items = [item for item_score, item in top if item_score > 0]
         
         if high_score_items:
-            return high_score_items[:5]
+            return high_score_items
         else:
             # Fallback: return top 5 anyway
-            return [item for score, item in scored_items[:5]]
+            return [item for item_score, item in top]
 
     def _extract_item_name_and_qty(self, user_input: str):
        
         text_lower = user_input.lower()
         
-        # Remove "add" keyword
-        text_clean = text_lower.replace('add', '').replace('to cart', '').strip()
+        # Remove "add" / "to cart"
+        text_clean = _ADD_RE.sub('', text_lower)
         
         # Extract quantity if present
         quantity = 1
-        qty_match = re.search(r'\d+', text_clean)
+        qty_match = _QTY_RE.search(text_clean)
         if qty_match:
             quantity = int(qty_match.group())
             # Remove quantity from text
-            text_clean = re.sub(r'\d+', '', text_clean).strip()
+            text_clean = _QTY_RE.sub('', text_clean)
         
-        # What remains is item name
-        item_name = text_clean.strip()
+        # What remains is item name (with the gaps left by removals closed up)
+        item_name = ' '.join(text_clean.split())
         
         return item_name, quantity
 
@@ -146,6 +198,19 @@ class FinalAgenticSystem:
         if not item_name or len(item_name) < 2:
             return None
         
+        # Look the name up in memory first: exact, then substring, then close spelling
+        menu_by_name = self._menu_index()
+        if menu_by_name:
+            name_lower = item_name.lower()
+            item = menu_by_name.get(name_lower)
+            if item is None:
+                item = next((row for name, row in menu_by_name.items() if name_lower in name), None)
+            if item is None:
+                close = difflib.get_close_matches(name_lower, menu_by_name.keys(), n=1, cutoff=0.6)
+                item = menu_by_name[close[0]] if close else None
+            return item
+        
+        # Menu couldn't be loaded - ask the database directly
         try:
             query = """
             SELECT m.item_id, m.name, m.price, m.restaurant_id, r.name as restaurant_name
@@ -167,6 +232,17 @@ class FinalAgenticSystem:
             print(f"Search error: {e}")
             return None
 
+    def _menu_index(self):
+        """Lowercased-name index over the cached menu"""
+        rows = self.db.get_all_menu_items()
+        if rows is not self._menu_rows:
+            self._menu_rows = rows
+            self._menu_by_name_lower = {}
+            for row in rows:
+                # First item wins for duplicate names, like the old LIMIT 1 query
+                self._menu_by_name_lower.setdefault(row['_name_lower'], row)
+        return self._menu_by_name_lower
+
     def process_message(self, user_input: str):
         """
         Main processing - ALL BUGS FIXED
@@ -177,6 +253,8 @@ class FinalAgenticSystem:
 
         # Retrieve conversation history
         print("🔍 [Context] Retrieving conversation history...")
+        # Let the previous turn's write land first (normally long done)
+        self._chroma_queue.join()
         conversation_history = self.chroma.get_conversation_history(
             user_id=self.user_id,
             session_id=self.session_id,
@@ -191,10 +269,11 @@ class FinalAgenticSystem:
         # 🟢 FIXED: Better intent detection
         print("🤖 [Agent 1] Understanding your request...")
         
-        # Check if it's an add to cart request FIRST (before agent classification)
+        # Clear-cut requests are classified by pattern (no LLM call)
         user_input_lower = user_input.lower()
-        if any(keyword in user_input_lower for keyword in ['add', 'add to cart', 'i want to add']):
-            intent = 'order_placement'
+        intent = next((name for pattern, name in _FAST_INTENTS if pattern.search(user_input_lower)), None)
+        conv_result = None
+        if intent is not None:
             extracted = {}
         else:
             conv_result = self.conversation_agent.process(
@@ -214,11 +293,21 @@ class FinalAgenticSystem:
             print("🍽️  [Agent 2] Finding menu items with SMART FILTERING...")
 
             try:
-                all_items = self.db.search_menu_items(
-                    search_term="",
-                    cuisine_filter=None,
-                    dietary_restrictions=[]
-                )
+                # Let the database drop non-matching items and rank the rest
+                # the same way _intelligent_filter_by_query does; fall back to
+                # the whole menu when nothing matches
+                query_lower = user_input.lower()
+                keywords = search_keywords(query_lower)
+                all_items = []
+                if keywords:
+                    all_items = self.db.search_menu_items(
+                        keywords=keywords,
+                        name_boosts=[w for w in self.NAME_BOOST_TERMS if w in query_lower],
+                        text_boosts=[w for w in self.TEXT_BOOST_TERMS if w in query_lower]
+                    )
+                if not all_items:
+                    # In-memory menu, already lowercased for scoring
+                    all_items = self.db.get_all_menu_items()
 
                 if all_items:
                     menu_items = self._intelligent_filter_by_query(user_input, all_items)
@@ -243,7 +332,7 @@ class FinalAgenticSystem:
             # Format recommendations
             recommendations = []
             for idx, item in enumerate(menu_items[:5], 1):
-                tags = json.loads(item['tags']) if isinstance(item['tags'], str) else item['tags']
+                tags = item['tags']
 
                 recommendations.append({
                     'rank': idx,
@@ -257,23 +346,18 @@ class FinalAgenticSystem:
                     'tags': tags or []
                 })
 
-            conv_result = self.conversation_agent.process(
-                user_input=user_input,
-                user_preferences=self.user_data.get('preferences', {}),
-                conversation_history=conversation_history
-            )
-            conv_message = conv_result.get('conversational_response', '')
+            # Intent detection above already produced the reply (unless it
+            # was matched by pattern)
+            if conv_result is not None:
+                conv_message = conv_result.get('conversational_response', '')
+            else:
+                conv_message = _FAST_RECOMMENDATION_REPLY
 
-            try:
-                self.chroma.store_conversation(
-                    user_id=self.user_id,
-                    session_id=self.session_id,
-                    user_message=user_input,
-                    agent_response=conv_message,
-                    intent=intent
-                )
-            except Exception as e:
-                print(f"ChromaDB: {e}")
+            self._store_conversation(
+                user_message=user_input,
+                agent_response=conv_message,
+                intent=intent
+            )
 
             return {
                 'status': 'success',
@@ -312,16 +396,11 @@ class FinalAgenticSystem:
             if cart_result['success']:
                 cart_state = cart_result['cart']
 
-                try:
-                    self.chroma.store_conversation(
-                        user_id=self.user_id,
-                        session_id=self.session_id,
-                        user_message=user_input,
-                        agent_response=f"Added {quantity}x {item['name']} to cart",
-                        intent=intent
-                    )
-                except Exception as e:
-                    print(f"ChromaDB: {e}")
+                self._store_conversation(
+                    user_message=user_input,
+                    agent_response=f"Added {quantity}x {item['name']} to cart",
+                    intent=intent
+                )
 
                 return {
                     'status': 'success',
@@ -336,26 +415,40 @@ class FinalAgenticSystem:
                     'intent': intent
                 }
 
+        # ============================================
+        # CHECKOUT / CART VIEW (pattern-matched only)
+        # ============================================
+        elif intent == 'checkout' and conv_result is None:
+            checkout_result = self.checkout()
+            return {
+                **checkout_result,
+                'status': 'success' if checkout_result.get('success') else 'error',
+                'intent': intent
+            }
+
+        elif intent == 'cart_view':
+            cart_state = self.get_cart()
+            if cart_state['items']:
+                message = f"You have {len(cart_state['items'])} item(s) in your cart. Total: ₹{float(cart_state['total'])}"
+            else:
+                message = "Your cart is empty."
+            return {
+                'status': 'success',
+                'message': message,
+                'cart': cart_state,
+                'intent': intent
+            }
+
         # ============================================
         # OTHER INTENTS
         # ============================================
         else:
-            conv_result = self.conversation_agent.process(
-                user_input=user_input,
-                user_preferences=self.user_data.get('preferences', {}),
-                conversation_history=conversation_history
+            # Reuse the reply from intent detection
+            self._store_conversation(
+                user_message=user_input,
+                agent_response=conv_result.get('conversational_response', ''),
+                intent=intent
             )
-            
-            try:
-                self.chroma.store_conversation(
-                    user_id=self.user_id,
-                    session_id=self.session_id,
-                    user_message=user_input,
-                    agent_response=conv_result.get('conversational_response', ''),
-                    intent=intent
-                )
-            except Exception as e:
-                print(f"ChromaDB: {e}")
 
             return {
                 'status': 'success',
@@ -387,7 +480,7 @@ class FinalAgenticSystem:
         print(f"   Items: {len(cart_state['items'])}")
         print(f"   Total: ₹{cart_state['total']}")
 
-        delivery_address = self.db.get_user_address(self.user_id)
+        delivery_address = self._delivery_address
 
         order_items_with_names = []
         for item in cart_state['items']:
@@ -409,16 +502,11 @@ class FinalAgenticSystem:
         if order_id:
             print(f"   Order placed successfully!")
 
-            try:
-                self.chroma.store_conversation(
-                    user_id=self.user_id,
-                    session_id=self.session_id,
-                    user_message="Checkout completed",
-                    agent_response=f"Order #{order_id} placed for ₹{float(cart_state['total'])}",
-                    intent='checkout'
-                )
-            except Exception as e:
-                print(f"ChromaDB: {e}")
+            self._store_conversation(
+                user_message="Checkout completed",
+                agent_response=f"Order #{order_id} placed for ₹{float(cart_state['total'])}",
+                intent='checkout'
+            )
 
             return {
                 'success': True,
@@ -438,5 +526,8 @@ class FinalAgenticSystem:
     def cleanup(self):
         """Cleanup"""
         print("\n🧹 Cleaning up...")
+        # Flush queued Chroma writes, then stop the writer
+        self._chroma_queue.put(None)
+        self._chroma_writer.join(timeout=5)
         self.db.disconnect()
         print("Cleanup complete")
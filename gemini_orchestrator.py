@@ -3,15 +3,16 @@ GEMINI ORCHESTRATOR - WITH REINFORCEMENT LEARNING
 Same RL integration as LangChain version
 """
 
-import json
+import asyncio
+import logging
+import threading
 import uuid
 import re
 import os
-import sys
-from typing import Dict, List, Optional, Any
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
-sys.path.insert(0, '.')
+import numpy as np
 
 try:
     import google.generativeai as genai
@@ -19,13 +20,74 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+from agents import get_shared_agent
 from agents.conversation_agent import ConversationAgent
 from agents.recommendation_agent import RecommendationAgent
 from agents.order_handler_agent import OrderHandlerAgent
 from database.db_manager import DatabaseManager
 from vector_store.chroma_manager import ChromaDBManager
 from cart_manager import CartManager
-from rl_learning_loop import SimpleRLLoop  # ✅ NEW: RL module
+from utils.fast_intent import match_fast_intent
+from utils.menu_index import MenuNameIndex
+from rl_learning_loop import SimpleRLLoop, warm_up_scorer  # ✅ NEW: RL module
+from utils.semantic_cache import semantic_cache
+
+logger = logging.getLogger(__name__)
+
+# Gemini service tier for background calls (history summaries), which
+# can wait for the discounted queue
+BACKGROUND_SERVICE_TIER = os.environ.get("GEMINI_BACKGROUND_TIER", "flex")
+
+
+def _sdk_supports_service_tier() -> bool:
+    """Whether the installed SDK's GenerationConfig has a service_tier field"""
+    try:
+        return "service_tier" in genai.protos.GenerationConfig.meta.fields
+    except AttributeError:
+        return False
+
+# Order parsing - quantity digits and a leading request phrase
+_DIGIT_RE = re.compile(r'\d+')
+_PREFIX_RE = re.compile(r'^(?:add|i want|get me)\b\s*')
+
+# Recommendation requests for users whose RL top-K is trusted skip the
+# conversation agent and get a templated reply
+_RECOMMEND_RE = re.compile(r'\b(?:recommend|suggest|what should i (?:eat|order|have))\b')
+RL_CONFIDENCE_THRESHOLD = 0.8
+CONFIDENT_RECOMMENDATION_REPLY = "Based on your favourites, you might like:"
+
+# Intents reused from the semantic cache. Cart and order intents carry
+# quantities and references ("add 2 of those") that a near-duplicate
+# message wouldn't share, so they are always classified fresh.
+SEMANTIC_CACHE_INTENTS = frozenset({'browse_menu', 'search_items', 'recommendation_request'})
+# Short replies and ones that point back at the conversation ("yes", "the
+# second one", "more like that") depend on context, so they bypass the cache
+SEMANTIC_CACHE_MIN_WORDS = 3
+_ANAPHORA_RE = re.compile(
+    r"\b(?:yes|yeah|yep|no|nope|ok|okay|sure|it|that|this|those|these|them|one|ones"
+    r"|same|again|more|other|another|first|second|third|last)\b"
+)
+
+# Older turns are folded into one summary message once the history passes
+# HISTORY_MAX_MESSAGES, keeping the last HISTORY_KEEP_MESSAGES verbatim
+HISTORY_MAX_MESSAGES = 20
+HISTORY_KEEP_MESSAGES = 10
+SUMMARY_PROMPT = (
+    "Summarize this food-ordering conversation in one short paragraph. Keep "
+    "what the customer likes or avoids, items discussed, and cart or order "
+    "changes.\n\n{transcript}"
+)
+
+
+def _context_free(user_input: str) -> bool:
+    """Whether a message can be classified without the conversation so far"""
+    text = user_input.lower()
+    return len(text.split()) >= SEMANTIC_CACHE_MIN_WORDS and not _ANAPHORA_RE.search(text)
+
+
+def _format_recommendations(recommendations: List[Dict]) -> str:
+    """Bullet list of the top 5 RL results (menu rows always carry name and price)"""
+    return "\n".join([f"• {r['name']} - ₹{r['price']}" for r in recommendations[:5]])
 
 
 class GeminiOrchestrator:
@@ -39,11 +101,14 @@ class GeminiOrchestrator:
     - Explores new items strategically
     """
     
-    def __init__(self, user_id: int, api_key: Optional[str] = None, model: str = "gemini-2.5-flash"):
-        """Initialize orchestrator with agents AND RL loop"""
-        print("\n" + "="*80)
-        print("🌟 INITIALIZING GEMINI ORCHESTRATOR WITH RL")
-        print("="*80)
+    def __init__(self, user_id: int, api_key: Optional[str] = None, model: str = "gemini-2.5-flash",
+                 user_data: Optional[Dict] = None):
+        """
+        Initialize orchestrator with agents AND RL loop
+
+        user_data: profile already loaded by the caller (skips the DB lookup)
+        """
+        logger.info("Initializing Gemini orchestrator for user %s", user_id)
         
         if not GEMINI_AVAILABLE:
             raise ImportError("google-generativeai not installed")
@@ -55,6 +120,8 @@ class GeminiOrchestrator:
         # ✅ Initialize RL Loop
         self.rl_loop = SimpleRLLoop()
         self.rl_loop.load_state()
+        # First numba compile takes seconds; do it here, not on the first turn
+        warm_up_scorer()
         
         # Configure Gemini
         api_key = "YOUR API KEY HERE"  # Replace with your actual API key
@@ -62,72 +129,80 @@ class GeminiOrchestrator:
             raise ValueError("GOOGLE_API_KEY not found")
         
         genai.configure(api_key=api_key)
-        print(f"✓ Gemini API configured")
+        logger.debug("Gemini API configured")
         
         # Initialize database components
         try:
-            self.db = DatabaseManager()
-            self.chroma = ChromaDBManager()
+            self.db = DatabaseManager.get_shared()
+            self.chroma = ChromaDBManager.get_shared()
             self.cart = CartManager(self.db)
-            print("✓ Database components initialized")
+            logger.debug("Database components initialized")
         except Exception as e:
-            print(f"⚠️ Database warning: {e}")
+            logger.warning("Database unavailable: %s", e)
             self.db = None
             self.chroma = None
             self.cart = None
         
         # Load user data
-        self.user_data = self._load_user_data()
+        self.user_data = user_data if user_data is not None else self._load_user_data()
         
         # Initialize agents
-        print("📍 Initializing agents...")
-        self.conversation_agent = ConversationAgent(model_name="mistral:latest")
-        self.recommendation_agent = RecommendationAgent(model_name="qwen2.5:latest")
-        self.order_handler_agent = OrderHandlerAgent(model_name="llama3:latest")
-        print("✓ Agents loaded")
+        self.conversation_agent = ConversationAgent()
+        self.recommendation_agent = get_shared_agent(RecommendationAgent)
+        self.order_handler_agent = get_shared_agent(OrderHandlerAgent)
+        logger.debug("Agents loaded")
         
         # Gemini model
+        self.generation_config = {
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "max_output_tokens": 1024,
+        }
         self.gemini_model = genai.GenerativeModel(
             model_name=model,
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "max_output_tokens": 1024,
-            }
+            generation_config=self.generation_config
         )
+        # Background calls add the service tier when the SDK can send it
+        if _sdk_supports_service_tier():
+            self.background_config = {**self.generation_config, "service_tier": BACKGROUND_SERVICE_TIER}
+        else:
+            logger.debug("Gemini SDK has no service_tier; background calls use the default tier")
+            self.background_config = self.generation_config
         
         # Conversation history
         self.conversation_history = []
+        self._summarizing = False
         self.current_state_id = None  # ✅ Track current RL state
+        # Dish name -> menu row, over the cached menu
+        self._menu_names = MenuNameIndex(self.db) if self.db else None
+        # item_id -> menu row, rebuilt whenever the menu cache refreshes
+        self._menu_rows = None
+        self._menu_by_id = {}
+        # Mean embedding of the user's preferred items; reset when they pick something
+        self._preference_vector = None
         
-        print(f"\n✅ Orchestrator Ready (with RL)")
-        print(f"   User: {self.user_data.get('name', 'Guest')}")
-        print(f"   Session: {self.session_id[:8]}...")
-        print("="*80 + "\n")
+        logger.info("Gemini orchestrator ready (user %s, session %s)",
+                    self.user_data.get('name', 'Guest'), self.session_id[:8])
     
     def _load_user_data(self) -> Dict:
         """Load user profile"""
-        try:
-            if not self.db:
-                return self._default_user()
-            
-            user = self.db.get_user_by_id(self.user_id)
-            if not user:
-                return self._default_user()
-            
-            prefs = json.loads(user['preferences']) if isinstance(user['preferences'], str) else user['preferences']
-            dietary = json.loads(user['dietary_restrictions']) if isinstance(user['dietary_restrictions'], str) else user['dietary_restrictions']
-            
-            return {
-                'user_id': self.user_id,
-                'name': user.get('name', 'Guest'),
-                'email': user.get('email', ''),
-                'address': user.get('address', 'Unknown'),
-                'preferences': prefs or {},
-                'dietary_restrictions': dietary or []
-            }
-        except:
+        if not self.db:
             return self._default_user()
+        
+        # The DB layer logs query errors and returns None
+        user = self.db.get_user_by_id(self.user_id)
+        if not user:
+            return self._default_user()
+        
+        # JSON columns come back decoded from the DB layer
+        return {
+            'user_id': self.user_id,
+            'name': user.get('name', 'Guest'),
+            'email': user.get('email', ''),
+            'address': user.get('address', 'Unknown'),
+            'preferences': user.get('preferences') or {},
+            'dietary_restrictions': user.get('dietary_restrictions') or []
+        }
     
     def _default_user(self) -> Dict:
         return {
@@ -141,112 +216,272 @@ class GeminiOrchestrator:
     
     def process_user_input(self, user_input: str) -> Dict[str, Any]:
         """Process with RL-enhanced recommendations"""
-        print(f"\n{'▶'*80}")
-        print(f"USER: {user_input}")
-        print(f"{'▶'*80}\n")
+        logger.info("USER: %s", user_input)
         
         try:
-            # Step 1: Intent
-            print("Step 1: Classifying intent...")
+            intent_result = (self._confident_intent(user_input) or match_fast_intent(user_input)
+                             or self._classify_intent(user_input))
+            return self._respond(user_input, intent_result)
+            
+        except Exception as e:
+            logger.exception("Turn failed: %s", e)
+            return {
+                "status": "error",
+                "message": f"Error: {str(e)}",
+                "error": str(e)
+            }
+    
+    async def aprocess_user_input(self, user_input: str) -> Dict[str, Any]:
+        """
+        Async process_user_input for callers on an event loop
+
+        Intent classification overlaps with the recommendation shortlist
+        lookup, which only needs the message; the shortlist is dropped if
+        the intent turns out not to need it. Blocking DB/cart work runs in
+        a worker thread.
+        """
+        logger.info("USER: %s", user_input)
+        
+        try:
+            intent_result = self._confident_intent(user_input) or match_fast_intent(user_input)
+            if intent_result is not None:
+                return await asyncio.to_thread(self._respond, user_input, intent_result)
+            intent_result, candidates = await asyncio.gather(
+                self._aclassify_intent(user_input),
+                self._aprefetch_candidates(user_input)
+            )
+            return await asyncio.to_thread(self._respond, user_input, intent_result, candidates)
+            
+        except Exception as e:
+            logger.exception("Turn failed: %s", e)
+            return {
+                "status": "error",
+                "message": f"Error: {str(e)}",
+                "error": str(e)
+            }
+    
+    def _confident_intent(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """
+        Intent result for an obvious recommendation request from a user the
+        RL loop is confident about, or None to classify with the LLM
+        """
+        if not _RECOMMEND_RE.search(user_input.lower()):
+            return None
+        if self.rl_loop.get_confidence(self.user_id) <= RL_CONFIDENCE_THRESHOLD:
+            return None
+        logger.debug("Step 1: Confident RL recommendation (conversation agent skipped)")
+        return {
+            "intent": "recommendation_request",
+            "conversational_response": CONFIDENT_RECOMMENDATION_REPLY
+        }
+    
+    def _cache_intent(self, embedding, intent_result: Dict[str, Any]) -> None:
+        if intent_result.get('intent') in SEMANTIC_CACHE_INTENTS:
+            semantic_cache.store(self.user_id, embedding, intent_result)
+    
+    def _classify_intent(self, user_input: str) -> Dict[str, Any]:
+        """
+        Step 1: Intent - a near-duplicate of an earlier message from this
+        user reuses its classification instead of calling the LLM.
+        Context-dependent messages always go to the LLM. Only the LLM step
+        is cached; cart/RL side effects still run.
+        """
+        logger.debug("Step 1: Classifying intent")
+        intent_result, embedding = None, None
+        if _context_free(user_input):
+            intent_result, embedding = semantic_cache.lookup(self.user_id, user_input)
+        if intent_result is None:
             intent_result = self.conversation_agent.process(
                 user_input=user_input,
                 user_preferences=self.user_data.get('preferences', {}),
                 conversation_history=self.conversation_history
             )
+            self._cache_intent(embedding, intent_result)
+        else:
+            logger.debug("Intent from semantic cache")
+        return intent_result
+    
+    async def _aclassify_intent(self, user_input: str) -> Dict[str, Any]:
+        """Async _classify_intent (the embedding runs in a worker thread)"""
+        logger.debug("Step 1: Classifying intent")
+        intent_result, embedding = None, None
+        if _context_free(user_input):
+            intent_result, embedding = await asyncio.to_thread(semantic_cache.lookup, self.user_id, user_input)
+        if intent_result is None:
+            intent_result = await self.conversation_agent.aprocess(
+                user_input=user_input,
+                user_preferences=self.user_data.get('preferences', {}),
+                conversation_history=self.conversation_history
+            )
+            self._cache_intent(embedding, intent_result)
+        else:
+            logger.debug("Intent from semantic cache")
+        return intent_result
+    
+    async def _aprefetch_candidates(self, user_input: str) -> Optional[List[Dict]]:
+        """Speculative recommendation shortlist; None if unavailable"""
+        if not self.db:
+            return None
+        try:
+            return await asyncio.to_thread(self._candidate_items, user_input)
+        except Exception as e:
+            logger.warning("Candidate prefetch failed: %s", e)
+            return None
+    
+    def _respond(self, user_input: str, intent_result: Dict[str, Any],
+                 candidates: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Steps 2-3: act on the classified intent and build the response"""
+        intent = intent_result.get('intent', 'general')
+        conversational_response = intent_result.get('conversational_response', '')
+        logger.info("Intent: %s", intent)
+        
+        final_response = conversational_response
+        recommendations = []
+        
+        # Step 2: RL-ENHANCED recommendations
+        if intent in ['recommendation_request', 'browse_menu', 'search_items']:
+            logger.debug("Step 2: Getting RL-optimized recommendations")
             
-            intent = intent_result.get('intent', 'general')
-            conversational_response = intent_result.get('conversational_response', '')
-            print(f"   Intent: {intent}")
-            
-            final_response = conversational_response
-            recommendations = []
-            
-            # Step 2: RL-ENHANCED recommendations
-            if intent in ['recommendation_request', 'browse_menu', 'search_items']:
-                print("\nStep 2: Getting RL-optimized recommendations...")
+            if self.db:
+                # RL only scores a vector-search shortlist, not the menu
+                if candidates is None:
+                    candidates = self._candidate_items(user_input)
                 
-                if self.db:
-                    all_items = self.db.search_menu_items("", None)
-                    
-                    # Use RL to personalize
-                    rl_recommendations = self.rl_loop.get_personalized_recommendations(
-                        self.user_id,
-                        all_items
-                    )
-                    recommendations = rl_recommendations
-                    
-                    print(f"   Found {len(recommendations)} RL-optimized items")
-                    
-                    # Record state
-                    self.current_state_id = self.rl_loop.record_recommendation_shown(
-                        self.user_id,
-                        recommendations
-                    )
-                    
-                    rec_text = "\n".join([
-                        f"• {r.get('name', 'Unknown')} - ₹{r.get('price', 0)}"
-                        for r in recommendations[:5]
-                    ])
-                    final_response = f"{conversational_response}\n\n{rec_text}"
-            
-            # Step 3: Process orders
-            elif intent in ['order_placement', 'add_to_cart']:
-                print("\nStep 3: Processing order...")
+                # Use RL to personalize
+                rl_recommendations = self.rl_loop.get_personalized_recommendations(
+                    self.user_id,
+                    candidates
+                )
+                recommendations = rl_recommendations
                 
-                item_info = self._parse_order_request(user_input)
+                logger.debug("Found %d RL-optimized items", len(recommendations))
                 
-                if item_info['item_name']:
-                    item_id = self._find_item_id(item_info['item_name'])
-                    if item_id:
-                        # Record with RL
-                        self.rl_loop.record_item_selected(self.user_id, item_id, self.current_state_id)
-                        
-                        cart_result = self.cart.add_item(item_id, item_info['quantity'])
-                        if cart_result['success']:
-                            cart_state = cart_result['cart']
-                            final_response = f"✓ {cart_result['message']}\n\nCart Total: ₹{cart_state['total']}"
-                        else:
-                            final_response = f"{cart_result['message']}"
-                    else:
-                        final_response = f"Item not found"
-                else:
-                    final_response = conversational_response
-            
-            # Store in history
-            self.conversation_history.append({"role": "user", "content": user_input})
-            self.conversation_history.append({"role": "assistant", "content": final_response})
+                # Record state
+                self.current_state_id = self.rl_loop.record_recommendation_shown(
+                    self.user_id,
+                    recommendations
+                )
+                
+                final_response = f"{conversational_response}\n\n{_format_recommendations(recommendations)}"
+        
+        # Step 3: Process orders
+        elif intent in ['order_placement', 'add_to_cart']:
+            logger.debug("Step 3: Processing order")
             
-            return {
-                "status": "success",
-                "message": final_response,
-                "recommendations": recommendations,
-                "intent": intent,
-                "session_id": self.session_id,
-                "cart": self.cart.get_cart_state() if self.cart else {}
-            }
+            item_info = self._parse_order_request(user_input)
             
+            if item_info['item_name']:
+                item_id = self._find_item_id(item_info['item_name'])
+                if item_id:
+                    # Record with RL
+                    self.rl_loop.record_item_selected(self.user_id, item_id, self.current_state_id)
+                    self._preference_vector = None
+                    
+                    cart_result = self.cart.add_item(item_id, item_info['quantity'])
+                    if cart_result['success']:
+                        cart_state = cart_result['cart']
+                        final_response = f"✓ {cart_result['message']}\n\nCart Total: ₹{cart_state['total']}"
+                    else:
+                        final_response = f"{cart_result['message']}"
+                else:
+                    final_response = f"Item not found"
+            else:
+                final_response = conversational_response
+        
+        # Store in history
+        self.conversation_history.append({"role": "user", "content": user_input})
+        self.conversation_history.append({"role": "assistant", "content": final_response})
+        self._compact_history()
+        
+        return {
+            "status": "success",
+            "message": final_response,
+            "recommendations": recommendations,
+            "intent": intent,
+            "session_id": self.session_id,
+            "cart": self.cart.get_cart_state() if self.cart else {}
+        }
+    
+    
+    def _compact_history(self):
+        """
+        Start folding older turns into a summary once the history is long
+
+        The summary is a background-tier Gemini call, so it runs on a thread
+        and never delays the turn. Only the summarized head is replaced;
+        turns appended meanwhile are kept.
+        """
+        if self._summarizing or len(self.conversation_history) <= HISTORY_MAX_MESSAGES:
+            return
+        self._summarizing = True
+        older = self.conversation_history[:-HISTORY_KEEP_MESSAGES]
+        threading.Thread(target=self._summarize_history, args=(older,), daemon=True).start()
+    
+    def _summarize_history(self, older: List[Dict]):
+        try:
+            transcript = "\n".join(f"{m['role']}: {m['content']}" for m in older)
+            response = self._generate_background(SUMMARY_PROMPT.format(transcript=transcript))
+            summary = {"role": "system", "content": f"Conversation so far: {response.text.strip()}"}
+            self.conversation_history[:len(older)] = [summary]
         except Exception as e:
-            print(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "status": "error",
-                "message": f"Error: {str(e)}",
-                "error": str(e)
-            }
+            # Without a summary the prompt window drops these turns anyway
+            logger.warning("History summary failed (%s); dropping older turns", e)
+            self.conversation_history[:len(older)] = []
+        finally:
+            self._summarizing = False
     
+    def _generate_background(self, prompt: str):
+        """Call Gemini on the background service tier"""
+        return self.gemini_model.generate_content(prompt, generation_config=self.background_config)
+
+    def _candidate_items(self, user_input: str, n_results: int = 50) -> List[Dict]:
+        """
+        Menu rows worth scoring for this request
+
+        Chroma returns the n_results items nearest to the request (nudged
+        toward the user's preferences); rows come from the cached menu.
+        Falls back to the SQL menu query when the vector index is unavailable.
+        """
+        if self.chroma:
+            try:
+                item_ids = self.chroma.query_menu_ids(
+                    user_input,
+                    preference_embedding=self._get_preference_vector(),
+                    n_results=n_results
+                )
+                menu_by_id = self._menu_index()
+                candidates = [menu_by_id[item_id] for item_id in item_ids if item_id in menu_by_id]
+                if candidates:
+                    return candidates
+            except Exception as e:
+                logger.warning("Vector shortlist unavailable: %s", e)
+        return self.db.search_menu_items("", None)
+
+    def _menu_index(self) -> Dict[int, Dict]:
+        """item_id -> row over the cached menu"""
+        rows = self.db.get_all_menu_items()
+        if rows is not self._menu_rows:
+            self._menu_rows = rows
+            self._menu_by_id = {row['item_id']: row for row in rows}
+        return self._menu_by_id
+
+    def _get_preference_vector(self) -> Optional[np.ndarray]:
+        """Preference-weighted mean embedding of the user's top items (cached)"""
+        if self._preference_vector is None:
+            top = self.rl_loop.top_preferences(self.user_id, 20)
+            embeddings = self.chroma.get_menu_embeddings([i for i, _ in top])
+            if embeddings:
+                vector = sum(w * embeddings[i] for i, w in top if i in embeddings)
+                norm = np.linalg.norm(vector)
+                self._preference_vector = vector / norm if norm else None
+        return self._preference_vector
+
     def _parse_order_request(self, user_input: str) -> Dict[str, Any]:
         """Parse item name and quantity"""
-        numbers = re.findall(r'\d+', user_input)
+        numbers = _DIGIT_RE.findall(user_input)
         quantity = int(numbers[0]) if numbers else 1
         
-        item_name = user_input.lower()
-        for num in numbers:
-            item_name = item_name.replace(num, '').strip()
-        
-        for prefix in ['add', 'i want', 'get me']:
-            if item_name.startswith(prefix):
-                item_name = item_name[len(prefix):].strip()
+        item_name = _PREFIX_RE.sub('', _DIGIT_RE.sub('', user_input.lower()).strip()).strip()
         
         return {
             'item_name': item_name.strip() if item_name else None,
@@ -255,26 +490,21 @@ class GeminiOrchestrator:
     
     def _find_item_id(self, item_name: str) -> Optional[int]:
         """Find item ID"""
-        try:
-            if not self.db:
-                return None
-            items = self.db.search_menu_items(search_term=item_name)
-            if items:
-                return items[0]['item_id']
-        except:
-            pass
-        
-        return None
+        if not self.db:
+            return None
+        # In memory first; the DB search only runs for names it can't place
+        item = self._menu_names.find(item_name)
+        if item:
+            return item['item_id']
+        items = self.db.search_menu_items(search_term=item_name)
+        return items[0]['item_id'] if items else None
     
-    def _get_past_orders(self) -> List[Dict]:
+    def get_past_orders(self) -> List[Dict]:
         """Get past orders"""
-        try:
-            if not self.db:
-                return []
-            orders = self.db.get_user_orders(self.user_id, limit=5)
-            return [{"order_id": o.get('order_id'), "items": o.get('items', [])} for o in orders] if orders else []
-        except:
+        if not self.db:
             return []
+        orders = self.db.get_user_orders(self.user_id, limit=5)
+        return [{"order_id": o.get('order_id'), "items": o.get('items', [])} for o in orders]
     
     def get_cart(self) -> Dict:
         """Get cart state"""
@@ -300,8 +530,6 @@ class GeminiOrchestrator:
                 remaining = cart_state.get('minimum_order', 0) - cart_state.get('subtotal', 0)
                 return {'success': False, 'message': f'Need ₹{remaining} more'}
             
-            delivery_address = self.db.get_user_address(self.user_id)
-            
             formatted_items = []
             for item in cart_state.get('items', []):
                 formatted_items.append({
@@ -312,29 +540,31 @@ class GeminiOrchestrator:
                     'total_price': item.get('total_price')
                 })
             
-            order_id = self.db.create_order(
+            # Delivery address is filled in from the user's profile
+            order = self.db.place_order(
                 user_id=self.user_id,
                 restaurant_id=cart_state.get('restaurant_id'),
                 order_items=formatted_items,
                 total_amount=float(cart_state.get('total', 0)),
-                delivery_address=delivery_address,
                 special_instructions=None
             )
             
-            if order_id:
+            if order:
+                order_id = order['order_id']
+                delivery_address = order['delivery_address']
                 order_data = {
                     'items': formatted_items,
                     'total': cart_state.get('total', 0)
                 }
                 reward_info = self.rl_loop.record_order_completed(self.user_id, order_data)
+                self._preference_vector = None
                 
-                # Save RL state
-                self.rl_loop.save_state()
-                print("entered rl save")
+                # Save RL state in the background - not on the checkout path
+                self.rl_loop.save_state_async()
                 
                 self.cart.clear_cart()
                 
-                print(f"\nOrder processed with RL learning!")
+                logger.info("Order processed with RL learning")
                 
                 return {
                     'success': True,
@@ -348,7 +578,7 @@ class GeminiOrchestrator:
                 return {'success': False, 'message': 'Failed to create order'}
                 
         except Exception as e:
-            print(f"Checkout error: {e}")
+            logger.error("Checkout error: %s", e)
             return {'success': False, 'error': str(e)}
     
     def get_rl_summary(self) -> Dict:
@@ -358,9 +588,11 @@ class GeminiOrchestrator:
     def cleanup(self):
         """Cleanup - save RL state"""
         try:
-            self.rl_loop.save_state()  
+            # Final save after any pending background writes
+            self.rl_loop.close()
+            self.rl_loop.save_state()
             if self.db:
                 self.db.disconnect()
-            print("\nCleanup complete (RL state saved)")
+            logger.info("Cleanup complete (RL state saved)")
         except Exception as e:
-            print(f"Cleanup error: {e}")
+            logger.error("Cleanup error: %s", e)
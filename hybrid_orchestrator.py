@@ -16,7 +16,10 @@ BENEFITS:
 ============================================================================
 """
 
+import asyncio
 import json
+import logging
+import re
 from typing import Dict, Optional, Literal
 import os
 
@@ -27,6 +30,12 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# Words that mark a query as complex. Matched at the start of a word, so
+# "recommendations" and "suggested" count but "somehow" doesn't.
+_COMPLEX_RE = re.compile(r'\b(?:compar|recommend|suggest|best|similar|what|why|how)', re.IGNORECASE)
+
 
 class HybridOrchestrator:
     """
@@ -47,43 +56,49 @@ class HybridOrchestrator:
             mode: "auto" (smart routing), "langchain" (force local), "gemini" (force cloud)
             gemini_api_key: Optional Gemini API key
         """
-        print("\n" + "="*80)
-        print("🔄 INITIALIZING HYBRID ORCHESTRATOR")
-        print("="*80)
+        logger.info("Initializing hybrid orchestrator for user %s (mode %s)", user_id, mode)
         
         self.user_id = user_id
         self.mode = mode
         self.gemini_api_key = gemini_api_key or os.getenv("GOOGLE_API_KEY")
         
+        # Auto mode builds the Gemini secondary on first use (see
+        # secondary_orchestrator); other modes never have one
+        self._secondary = None
+        self._secondary_pending = False
+        
         # Initialize primary orchestrator
         if mode == "langchain":
-            print("📍 Mode: LangChain (Local Ollama)")
             self.primary_orchestrator = LangChainOrchestrator(user_id, use_local_only=True)
-            self.secondary_orchestrator = None
         elif mode == "gemini":
             if not self.gemini_api_key or not GEMINI_AVAILABLE:
-                print("⚠️ Ggememini unavailable, using LangChain fallback")
+                logger.warning("Gemini unavailable, using LangChain fallback")
                 self.primary_orchestrator = LangChainOrchestrator(user_id, use_local_only=True)
-                self.secondary_orchestrator = None
             else:
-                print("Mode: Gemini")
                 self.primary_orchestrator = GeminiOrchestrator(user_id, self.gemini_api_key)
-                self.secondary_orchestrator = None
         else:  # auto
-            print("Mode: Auto-routing (Smart Selection)")
             self.primary_orchestrator = LangChainOrchestrator(user_id, use_local_only=True)
             
             if self.gemini_api_key and GEMINI_AVAILABLE:
-                try:
-                    self.secondary_orchestrator = GeminiOrchestrator(user_id, self.gemini_api_key)
-                    print("Secondary Gemini available as backup")
-                except Exception as e:
-                    print(f"Gemini backup unavailable: {e}")
-                    self.secondary_orchestrator = None
-            else:
-                self.secondary_orchestrator = None
+                self._secondary_pending = True
+                logger.debug("Secondary Gemini will start on first complex query")
         
-        print("="*80 + "\n")
+    
+    @property
+    def secondary_orchestrator(self):
+        """Gemini secondary (auto mode), built the first time a route needs it"""
+        if self._secondary_pending:
+            self._secondary_pending = False
+            try:
+                # Reuse the profile the primary already loaded
+                self._secondary = GeminiOrchestrator(
+                    self.user_id, self.gemini_api_key,
+                    user_data=self.primary_orchestrator.user_data
+                )
+                logger.info("Secondary Gemini available as backup")
+            except Exception as e:
+                logger.warning("Gemini backup unavailable: %s", e)
+        return self._secondary
     
     def process_user_input(self, user_input: str, force_model: Optional[str] = None) -> Dict:
         """
@@ -103,14 +118,44 @@ class HybridOrchestrator:
         else:
             return self._auto_route(user_input)
     
+    async def aprocess_user_input(self, user_input: str, force_model: Optional[str] = None) -> Dict:
+        """
+        Async process_user_input - same routing; orchestrators with an async
+        path are awaited directly, the rest run in a worker thread
+        """
+        if force_model == "gemini" and self.secondary_orchestrator:
+            use_gemini = True
+        elif force_model == "langchain" or self.mode == "langchain":
+            use_gemini = False
+        else:
+            use_gemini = self._is_complex(user_input) and self.secondary_orchestrator is not None
+        
+        first = self.secondary_orchestrator if use_gemini else self.primary_orchestrator
+        try:
+            return await self._aprocess_with(first, user_input)
+        except Exception as e:
+            logger.warning("Orchestrator error: %s", e)
+            # The other orchestrator - the secondary is only built if needed here
+            second = self.primary_orchestrator if use_gemini else self.secondary_orchestrator
+            if second is None:
+                raise
+            logger.info("Falling back to the other orchestrator")
+            return await self._aprocess_with(second, user_input)
+    
+    @staticmethod
+    async def _aprocess_with(orchestrator, user_input: str) -> Dict:
+        if hasattr(orchestrator, "aprocess_user_input"):
+            return await orchestrator.aprocess_user_input(user_input)
+        return await asyncio.to_thread(orchestrator.process_user_input, user_input)
+    
     def _process_with_langchain(self, user_input: str) -> Dict:
         """Process using LangChain"""
         try:
             return self.primary_orchestrator.process_user_input(user_input)
         except Exception as e:
-            print(f"LangChain error: {e}")
+            logger.warning("LangChain error: %s", e)
             if self.secondary_orchestrator:
-                print("Falling back to Gemini...")
+                logger.info("Falling back to Gemini")
                 return self._process_with_gemini(user_input)
             raise
     
@@ -121,29 +166,28 @@ class HybridOrchestrator:
         try:
             return self.secondary_orchestrator.process_user_input(user_input)
         except Exception as e:
-            print(f"⚠️ Gemini error: {e}")
-            print("Falling back to LangChain...")
+            logger.warning("Gemini error: %s", e)
+            logger.info("Falling back to LangChain")
             return self._process_with_langchain(user_input)
     
+    def _is_complex(self, user_input: str) -> bool:
+        """Whether the query needs Gemini-level reasoning"""
+        return _COMPLEX_RE.search(user_input) is not None
+    
     def _auto_route(self, user_input: str) -> Dict:
         """Intelligently route based on query complexity"""
-        complexity_indicators = {
-            'simple': ['show', 'list', 'menu', 'cart', 'price', 'add', 'remove'],
-            'complex': ['compare', 'recommend', 'suggest', 'best', 'similar', 'what', 'why', 'how']
-        }
-        
-        is_complex = any(word in user_input.lower() for word in complexity_indicators['complex'])
+        is_complex = self._is_complex(user_input)
         
         if is_complex and self.secondary_orchestrator:
-            print("Complex query → Routing to Gemini")
+            logger.debug("Complex query → routing to Gemini")
             return self._process_with_gemini(user_input)
         else:
-            print("Simple query → Using Local Ollama")
+            logger.debug("Simple query → using local Ollama")
             return self._process_with_langchain(user_input)
     
     def cleanup(self):
         """Cleanup both orchestrators"""
         self.primary_orchestrator.cleanup()
-        if self.secondary_orchestrator:
-            self.secondary_orchestrator.cleanup()
-        print("Hybrid orchestrator cleanup complete")
+        if self._secondary:
+            self._secondary.cleanup()
+        logger.info("Hybrid orchestrator cleanup complete")
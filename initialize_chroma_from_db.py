@@ -1,12 +1,111 @@
 """
 Initialize ChromaDB with Menu Items from PostgreSQL Database
+
+Optional: --enrich (or ENRICH_MENU=1) asks Gemini for a search-friendly
+description and extra tags per item before indexing. All items go in one
+Gemini Batch API job (half the price of per-item calls), so this is meant
+for offline runs. Requires: pip install google-genai, GOOGLE_API_KEY
 """
 
+import os
+import sys
+import tempfile
+import time
+
 from vector_store.chroma_manager import ChromaDBManager
 from database.db_manager import DatabaseManager
-import json
+from utils import fastjson
+from utils.llm_json import parse_llm_json
+
+try:
+    from google import genai as genai_sdk
+    GENAI_AVAILABLE = True
+except ImportError:
+    GENAI_AVAILABLE = False
+
+ENRICH_MODEL = os.environ.get("ENRICH_MODEL", "gemini-2.5-flash")
+BATCH_POLL_INTERVAL = 30  # seconds
+BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+ENRICH_PROMPT = """Describe this dish for a food search index.
+Name: {name}
+Cuisine: {cuisine_type}
+Description: {description}
+Tags: {tags}
+
+Return JSON: {{"description": "<one sentence: ingredients, taste, texture>", "tags": ["<3-6 lowercase search tags>"]}}"""
+
+
+def batch_enrich_menu_items(menu_items):
+    """
+    Enrich menu items with one Gemini Batch API job
+
+    Writes one JSONL request per item (keyed by item_id), uploads it, waits
+    for the batch and merges each response's description/tags into the
+    item. Items without a usable response are left unchanged.
+    """
+    client = genai_sdk.Client(api_key=os.environ["GOOGLE_API_KEY"])
 
-def initialize_chroma_from_database():
+    with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as f:
+        for item in menu_items:
+            prompt = ENRICH_PROMPT.format(
+                name=item['name'],
+                cuisine_type=item['cuisine_type'] or '',
+                description=item['description'],
+                tags=", ".join(item['tags'])
+            )
+            f.write(fastjson.dumps_bytes({
+                "key": str(item['item_id']),
+                "request": {
+                    "contents": [{"parts": [{"text": prompt}], "role": "user"}],
+                    "generation_config": {"response_mime_type": "application/json"}
+                }
+            }) + b"\n")
+        requests_path = f.name
+
+    try:
+        uploaded = client.files.upload(
+            file=requests_path,
+            config={"display_name": "menu-enrichment", "mime_type": "jsonl"}
+        )
+    finally:
+        os.unlink(requests_path)
+
+    job = client.batches.create(model=ENRICH_MODEL, src=uploaded.name,
+                                config={"display_name": "menu-enrichment"})
+    print(f"   Batch job {job.name} submitted ({len(menu_items)} items)")
+    while job.state.name not in BATCH_DONE_STATES:
+        time.sleep(BATCH_POLL_INTERVAL)
+        job = client.batches.get(name=job.name)
+
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        print(f"⚠️ Batch job ended in {job.state.name}; indexing without enrichment")
+        return menu_items
+
+    items_by_key = {str(item['item_id']): item for item in menu_items}
+    enriched = 0
+    for line in client.files.download(file=job.dest.file_name).splitlines():
+        if not line.strip():
+            continue
+        result = fastjson.loads(line)
+        item = items_by_key.get(result.get("key"))
+        try:
+            text = result["response"]["candidates"][0]["content"]["parts"][0]["text"]
+            extra = parse_llm_json(text)
+        except (KeyError, IndexError, ValueError):
+            continue
+        if item is None:
+            continue
+        if extra.get("description"):
+            item['description'] = f"{item['description']} {extra['description']}".strip()
+        item['tags'] = list(dict.fromkeys(item['tags'] + [str(t).lower() for t in extra.get("tags", [])]))
+        enriched += 1
+
+    print(f"✓ Enriched {enriched}/{len(menu_items)} menu items")
+    return menu_items
+
+
+def initialize_chroma_from_database(enrich: bool = False):
     """Load menu items from PostgreSQL and index in ChromaDB"""
     
     print("\n" + "="*80)
@@ -14,7 +113,7 @@ def initialize_chroma_from_database():
     print("="*80)
     
     # Initialize managers
-    db = DatabaseManager()
+    db = DatabaseManager.get_shared()
     chroma = ChromaDBManager()
     
     # Fetch all menu items from database
@@ -33,10 +132,21 @@ def initialize_chroma_from_database():
             'restaurant_name': item['restaurant_name'],
             'price': float(item['price']),
             'cuisine_type': item['cuisine_type'],
-            'tags': item['tags'] if isinstance(item['tags'], list) else json.loads(item['tags'] or '[]')
+            'tags': item['tags'] or []
         })
     
+    if enrich:
+        if GENAI_AVAILABLE and os.environ.get("GOOGLE_API_KEY"):
+            print("\n[Gemini] Enriching menu items (batch job)...")
+            menu_items = batch_enrich_menu_items(menu_items)
+        else:
+            print("⚠️ Enrichment needs google-genai and GOOGLE_API_KEY; skipping")
+
     # Index in ChromaDB
+    if chroma.menu_index_outdated():
+        # HNSW distance can't be changed in place; rebuild under the new settings
+        print("\n[ChromaDB] Recreating menu collection with cosine HNSW index...")
+        chroma.reset_menu_collection()
     print("\n[ChromaDB] Indexing menu items...")
     chroma.index_menu_items(menu_items)
     
@@ -62,4 +172,6 @@ def initialize_chroma_from_database():
     print("\n")
 
 if __name__ == "__main__":
-    initialize_chroma_from_database()
\ No newline at end of file
+    initialize_chroma_from_database(
+        enrich="--enrich" in sys.argv or os.environ.get("ENRICH_MENU") == "1"
+    )
@@ -9,23 +9,43 @@ RL Integration Points:
 4. Periodic: Save/load learned weights
 """
 
-import json
+import asyncio
+import logging
 import uuid
 import re
+from collections import deque
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import sys
-
-sys.path.insert(0, '.')
 
+from agents import get_shared_agent
 from agents.conversation_agent import ConversationAgent
 from agents.recommendation_agent import RecommendationAgent
 from agents.order_handler_agent import OrderHandlerAgent
 from database.db_manager import DatabaseManager
 from vector_store.chroma_manager import ChromaDBManager
 from cart_manager import CartManager
+from utils.fast_intent import match_fast_intent
+from utils.menu_index import MenuNameIndex
 from rl_learning_loop import SimpleRLLoop
 
+logger = logging.getLogger(__name__)
+
+# Order parsing - quantity digits and a leading request phrase
+_DIGIT_RE = re.compile(r'\d+')
+_PREFIX_RE = re.compile(r'^(?:add|i want|get me)\b\s*')
+
+# Messages (user + assistant) kept in the session history; older ones are
+# evicted as new turns arrive. evict_history() trims this further per prompt.
+HISTORY_MAX_MESSAGES = 20
+
+
+def _format_recommendations(recommendations: List[Dict]) -> str:
+    """Bullet list of the top 5 RL results (menu rows always carry name and price)"""
+    return "\n".join([
+        f"• {r['name']} - ₹{r['price']} (RL Score: {r['rl_score']:.2f})"
+        for r in recommendations[:5]
+    ])
+
 
 class LangChainOrchestrator:
     """
@@ -38,11 +58,14 @@ class LangChainOrchestrator:
     - Explores new items strategically (epsilon-greedy)
     """
     
-    def __init__(self, user_id: int, use_local_only: bool = True, gemini_key: Optional[str] = None):
-        """Initialize orchestrator with agents AND RL loop"""
-        print("\n" + "="*80)
-        print("INITIALIZING LANGCHAIN ORCHESTRATOR WITH RL")
-        print("="*80)
+    def __init__(self, user_id: int, use_local_only: bool = True, gemini_key: Optional[str] = None,
+                 user_data: Optional[Dict] = None):
+        """
+        Initialize orchestrator with agents AND RL loop
+
+        user_data: profile already loaded by the caller (skips the DB lookup)
+        """
+        logger.info("Initializing LangChain orchestrator for user %s", user_id)
         
         self.user_id = user_id
         self.session_id = str(uuid.uuid4())
@@ -52,57 +75,53 @@ class LangChainOrchestrator:
         
         # Initialize database components
         try:
-            self.db = DatabaseManager()
-            self.chroma = ChromaDBManager()
+            self.db = DatabaseManager.get_shared()
+            self.chroma = ChromaDBManager.get_shared()
             self.cart = CartManager(self.db)
-            print("Database components initialized")
+            logger.debug("Database components initialized")
         except Exception as e:
-            print(f"Database warning: {e}")
+            logger.warning("Database unavailable: %s", e)
             self.db = None
             self.chroma = None
             self.cart = None
         
         # Load user data
-        self.user_data = self._load_user_data()
+        self.user_data = user_data if user_data is not None else self._load_user_data()
         
         # Initialize agents
-        print("Initializing agents...")
-        self.conversation_agent = ConversationAgent(model_name="mistral:latest")
-        self.recommendation_agent = RecommendationAgent(model_name="qwen2.5:latest")
-        self.order_handler_agent = OrderHandlerAgent(model_name="llama3:latest")
-        print("Agents loaded")
+        self.conversation_agent = ConversationAgent()
+        # Stateless agents are shared across sessions; conversation history is per session
+        self.recommendation_agent = get_shared_agent(RecommendationAgent)
+        self.order_handler_agent = get_shared_agent(OrderHandlerAgent)
+        logger.debug("Agents loaded")
         
-        # Conversation history
-        self.conversation_history = []
+        # Conversation history (last HISTORY_MAX_MESSAGES messages)
+        self.conversation_history = deque(maxlen=HISTORY_MAX_MESSAGES)
         self.current_state_id = None  
-        print(f"\nOrchestrator Ready (with RL)")
-        print(f"   User: {self.user_data.get('name', 'Guest')}")
-        print(f"   Session: {self.session_id[:8]}...")
-        print("="*80 + "\n")
+        # Dish name -> menu row, over the cached menu
+        self._menu_names = MenuNameIndex(self.db) if self.db else None
+        logger.info("LangChain orchestrator ready (user %s, session %s)",
+                    self.user_data.get('name', 'Guest'), self.session_id[:8])
     
     def _load_user_data(self) -> Dict:
         """Load user profile from database"""
-        try:
-            if not self.db:
-                return self._default_user()
-            
-            user = self.db.get_user_by_id(self.user_id)
-            if not user:
-                return self._default_user()
-            
-            prefs = json.loads(user['preferences']) if isinstance(user['preferences'], str) else user['preferences']
-            dietary = json.loads(user['dietary_restrictions']) if isinstance(user['dietary_restrictions'], str) else user['dietary_restrictions']
-            
-            return {
-                'user_id': self.user_id,
-                'name': user.get('name', 'Guest'),
-                'email': user.get('email', ''),
-                'address': user.get('address', 'Unknown'),
-                'preferences': prefs or {},
-                'dietary_restrictions': dietary or []
-            }
-        except:
+        if not self.db:
+            return self._default_user()
+        
+        # The DB layer logs query errors and returns None
+        user = self.db.get_user_by_id(self.user_id)
+        if not user:
             return self._default_user()
+        
+        # JSON columns come back decoded from the DB layer
+        return {
+            'user_id': self.user_id,
+            'name': user.get('name', 'Guest'),
+            'email': user.get('email', ''),
+            'address': user.get('address', 'Unknown'),
+            'preferences': user.get('preferences') or {},
+            'dietary_restrictions': user.get('dietary_restrictions') or []
+        }
     
     def _default_user(self) -> Dict:
         return {
@@ -116,117 +135,154 @@ class LangChainOrchestrator:
     
     def process_user_input(self, user_input: str) -> Dict[str, Any]:
         """Process user input with RL-enhanced recommendations"""
-        print(f"\n{'-'*80}")
-        print(f"USER: {user_input}")
-        print(f"{'-'*80}\n")
+        logger.info("USER: %s", user_input)
         
         try:
-            # Step 1: Intent classification
-            print("Step 1: Classifying intent...")
-            intent_result = self.conversation_agent.process(
-                user_input=user_input,
-                user_preferences=self.user_data.get('preferences', {}),
-                conversation_history=self.conversation_history
-            )
-            
-            intent = intent_result.get('intent', 'general')
-            conversational_response = intent_result.get('conversational_response', '')
-            print(f"   Intent: {intent}")
-            
-            final_response = conversational_response
-            recommendations = []
-            
-            # Step 2: RL-ENHANCED recommendations
-            if intent in ['recommendation_request', 'browse_menu', 'search_items']:
-                print("\nStep 2: Getting RL-optimized recommendations...")
-                
-                # Get all available items
-                if self.db:
-                    all_items = self.db.search_menu_items("", None)
-                    
-                    # Use RL to personalize
-                    rl_recommendations = self.rl_loop.get_personalized_recommendations(
-                        self.user_id,
-                        all_items
-                    )
-                    recommendations = rl_recommendations
-                    
-                    print(f"   Found {len(recommendations)} RL-optimized items")
-                    
-                    # Record this recommendation state for reward tracking
-                    self.current_state_id = self.rl_loop.record_recommendation_shown(
-                        self.user_id,
-                        recommendations
-                    )
-                    
-                    rec_text = "\n".join([
-                        f"• {r.get('name', 'Unknown')} - ₹{r.get('price', 0)} (RL Score: {r.get('rl_score', 0):.2f})"
-                        for r in recommendations[:5]
-                    ])
-                    final_response = f"{conversational_response}\n\n{rec_text}"
-            
-            # Step 3: Process order operations
-            elif intent in ['order_placement', 'add_to_cart']:
-                print("\nStep 3: Processing order...")
-                
-                # Parse item
-                item_info = self._parse_order_request(user_input)
-                
-                if item_info['item_name']:
-                    print(f"   Parsed: {item_info['item_name']} x{item_info['quantity']}")
-                    
-                    # Find and add to cart
-                    item_id = self._find_item_id(item_info['item_name'])
-                    if item_id:
-                        # Record item selection with RL
-                        self.rl_loop.record_item_selected(self.user_id, item_id, self.current_state_id)
-                        
-                        cart_result = self.cart.add_item(item_id, item_info['quantity'])
-                        if cart_result['success']:
-                            cart_state = cart_result['cart']
-                            final_response = f"{cart_result['message']}\n\nCart Total: ₹{cart_state['total']}"
-                        else:
-                            final_response = f"{cart_result['message']}"
-                    else:
-                        final_response = f"Item not found"
-                else:
-                    final_response = conversational_response
-            
-            # Store in history
-            self.conversation_history.append({"role": "user", "content": user_input})
-            self.conversation_history.append({"role": "assistant", "content": final_response})
+            intent_result = match_fast_intent(user_input) or self._classify_intent(user_input)
+            return self._respond(user_input, intent_result)
             
+        except Exception as e:
+            logger.exception("Turn failed: %s", e)
             return {
-                "status": "success",
-                "message": final_response,
-                "recommendations": recommendations,
-                "intent": intent,
-                "session_id": self.session_id,
-                "cart": self.cart.get_cart_state() if self.cart else {}
+                "status": "error",
+                "message": f"Error: {str(e)}",
+                "error": str(e)
             }
+    
+    async def aprocess_user_input(self, user_input: str) -> Dict[str, Any]:
+        """
+        Async process_user_input for callers on an event loop
+
+        The menu fetch for recommendations runs alongside intent
+        classification and is discarded when the intent doesn't need it.
+        Blocking DB/cart work runs in a worker thread.
+        """
+        logger.info("USER: %s", user_input)
+        
+        try:
+            # Greetings and off-topic messages need neither the LLM nor the menu
+            intent_result = match_fast_intent(user_input)
+            if intent_result is not None:
+                return await asyncio.to_thread(self._respond, user_input, intent_result)
+            intent_result, menu_items = await asyncio.gather(
+                self.conversation_agent.aprocess(
+                    user_input=user_input,
+                    user_preferences=self.user_data.get('preferences', {}),
+                    conversation_history=self.conversation_history
+                ),
+                self._aprefetch_menu()
+            )
+            return await asyncio.to_thread(self._respond, user_input, intent_result, menu_items)
             
         except Exception as e:
-            print(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Turn failed: %s", e)
             return {
                 "status": "error",
                 "message": f"Error: {str(e)}",
                 "error": str(e)
             }
     
+    def _classify_intent(self, user_input: str) -> Dict[str, Any]:
+        """Step 1: Intent classification"""
+        logger.debug("Step 1: Classifying intent")
+        return self.conversation_agent.process(
+            user_input=user_input,
+            user_preferences=self.user_data.get('preferences', {}),
+            conversation_history=self.conversation_history
+        )
+    
+    async def _aprefetch_menu(self) -> Optional[List[Dict]]:
+        """Speculative menu fetch for the recommendation step; None if unavailable"""
+        if not self.db:
+            return None
+        try:
+            return await asyncio.to_thread(self.db.get_all_menu_items)
+        except Exception as e:
+            logger.warning("Menu prefetch failed: %s", e)
+            return None
+    
+    def _respond(self, user_input: str, intent_result: Dict[str, Any],
+                 menu_items: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Steps 2-3: act on the classified intent and build the response"""
+        intent = intent_result.get('intent', 'general')
+        conversational_response = intent_result.get('conversational_response', '')
+        logger.info("Intent: %s", intent)
+        
+        final_response = conversational_response
+        recommendations = []
+        
+        # Step 2: RL-ENHANCED recommendations
+        if intent in ['recommendation_request', 'browse_menu', 'search_items']:
+            logger.debug("Step 2: Getting RL-optimized recommendations")
+            
+            # Get all available items - process-wide menu cache (prefetched
+            # on the async path, where a cache miss overlaps the LLM call)
+            if self.db:
+                all_items = menu_items if menu_items is not None else self.db.get_all_menu_items()
+                
+                # Use RL to personalize
+                rl_recommendations = self.rl_loop.get_personalized_recommendations(
+                    self.user_id,
+                    all_items
+                )
+                recommendations = rl_recommendations
+                
+                logger.debug("Found %d RL-optimized items", len(recommendations))
+                
+                # Record this recommendation state for reward tracking
+                self.current_state_id = self.rl_loop.record_recommendation_shown(
+                    self.user_id,
+                    recommendations
+                )
+                
+                final_response = f"{conversational_response}\n\n{_format_recommendations(recommendations)}"
+        
+        # Step 3: Process order operations
+        elif intent in ['order_placement', 'add_to_cart']:
+            logger.debug("Step 3: Processing order")
+            
+            # Parse item
+            item_info = self._parse_order_request(user_input)
+            
+            if item_info['item_name']:
+                logger.debug("Parsed: %s x%s", item_info['item_name'], item_info['quantity'])
+                
+                # Find and add to cart
+                item_id = self._find_item_id(item_info['item_name'])
+                if item_id:
+                    # Record item selection with RL
+                    self.rl_loop.record_item_selected(self.user_id, item_id, self.current_state_id)
+                    
+                    cart_result = self.cart.add_item(item_id, item_info['quantity'])
+                    if cart_result['success']:
+                        cart_state = cart_result['cart']
+                        final_response = f"{cart_result['message']}\n\nCart Total: ₹{cart_state['total']}"
+                    else:
+                        final_response = f"{cart_result['message']}"
+                else:
+                    final_response = f"Item not found"
+            else:
+                final_response = conversational_response
+        
+        # Store in history
+        self.conversation_history.append({"role": "user", "content": user_input})
+        self.conversation_history.append({"role": "assistant", "content": final_response})
+        
+        return {
+            "status": "success",
+            "message": final_response,
+            "recommendations": recommendations,
+            "intent": intent,
+            "session_id": self.session_id,
+            "cart": self.cart.get_cart_state() if self.cart else {}
+        }
+    
     def _parse_order_request(self, user_input: str) -> Dict[str, Any]:
         """Parse item name and quantity"""
-        numbers = re.findall(r'\d+', user_input)
-        quantity = int(numbers[0]) if numbers else 1
-        
-        item_name = user_input.lower()
-        for num in numbers:
-            item_name = item_name.replace(num, '').strip()
+        number = _DIGIT_RE.search(user_input)
+        quantity = int(number.group()) if number else 1
         
-        for prefix in ['add', 'i want', 'get me']:
-            if item_name.startswith(prefix):
-                item_name = item_name[len(prefix):].strip()
+        item_name = _PREFIX_RE.sub('', _DIGIT_RE.sub('', user_input.lower()).strip())
         
         return {
             'item_name': item_name.strip() if item_name else None,
@@ -235,26 +291,21 @@ class LangChainOrchestrator:
     
     def _find_item_id(self, item_name: str) -> Optional[int]:
         """Find item ID from database"""
-        try:
-            if not self.db:
-                return None
-            items = self.db.search_menu_items(search_term=item_name)
-            if items:
-                return items[0]['item_id']
-        except:
-            pass
-        
-        return None
+        if not self.db:
+            return None
+        # In memory first; the DB search only runs for names it can't place
+        item = self._menu_names.find(item_name)
+        if item:
+            return item['item_id']
+        items = self.db.search_menu_items(search_term=item_name)
+        return items[0]['item_id'] if items else None
     
-    def _get_past_orders(self) -> List[Dict]:
+    def get_past_orders(self) -> List[Dict]:
         """Get user's past orders"""
-        try:
-            if not self.db:
-                return []
-            orders = self.db.get_user_orders(self.user_id, limit=5)
-            return [{"order_id": o.get('order_id'), "items": o.get('items', [])} for o in orders] if orders else []
-        except:
+        if not self.db:
             return []
+        orders = self.db.get_user_orders(self.user_id, limit=5)
+        return [{"order_id": o.get('order_id'), "items": o.get('items', [])} for o in orders]
     
     def get_cart(self) -> Dict:
         """Get cart state"""
@@ -280,9 +331,6 @@ class LangChainOrchestrator:
                 remaining = cart_state.get('minimum_order', 0) - cart_state.get('subtotal', 0)
                 return {'success': False, 'message': f'Need ₹{remaining} more'}
             
-            # Get delivery address
-            delivery_address = self.db.get_user_address(self.user_id)
-            
             # Format items
             formatted_items = []
             for item in cart_state.get('items', []):
@@ -294,17 +342,18 @@ class LangChainOrchestrator:
                     'total_price': item.get('total_price')
                 })
             
-            # Create order
-            order_id = self.db.create_order(
+            # Create order (delivery address is filled in from the user's profile)
+            order = self.db.place_order(
                 user_id=self.user_id,
                 restaurant_id=cart_state.get('restaurant_id'),
                 order_items=formatted_items,
                 total_amount=float(cart_state.get('total', 0)),
-                delivery_address=delivery_address,
                 special_instructions=None
             )
             
-            if order_id:
+            if order:
+                order_id = order['order_id']
+                delivery_address = order['delivery_address']
                 # HIGH REWARD SIGNAL: Order completed
                 order_data = {
                     'items': formatted_items,
@@ -312,13 +361,13 @@ class LangChainOrchestrator:
                 }
                 reward_info = self.rl_loop.record_order_completed(self.user_id, order_data)
                 
-                # Save learned RL state
-                self.rl_loop.save_state()
+                # Save learned RL state in the background - not on the checkout path
+                self.rl_loop.save_state_async()
                 
                 # Clear cart
                 self.cart.clear_cart()
                 
-                print(f"\nOrder processed with RL learning")
+                logger.info("Order processed with RL learning")
                 
                 return {
                     'success': True,
@@ -332,7 +381,7 @@ class LangChainOrchestrator:
                 return {'success': False, 'message': 'Failed to create order'}
                 
         except Exception as e:
-            print(f"Checkout error: {e}")
+            logger.error("Checkout error: %s", e)
             return {'success': False, 'error': str(e)}
     
     def get_rl_summary(self) -> Dict:
@@ -342,9 +391,11 @@ class LangChainOrchestrator:
     def cleanup(self):
         """Cleanup - save RL state"""
         try:
-            self.rl_loop.save_state()  
+            # Final save after any pending background writes
+            self.rl_loop.close()
+            self.rl_loop.save_state()
             if self.db:
                 self.db.disconnect()
-            print("\nCleanup complete (RL state saved)")
+            logger.info("Cleanup complete (RL state saved)")
         except Exception as e:
-            print(f"Cleanup error: {e}")
+            logger.error("Cleanup error: %s", e)
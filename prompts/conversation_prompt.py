@@ -212,4 +212,29 @@ CONVERSATION HISTORY: {conversation_history}
 USER PREFERENCES: {user_preferences}
 
 YOUR JSON RESPONSE:
-"""
\ No newline at end of file
+"""
+# JSON schema for Ollama's structured output (format=...) - the decoder can
+# only emit tokens that keep the response valid against it
+CONVERSATION_AGENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string"},
+        "user_query": {"type": "string"},
+        "extracted_info": {
+            "type": "object",
+            "properties": {
+                "cuisine_preference": {"type": "array", "items": {"type": "string"}},
+                "dietary_restrictions": {"type": "array", "items": {"type": "string"}},
+                "spice_level": {"type": "string"},
+                "price_range": {"type": "string"},
+                "meal_type": {"type": "string"},
+                "special_requirements": {"type": "array", "items": {"type": "string"}}
+            }
+        },
+        "next_agent": {"type": "string"},
+        "conversational_response": {"type": "string"},
+        "confidence": {"type": "number"},
+        "domain_valid": {"type": "boolean"}
+    },
+    "required": ["intent", "user_query", "conversational_response"]
+}
@@ -154,4 +154,57 @@ CURRENT CART: {current_cart}
 USER DIETARY INFO: {user_dietary_info}
 
 YOUR JSON RESPONSE:
-"""
\ No newline at end of file
+"""
+# JSON schema for Ollama's structured output (format=...). Covers both the
+# order-processing and the explanation response shapes.
+ORDER_EXPLANATION_AGENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        # Order processing
+        "action": {"type": "string"},
+        "cart_state": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "item_id": {"type": "integer"},
+                            "item_name": {"type": "string"},
+                            "restaurant_id": {"type": "integer"},
+                            "restaurant_name": {"type": "string"},
+                            "quantity": {"type": "integer"},
+                            "unit_price": {"type": "number"},
+                            "total_price": {"type": "number"}
+                        }
+                    }
+                },
+                "subtotal": {"type": "number"},
+                "delivery_fee": {"type": "number"},
+                "total": {"type": "number"}
+            }
+        },
+        "validation": {
+            "type": "object",
+            "properties": {
+                "minimum_order_met": {"type": "boolean"},
+                "minimum_order_amount": {"type": "number"},
+                "can_proceed": {"type": "boolean"},
+                "issues": {"type": "array", "items": {"type": "string"}}
+            }
+        },
+        "next_steps": {"type": "array", "items": {"type": "string"}},
+        # Explanation / information
+        "query_type": {"type": "string"},
+        "item_info": {"type": "object"},
+        "detailed_explanation": {"type": "string"},
+        "nutritional_breakdown": {"type": "object"},
+        "ingredients": {"type": "array", "items": {"type": "string"}},
+        "allergen_warnings": {"type": "array", "items": {"type": "string"}},
+        "dietary_compatibility": {"type": "object"},
+        # Both
+        "conversational_response": {"type": "string"}
+    },
+    "required": ["conversational_response"]
+}
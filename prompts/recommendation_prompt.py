@@ -6,7 +6,121 @@ Agent: Qwen 2.5 (Personalized Menu Recommendations)
 Purpose: Generate hyper-personalized food recommendations based on user preferences
 """
 
-RECOMMENDATION_AGENT_PROMPT = """You are an expert food recommendation engine with deep knowledge of cuisines, flavors, and user preferences. Your goal is to provide hyper-personalized food recommendations.
+import re
+
+# Menu database as data: (restaurant, name, price, description, tags).
+# shortlist() filters it per request so the prompt only carries items the
+# user can actually be recommended.
+_MENU_TABLE = (
+    ("Maharaja Restaurant", "Butter Chicken", 350, "Tender chicken in creamy tomato curry", ("spicy", "popular", "non-veg")),
+    ("Maharaja Restaurant", "Paneer Tikka", 280, "Grilled cottage cheese", ("vegetarian", "spicy")),
+    ("Maharaja Restaurant", "Biryani Rice", 320, "Fragrant rice with meat", ("non-veg", "popular")),
+    ("Maharaja Restaurant", "Garlic Naan", 60, "Soft bread with garlic", ("vegetarian",)),
+    ("Maharaja Restaurant", "Gulab Jamun", 80, "Sweet milk dessert", ("vegetarian", "sweet")),
+    ("Pasta Paradise", "Spaghetti Carbonara", 380, "Pasta with creamy sauce", ("non-veg", "popular")),
+    ("Pasta Paradise", "Margherita Pizza", 320, "Mozzarella, tomato, basil", ("vegetarian", "popular")),
+    ("Pasta Paradise", "Fettuccine Alfredo", 350, "Pasta in parmesan sauce", ("vegetarian",)),
+    ("Pasta Paradise", "Garlic Bread", 120, "Crispy with herbs", ("vegetarian",)),
+    ("Pasta Paradise", "Tiramisu", 150, "Italian dessert", ("vegetarian", "sweet")),
+    ("Dragon Wok", "Kung Pao Chicken", 320, "Spicy chicken with peanuts", ("spicy", "non-veg")),
+    ("Dragon Wok", "Fried Rice", 280, "Rice with vegetables and egg", ("non-veg",)),
+    ("Dragon Wok", "Spring Rolls", 150, "Crispy vegetable rolls", ("vegetarian",)),
+    ("Dragon Wok", "Sweet and Sour Pork", 350, "Pork in tangy sauce", ("non-veg",)),
+    ("Dragon Wok", "Lychee Dessert", 120, "Sweet lychee", ("vegetarian", "sweet")),
+    ("South Indian Special", "Masala Dosa", 180, "Crispy crepe with potato", ("vegetarian", "popular")),
+    ("South Indian Special", "Idli Sambar", 150, "Steamed cakes with lentil stew", ("vegetarian",)),
+    ("South Indian Special", "Medu Vada", 120, "Fried lentil donuts", ("vegetarian",)),
+    ("South Indian Special", "Uttapam", 160, "Savory crepe", ("vegetarian",)),
+    ("South Indian Special", "Filter Coffee", 80, "Traditional coffee", ("vegetarian",)),
+    ("Mexico Fiesta", "Chicken Tacos", 300, "Soft tortillas with chicken", ("spicy", "non-veg")),
+    ("Mexico Fiesta", "Vegetable Burrito", 280, "Beans and vegetables", ("vegetarian",)),
+    ("Mexico Fiesta", "Nachos with Cheese", 200, "Crispy chips", ("vegetarian",)),
+    ("Mexico Fiesta", "Enchiladas", 320, "Rolled tortillas", ("non-veg",)),
+    ("Mexico Fiesta", "Churros", 150, "Fried pastry", ("vegetarian", "sweet")),
+    ("Sushi Central", "California Roll", 420, "Sushi with crab and avocado", ("non-veg", "popular")),
+    ("Sushi Central", "Vegetable Sushi", 350, "Fresh vegetables", ("vegetarian",)),
+    ("Sushi Central", "Tempura Shrimp", 380, "Fried shrimp", ("non-veg",)),
+    ("Sushi Central", "Miso Soup", 150, "Fermented soybean soup", ("vegetarian",)),
+    ("Sushi Central", "Green Tea Ice Cream", 180, "Matcha ice cream", ("vegetarian", "sweet")),
+    ("Continental Delights", "Grilled Salmon", 520, "Fresh salmon with lemon butter", ("non-veg", "healthy")),
+    ("Continental Delights", "Caesar Salad", 250, "Lettuce with parmesan", ("vegetarian",)),
+    ("Continental Delights", "Steak Burger", 450, "Premium beef burger", ("non-veg",)),
+    ("Continental Delights", "Vegetable Soup", 180, "Creamy soup", ("vegetarian",)),
+    ("Continental Delights", "Chocolate Cake", 200, "Rich chocolate cake", ("vegetarian", "sweet")),
+    ("Asia Express", "Pad Thai", 380, "Rice noodles with shrimp", ("non-veg", "spicy")),
+    ("Asia Express", "Green Curry", 320, "Coconut curry", ("vegetarian", "spicy")),
+    ("Asia Express", "Vietnamese Pho", 300, "Noodle soup", ("non-veg",)),
+    ("Asia Express", "Satay Skewers", 280, "Grilled meat", ("non-veg",)),
+    ("Asia Express", "Mango Sticky Rice", 180, "Sweet mango dessert", ("vegetarian", "sweet")),
+)
+
+MENU_ITEMS = [
+    {"restaurant": restaurant, "name": name, "price": price,
+     "description": description, "tags": frozenset(tags)}
+    for restaurant, name, price, description, tags in _MENU_TABLE
+]
+
+# Fewer matches than this and the spice/price filters are dropped, so the
+# model can still suggest the closest alternatives
+MIN_SHORTLIST = 3
+
+_VEGETARIAN_DIETS = frozenset({"vegetarian", "vegan"})
+_HOT = frozenset({"high", "hot", "spicy", "extra hot"})
+_MILD = frozenset({"low", "mild", "none", "no spice", "not spicy"})
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def format_menu(items):
+    """Prompt lines for menu items"""
+    return "\n".join(
+        f"- {i['name']} (₹{i['price']}, {i['restaurant']}) - {i['description']} [{', '.join(sorted(i['tags']))}]"
+        for i in items
+    )
+
+
+MENU_MARKDOWN = format_menu(MENU_ITEMS)
+
+
+def shortlist(dietary_restrictions=None, spice_level="", price_range=""):
+    """
+    Menu items compatible with the hard constraints of a request
+
+    Vegetarian/vegan diets keep only vegetarian-tagged items. Within
+    those, a hot or mild spice level keeps or drops spicy items and a
+    number in price_range is taken as the maximum price; these two are
+    relaxed when too little matches, the diet never is. Softer
+    constraints (allergens, cuisine) are left to the model.
+    """
+    diets = {str(d).strip().lower() for d in dietary_restrictions or ()}
+    spice = (spice_level or "").strip().lower()
+    prices = _NUMBER_RE.findall(price_range or "")
+    max_price = int(prices[-1]) if prices else None
+
+    allowed = MENU_ITEMS
+    if diets & _VEGETARIAN_DIETS:
+        allowed = [item for item in MENU_ITEMS if "vegetarian" in item["tags"]]
+    items = [
+        item for item in allowed
+        if (spice not in _HOT or "spicy" in item["tags"])
+        and (spice not in _MILD or "spicy" not in item["tags"])
+        and (max_price is None or item["price"] <= max_price)
+    ]
+    return items if len(items) >= MIN_SHORTLIST else allowed
+
+
+def candidate_menu(dietary_restrictions=None, spice_level="", price_range=""):
+    """Prompt text for the request's shortlist (the full menu's is prebuilt)"""
+    items = shortlist(dietary_restrictions, spice_level, price_range)
+    return MENU_MARKDOWN if items is MENU_ITEMS else format_menu(items)
+
+
+# The prompt is a static prefix (instructions, menu, rules) followed by the
+# per-request suffix. Ollama keeps each slot's KV cache and only evaluates the
+# part of a new prompt after the longest prefix it already holds, so with every
+# request field (including the shortlisted menu) in the suffix, the prefix is
+# evaluated once per slot instead of once per call. Keep per-request
+# placeholders out of the prefix.
+RECOMMENDATION_STATIC_PREFIX = """You are an expert food recommendation engine with deep knowledge of cuisines, flavors, and user preferences. Your goal is to provide hyper-personalized food recommendations.
 
 ---
 
@@ -32,63 +146,7 @@ You have access to restaurants with these details:
 7. Continental Delights (Continental) - Min Order: ₹220, Delivery: ₹55
 8. Asia Express (Asian) - Min Order: ₹160, Delivery: ₹45
 
-**Menu Items (40 items):**
-
-*Maharaja Restaurant (Indian):*
-- Butter Chicken (₹350) - Tender chicken in creamy tomato curry [spicy, popular, non-veg]
-- Paneer Tikka (₹280) - Grilled cottage cheese [vegetarian, spicy]
-- Biryani Rice (₹320) - Fragrant rice with meat [non-veg, popular]
-- Garlic Naan (₹60) - Soft bread with garlic [vegetarian]
-- Gulab Jamun (₹80) - Sweet milk dessert [vegetarian, sweet]
-
-*Pasta Paradise (Italian):*
-- Spaghetti Carbonara (₹380) - Pasta with creamy sauce [non-veg, popular]
-- Margherita Pizza (₹320) - Mozzarella, tomato, basil [vegetarian, popular]
-- Fettuccine Alfredo (₹350) - Pasta in parmesan sauce [vegetarian]
-- Garlic Bread (₹120) - Crispy with herbs [vegetarian]
-- Tiramisu (₹150) - Italian dessert [vegetarian, sweet]
-
-*Dragon Wok (Chinese):*
-- Kung Pao Chicken (₹320) - Spicy chicken with peanuts [spicy, non-veg]
-- Fried Rice (₹280) - Rice with vegetables and egg [non-veg]
-- Spring Rolls (₹150) - Crispy vegetable rolls [vegetarian]
-- Sweet and Sour Pork (₹350) - Pork in tangy sauce [non-veg]
-- Lychee Dessert (₹120) - Sweet lychee [vegetarian, sweet]
-
-*South Indian Special:*
-- Masala Dosa (₹180) - Crispy crepe with potato [vegetarian, popular]
-- Idli Sambar (₹150) - Steamed cakes with lentil stew [vegetarian]
-- Medu Vada (₹120) - Fried lentil donuts [vegetarian]
-- Uttapam (₹160) - Savory crepe [vegetarian]
-- Filter Coffee (₹80) - Traditional coffee [vegetarian]
-
-*Mexico Fiesta (Mexican):*
-- Chicken Tacos (₹300) - Soft tortillas with chicken [spicy, non-veg]
-- Vegetable Burrito (₹280) - Beans and vegetables [vegetarian]
-- Nachos with Cheese (₹200) - Crispy chips [vegetarian]
-- Enchiladas (₹320) - Rolled tortillas [non-veg]
-- Churros (₹150) - Fried pastry [vegetarian, sweet]
-
-*Sushi Central (Japanese):*
-- California Roll (₹420) - Sushi with crab and avocado [non-veg, popular]
-- Vegetable Sushi (₹350) - Fresh vegetables [vegetarian]
-- Tempura Shrimp (₹380) - Fried shrimp [non-veg]
-- Miso Soup (₹150) - Fermented soybean soup [vegetarian]
-- Green Tea Ice Cream (₹180) - Matcha ice cream [vegetarian, sweet]
-
-*Continental Delights:*
-- Grilled Salmon (₹520) - Fresh salmon with lemon butter [non-veg, healthy]
-- Caesar Salad (₹250) - Lettuce with parmesan [vegetarian]
-- Steak Burger (₹450) - Premium beef burger [non-veg]
-- Vegetable Soup (₹180) - Creamy soup [vegetarian]
-- Chocolate Cake (₹200) - Rich chocolate cake [vegetarian, sweet]
-
-*Asia Express (Asian):*
-- Pad Thai (₹380) - Rice noodles with shrimp [non-veg, spicy]
-- Green Curry (₹320) - Coconut curry [vegetarian, spicy]
-- Vietnamese Pho (₹300) - Noodle soup [non-veg]
-- Satay Skewers (₹280) - Grilled meat [non-veg]
-- Mango Sticky Rice (₹180) - Sweet mango dessert [vegetarian, sweet]
+The menu items that fit the request are listed with it below.
 
 ---
 
@@ -168,7 +226,12 @@ Always respond with this exact JSON structure:
 
 ---
 
-Process this recommendation request:
+"""
+
+RECOMMENDATION_DYNAMIC_SUFFIX = """Process this recommendation request:
+
+CANDIDATE MENU ITEMS:
+{candidate_menu}
 
 USER REQUEST: {user_request}
 USER PREFERENCES: {user_preferences}
@@ -178,4 +241,39 @@ SPICE LEVEL: {spice_level}
 PRICE RANGE: {price_range}
 
 YOUR JSON RESPONSE:
-"""
\ No newline at end of file
+"""
+
+RECOMMENDATION_AGENT_PROMPT = RECOMMENDATION_STATIC_PREFIX + RECOMMENDATION_DYNAMIC_SUFFIX
+
+# JSON schema for Ollama's structured output (format=...) - the decoder can
+# only emit tokens that keep the response valid against it
+RECOMMENDATION_AGENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "rank": {"type": "integer"},
+                    "item_id": {"type": "integer"},
+                    "item_name": {"type": "string"},
+                    "restaurant_name": {"type": "string"},
+                    "restaurant_id": {"type": "integer"},
+                    "price": {"type": "number"},
+                    "cuisine_type": {"type": "string"},
+                    "description": {"type": "string"},
+                    "tags": {"type": "array", "items": {"type": "string"}},
+                    "match_score": {"type": "number"},
+                    "why_recommended": {"type": "string"},
+                    "estimated_delivery": {"type": "string"}
+                },
+                "required": ["item_id", "item_name", "price", "match_score"]
+            }
+        },
+        "total_recommendations": {"type": "integer"},
+        "personalization_factors": {"type": "array", "items": {"type": "string"}},
+        "alternative_suggestions": {"type": "string"}
+    },
+    "required": ["recommendations"]
+}
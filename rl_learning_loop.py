@@ -2,20 +2,91 @@
 REINFORCEMENT LEARNING MODULE - FIXED STATE PERSISTENCE
 
 FIXES:
-- Proper JSON serialization of tuple keys (user_id, item_id)
+- State saved as one compressed .npz of the learned matrices (the legacy
+  JSON layout is still readable and is migrated on first load)
 - Correct state loading and restoration
 - Verbose logging for debugging
 - Proper type conversions
 """
 
-import json
+import logging
+import os
+import threading
 import uuid
-from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Any, Tuple
 from datetime import datetime
-from collections import defaultdict
-import sys
 
-sys.path.insert(0, '.')
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+from utils import fastjson
+
+logger = logging.getLogger(__name__)
+
+# Exploration draws (epsilon-greedy)
+_rng = np.random.default_rng()
+
+# Initial matrix capacity (users x items); doubled as ids are added
+INITIAL_USERS = 16
+INITIAL_ITEMS = 64
+
+
+# Exploitation score per item: q*0.4 + preference*0.4 + (popularity*0.1)*0.2.
+# Takes the user's Q-value and preference rows, the popularity vector and the
+# candidates' columns; the kernel gathers while it scores, so no per-signal
+# temporaries are built.
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True)
+    def score_items(q_row, preference_row, popularity, cols):
+        scores = np.empty(cols.shape[0])
+        for i in range(cols.shape[0]):
+            c = cols[i]
+            scores[i] = q_row[c] * 0.4 + preference_row[c] * 0.4 + popularity[c] * 0.1 * 0.2
+        return scores
+else:
+    def score_items(q_row, preference_row, popularity, cols):
+        return q_row[cols] * 0.4 + preference_row[cols] * 0.4 + popularity[cols] * 0.1 * 0.2
+
+
+def warm_up_scorer() -> None:
+    """Compile (or load from numba's disk cache) the scoring kernel up front"""
+    dummy = np.zeros(1, dtype=np.float32)
+    score_items(dummy, dummy, dummy, np.zeros(1, dtype=np.intp))
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first
+
+    Selection is a partition rather than a full sort; equal scores keep
+    input order, matching what a stable sort would return.
+    """
+    n = scores.shape[0]
+    if n > k:
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - above.shape[0]]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class StateAction(NamedTuple):
+    """One recommendation list shown to a user (kept for the life of the loop)"""
+    state_id: str
+    user_id: int
+    timestamp: datetime
+    action: str
+    recommendations: Tuple[Tuple[Any, Any], ...]    # (item_id, name) pairs
+    reward: Optional[float] = None
+    completed: bool = False
 
 
 class SimpleRLLoop:
@@ -31,61 +102,112 @@ class SimpleRLLoop:
     
     def __init__(self):
         """Initialize RL components"""
-        # Q-values: {(user_id, item_id): reward_value}
-        self.q_values = defaultdict(float)
+        # Learned state: q_values / user_preferences [user row, item column]
+        # and item_popularity [item column] (see _reset_state)
+        self._reset_state()
         
         # State-action tracking
         self.state_action_history = []
         
-        # User preference weights: {user_id: {item_id: weight}}
-        self.user_preferences = defaultdict(lambda: defaultdict(float))
-        
-        # Item popularity: {item_id: popularity_score}
-        self.item_popularity = defaultdict(float)
-        
         # Learning rate and discount factor
         self.alpha = 0.1  # Learning rate
         self.gamma = 0.9  # Discount factor
         self.epsilon = 0.1  # Exploration rate
         
-        print("RL Loop initialized")
+        # Background state writes (see save_state_async): filepath -> (snapshot,
+        # future) for writes queued but not yet started
+        self._save_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rl-save")
+        self._save_lock = threading.Lock()
+        self._pending_saves = {}
+        
+        logger.debug("RL loop initialized")
+    
+    def _reset_state(self) -> None:
+        """
+        Empty learned state
+        
+        Signals are dense float32 matrices so a candidate list is scored
+        with one gather per signal. Users and items get a row/column on
+        first update; row 0 and column 0 stay zero and stand in for ids
+        with nothing learned, so lookups need no mask. Capacity doubles as
+        ids are added.
+        """
+        self._user_rows = {}        # user_id -> row
+        self._item_cols = {}        # item_id -> column
+        self._item_ids = [None]     # column -> item_id
+        self.q_values = np.zeros((INITIAL_USERS, INITIAL_ITEMS), dtype=np.float32)
+        self.user_preferences = np.zeros((INITIAL_USERS, INITIAL_ITEMS), dtype=np.float32)
+        self.item_popularity = np.zeros(INITIAL_ITEMS, dtype=np.float32)
+        
+        # Matrix column of each item in the last candidate list scored; the
+        # cached menu hands back the same list object until it refreshes
+        self._columns_for = None
+        self._columns = np.zeros(0, dtype=np.intp)
+        self._columns_width = 0
+    
+    def _user_row(self, user_id: int) -> int:
+        """Row for user_id, assigned on first use"""
+        row = self._user_rows.get(user_id)
+        if row is None:
+            row = len(self._user_rows) + 1
+            if row >= self.q_values.shape[0]:
+                self._grow(2 * row, self.q_values.shape[1])
+            self._user_rows[user_id] = row
+        return row
+    
+    def _item_col(self, item_id: int) -> int:
+        """Column for item_id, assigned on first use"""
+        col = self._item_cols.get(item_id)
+        if col is None:
+            col = len(self._item_ids)
+            if col >= self.q_values.shape[1]:
+                self._grow(self.q_values.shape[0], 2 * col)
+            self._item_cols[item_id] = col
+            self._item_ids.append(item_id)
+        return col
+    
+    def _grow(self, rows: int, cols: int) -> None:
+        def grown(matrix):
+            out = np.zeros((rows, cols), dtype=np.float32)
+            out[:matrix.shape[0], :matrix.shape[1]] = matrix
+            return out
+        popularity = np.zeros(cols, dtype=np.float32)
+        popularity[:self.item_popularity.shape[0]] = self.item_popularity
+        self.q_values = grown(self.q_values)
+        self.user_preferences = grown(self.user_preferences)
+        self.item_popularity = popularity
     
     def record_recommendation_shown(self, user_id: int, recommendations: List[Dict]) -> str:
         """Record that recommendations were shown"""
         state_id = str(uuid.uuid4())
         
-        state_action = {
-            'state_id': state_id,
-            'user_id': user_id,
-            'timestamp': datetime.now().isoformat(),
-            'action': 'show_recommendations',
-            'recommendations': [
-                {'item_id': r.get('item_id'), 'name': r.get('name')}
-                for r in recommendations[:5]
-            ],
-            'reward': None,
-            'completed': False
-        }
-        
-        self.state_action_history.append(state_action)
+        self.state_action_history.append(StateAction(
+            state_id=state_id,
+            user_id=user_id,
+            timestamp=datetime.now(),
+            action='show_recommendations',
+            recommendations=tuple((r.get('item_id'), r.get('name')) for r in recommendations[:5])
+        ))
         return state_id
     
     def record_item_selected(self, user_id: int, item_id: int, state_id: Optional[str] = None) -> None:
         """Record which item user selected"""
+        row = self._user_row(user_id)
+        col = self._item_col(item_id)
+        
         # UPDATE Q-value
-        old_q = self.q_values[(user_id, item_id)]
-        self.q_values[(user_id, item_id)] += self.alpha
-        new_q = self.q_values[(user_id, item_id)]
+        old_q = float(self.q_values[row, col])
+        self.q_values[row, col] += self.alpha
         
         # Increase item popularity
-        self.item_popularity[item_id] += 0.1
+        self.item_popularity[col] += 0.1
         
         # Update user preference
-        self.user_preferences[user_id][item_id] += 0.2
+        self.user_preferences[row, col] += 0.2
         
         # LOG FOR DEBUGGING
-        print(f"  RL: User {user_id} selected item {item_id}")
-        print(f"        Q-value: {old_q:.3f} → {new_q:.3f}")
+        logger.debug("RL: user %s selected item %s (Q %.3f → %.3f)",
+                     user_id, item_id, old_q, float(self.q_values[row, col]))
     
     def record_order_completed(self, user_id: int, order_data: Dict) -> Dict:
         """
@@ -104,36 +226,36 @@ class SimpleRLLoop:
         if items_count > 3:
             reward += 0.3  # Multiple items
         
-        print(f"\nRL LEARNING - ORDER COMPLETED")
         
         # CRITICAL: Update Q-values for all items in order
-        for item in order_data.get('items', []):
-            item_id = item.get('item_id')
-            quantity = item.get('quantity', 1)
-            
-            # Get old values for logging
-            old_q = self.q_values.get((user_id, item_id), 0)
-            old_pref = self.user_preferences[user_id].get(item_id, 0)
-            
-            # Strong positive reward for selected item
-            self.q_values[(user_id, item_id)] += reward
-            new_q = self.q_values[(user_id, item_id)]
-            
-            # Update popularity
-            self.item_popularity[item_id] += quantity * 0.5
-            
-            # Update user preference
-            self.user_preferences[user_id][item_id] += reward
-            new_pref = self.user_preferences[user_id][item_id]
-            
-            # LOG EACH ITEM UPDATE
-            print(f"   Item {item_id}:")
-            print(f"      Q-value: {old_q:.3f} → {new_q:.3f}")
-            print(f"      Preference: {old_pref:.3f} → {new_pref:.3f}")
+        # (items without an id have nothing to learn against)
+        items = [item for item in order_data.get('items', []) if item.get('item_id') is not None]
+        row = self._user_row(user_id)
+        cols = np.fromiter((self._item_col(item['item_id']) for item in items),
+                           dtype=np.intp, count=len(items))
+        quantities = np.fromiter((item.get('quantity', 1) for item in items),
+                                 dtype=np.float32, count=len(items))
+        
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            old_q = self.q_values[row, cols]
+            old_pref = self.user_preferences[row, cols]
+        
+        # One write per signal; np.add.at so an item listed twice counts twice
+        np.add.at(self.q_values[row], cols, reward)
+        np.add.at(self.user_preferences[row], cols, reward)
+        np.add.at(self.item_popularity, cols, quantities * 0.5)
         
-        print(f"   Total Reward: {reward:.2f}")
-        print(f"   Order Total: ₹{order_total}")
-        print(f"   Items: {items_count}")
+        # LOG EACH ITEM UPDATE
+        if debug:
+            new_q = self.q_values[row, cols]
+            new_pref = self.user_preferences[row, cols]
+            for i, item in enumerate(items):
+                logger.debug("RL: item %s Q %.3f → %.3f, preference %.3f → %.3f", item['item_id'],
+                             old_q[i], new_q[i], old_pref[i], new_pref[i])
+        
+        logger.info("RL: order completed for user %s - reward %.2f, total ₹%s, %d items",
+                    user_id, reward, order_total, items_count)
         
         return {
             'user_id': user_id,
@@ -146,169 +268,313 @@ class SimpleRLLoop:
     def get_personalized_recommendations(self, user_id: int, 
                                         available_items: List[Dict]) -> List[Dict]:
         """Get recommendations based on learned preferences"""
-        import random
+        n = len(available_items)
+        cols = self._item_columns(available_items)
+        row = self._user_rows.get(user_id, 0)
         
-        user_prefs = self.user_preferences.get(user_id, {})
+        # Unknown users and items read the all-zero row/column
+        q_row = self.q_values[row]
+        preference_row = self.user_preferences[row]
         
-        scored_items = []
-        for item in available_items:
-            item_id = item.get('item_id')
-            
-            # Base score from Q-value
-            q_score = self.q_values.get((user_id, item_id), 0)
-            
-            # Score from user preference
-            pref_score = user_prefs.get(item_id, 0)
-            
-            # Score from popularity
-            pop_score = self.item_popularity.get(item_id, 0) * 0.1
-            
-            # Combined score (exploitation)
-            total_score = (q_score * 0.4) + (pref_score * 0.4) + (pop_score * 0.2)
-            
-            scored_items.append({
-                **item,
-                'rl_score': total_score,
-                'q_value': q_score,
-                'preference': pref_score
-            })
+        # Combined score (exploitation)
+        scores = score_items(q_row, preference_row, self.item_popularity, cols)
+        
+        def scored(i):
+            return {
+                **available_items[i],
+                'rl_score': float(scores[i]),
+                'q_value': float(q_row[cols[i]]),
+                'preference': float(preference_row[cols[i]])
+            }
         
         # Epsilon-greedy
-        if random.random() < self.epsilon and len(scored_items) > 3:
-            best_items = sorted(scored_items, key=lambda x: x['rl_score'], reverse=True)[:3]
-            random_items = random.sample(scored_items, min(2, len(scored_items)))
-            final_items = best_items + random_items
+        if _rng.random() < self.epsilon and n > 3:
+            best = top_k_indices(scores, 3)
+            # Explore among the rest so the tail never repeats a best pick
+            rest = np.ones(n, dtype=bool)
+            rest[best] = False
+            explore = _rng.choice(np.flatnonzero(rest), size=min(2, n - 3), replace=False)
+            final_indices = np.concatenate([best, explore])
         else:
-            final_items = sorted(scored_items, key=lambda x: x['rl_score'], reverse=True)
+            final_indices = top_k_indices(scores, 5)
         
-        return final_items[:5]
+        return [scored(i) for i in final_indices[:5]]
+    
+    def _item_columns(self, available_items: List[Dict]) -> np.ndarray:
+        """
+        Matrix column per candidate item (0 if nothing is learned for it)
+
+        Reused while the list is unchanged and no item has been added since.
+        """
+        if available_items is not self._columns_for or self._columns_width != len(self._item_ids):
+            self._columns = np.fromiter(
+                (self._item_cols.get(item.get('item_id'), 0) for item in available_items),
+                dtype=np.intp, count=len(available_items)
+            )
+            self._columns_for, self._columns_width = available_items, len(self._item_ids)
+        return self._columns
     
     def record_user_feedback(self, user_id: int, item_id: int, feedback_score: float) -> None:
         """Record explicit user feedback"""
         if feedback_score > 1:
             feedback_score = feedback_score / 5.0
         
-        self.q_values[(user_id, item_id)] += (feedback_score * self.alpha)
-        self.user_preferences[user_id][item_id] += feedback_score
+        row = self._user_row(user_id)
+        col = self._item_col(item_id)
+        self.q_values[row, col] += (feedback_score * self.alpha)
+        self.user_preferences[row, col] += feedback_score
         
-        print(f"\nRL Feedback:")
-        print(f"   User {user_id} rated item {item_id}: {feedback_score:.2f}/1.0")
+        logger.info("RL feedback: user %s rated item %s %.2f/1.0", user_id, item_id, feedback_score)
+    
+    def get_confidence(self, user_id: int, prior: float = 5.0) -> float:
+        """
+        How settled the user's preferences are, in [0, 1)
+
+        Evidence (total positive preference mass against a prior of a few
+        orders) times concentration (share of that mass in the top 5 items).
+        New users score 0; users who keep ordering the same few dishes
+        approach 1.
+        """
+        row = self._user_rows.get(user_id)
+        if row is None:
+            return 0.0
+        prefs = self.user_preferences[row]
+        weights = prefs[prefs > 0]
+        total = float(weights.sum())
+        if not total:
+            return 0.0
+        top = np.partition(weights, weights.shape[0] - 5)[-5:] if weights.shape[0] > 5 else weights
+        return (total / (total + prior)) * (float(top.sum()) / total)
+    
+    def top_preferences(self, user_id: int, k: int) -> List[Tuple[int, float]]:
+        """(item_id, weight) for the user's k highest positive preferences, best first"""
+        row = self._user_rows.get(user_id)
+        if row is None:
+            return []
+        prefs = self.user_preferences[row, :len(self._item_ids)]
+        cols = np.flatnonzero(prefs > 0)
+        best = cols[top_k_indices(prefs[cols], k)]
+        return [(self._item_ids[col], float(prefs[col])) for col in best]
     
     def get_state_summary(self, user_id: int) -> Dict:
         """Get learning summary for a user"""
-        user_prefs = self.user_preferences.get(user_id, {})
+        row = self._user_rows.get(user_id)
         
-        top_items = sorted(
-            user_prefs.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:5]
+        top_items = self.top_preferences(user_id, 5)
         
         return {
             'user_id': user_id,
-            'learned_items': len(user_prefs),
+            'learned_items': int(np.count_nonzero(self.user_preferences[row])) if row is not None else 0,
             'top_items': [
                 {'item_id': item_id, 'preference_score': score}
                 for item_id, score in top_items
             ],
             'total_interactions': len([
                 h for h in self.state_action_history
-                if h['user_id'] == user_id
+                if h.user_id == user_id
             ])
         }
     
-    def save_state(self, filepath: str = "rl_state.json") -> None:
+    def save_state(self, filepath: str = "rl_state.npz") -> None:
+        """Write the learned state to disk (blocks until written)"""
+        self._write_state(self._snapshot_state(), filepath)
+    
+    def save_state_async(self, filepath: str = "rl_state.npz") -> Future:
+        """
+        Save without blocking the caller
+
+        The state is snapshotted here, so later updates can't race the
+        background write; writes run one at a time in submission order.
+        Saves that arrive while a write to the same file is still queued
+        replace its snapshot instead of queuing another write, and share
+        its future.
+        """
+        state = self._snapshot_state()
+        with self._save_lock:
+            pending = self._pending_saves.get(filepath)
+            if pending is not None:
+                future = pending[1]
+            else:
+                future = self._save_executor.submit(self._write_pending, filepath)
+            self._pending_saves[filepath] = (state, future)
+        return future
+    
+    def _write_pending(self, filepath: str) -> None:
+        """Write the latest snapshot queued for filepath"""
+        with self._save_lock:
+            state, _ = self._pending_saves.pop(filepath)
+        self._write_state(state, filepath)
+    
+    def close(self) -> None:
+        """Wait for pending background saves"""
+        self._save_executor.shutdown(wait=True)
+    
+    def _snapshot_state(self) -> Dict[str, np.ndarray]:
+        """
+        Copies of the used part of the matrices, plus the ids of their rows
+        and columns (the zero row/column is left out)
+        """
+        rows, cols = len(self._user_rows) + 1, len(self._item_ids)
+        return {
+            'user_ids': np.fromiter(self._user_rows, dtype=np.int64, count=rows - 1),
+            'item_ids': np.array(self._item_ids[1:], dtype=np.int64),
+            'q_values': self.q_values[1:rows, 1:cols].copy(),
+            'user_preferences': self.user_preferences[1:rows, 1:cols].copy(),
+            'item_popularity': self.item_popularity[1:cols].copy()
+        }
     
+    def _write_state(self, state: Dict[str, np.ndarray], filepath: str) -> None:
         try:
-            # FIX: Convert tuple keys to strings for JSON
-            q_values_serialized = {}
-            for (user_id, item_id), value in self.q_values.items():
-                key = f"{user_id}_{item_id}"  # Convert tuple to string key
-                q_values_serialized[key] = float(value)
-            
-            # FIX: Properly serialize nested dicts
-            user_preferences_serialized = {}
-            for user_id, prefs in self.user_preferences.items():
-                user_key = str(user_id)
-                user_preferences_serialized[user_key] = {
-                    str(item_id): float(value)
-                    for item_id, value in prefs.items()
-                }
+            # Write-then-rename so a crash mid-write keeps the previous file
+            tmp_path = f"{filepath}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, **state)
+            os.replace(tmp_path, filepath)
             
-            item_popularity_serialized = {
-                str(k): float(v) 
-                for k, v in self.item_popularity.items()
-            }
+            logger.info("RL state saved to %s (%d users, %d items)", filepath,
+                        state['user_ids'].shape[0], state['item_ids'].shape[0])
             
-            state = {
-                'q_values': q_values_serialized,
-                'user_preferences': user_preferences_serialized,
-                'item_popularity': item_popularity_serialized,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            with open(filepath, 'w') as f:
-                json.dump(state, f, indent=2)
+        except Exception as e:
+            logger.exception("Failed to save RL state: %s", e)
+    
+    def load_state(self, filepath: str = "rl_state.npz") -> None:
+        """
+        Restore state written by save_state
+
+        If the file doesn't exist yet, a legacy JSON state file with the
+        same base name (rl_state.json) is loaded instead; the next save
+        writes it out as .npz.
+        """
+        try:
+            with np.load(filepath) as data:
+                user_ids = data['user_ids'].tolist()
+                item_ids = data['item_ids'].tolist()
+                q_values = data['q_values']
+                user_preferences = data['user_preferences']
+                item_popularity = data['item_popularity']
+        except FileNotFoundError:
+            legacy_path = os.path.splitext(filepath)[0] + ".json"
+            if os.path.exists(legacy_path):
+                logger.info("RL state file not found (%s) - migrating %s", filepath, legacy_path)
+                self.load_state_json(legacy_path)
+            else:
+                logger.info("RL state file not found (%s) - starting fresh", filepath)
+            return
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Failed to read RL state from %s: %s", filepath, e)
+            return
+        
+        n_users, n_items = len(user_ids), len(item_ids)
+        self._reset_state()
+        self._user_rows = {user_id: row for row, user_id in enumerate(user_ids, 1)}
+        self._item_cols = {item_id: col for col, item_id in enumerate(item_ids, 1)}
+        self._item_ids = [None] + item_ids
+        self._grow(max(INITIAL_USERS, 2 * (n_users + 1)), max(INITIAL_ITEMS, 2 * (n_items + 1)))
+        self.q_values[1:n_users + 1, 1:n_items + 1] = q_values
+        self.user_preferences[1:n_users + 1, 1:n_items + 1] = user_preferences
+        self.item_popularity[1:n_items + 1] = item_popularity
+        
+        logger.info("RL state loaded from %s (%d users, %d items)", filepath, n_users, n_items)
+    
+    # ============================================
+    # LEGACY JSON STATE
+    # ============================================
+    
+    def save_state_json(self, filepath: str = "rl_state.json") -> None:
+        """Write the learned state in the legacy JSON layout"""
+        state = self._snapshot_json()
+        try:
+            tmp_path = f"{filepath}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(fastjson.dumps_bytes(state))
+            os.replace(tmp_path, filepath)
             
-            print(f" RL state saved to {filepath}")
-            print(f"   Q-values: {len(q_values_serialized)}")
-            print(f"   Users: {len(user_preferences_serialized)}")
-            print(f"   Items: {len(item_popularity_serialized)}")
+            logger.info("RL state saved to %s (%d Q-values, %d users, %d items)", filepath,
+                        len(state['q_values']), len(state['user_preferences']), len(state['item_popularity']))
             
         except Exception as e:
-            print(f" Failed to save RL state: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to save RL state: %s", e)
     
-    def load_state(self, filepath: str = "rl_state.json") -> None:
+    def _snapshot_json(self) -> Dict:
+        # Non-zero matrix cells as the JSON layout used on disk:
+        # "user_item" Q-value keys, nested preferences, flat popularity
+        item_ids = self._item_ids
+        q_values_serialized = {}
+        user_preferences_serialized = {}
+        for user_id, row in self._user_rows.items():
+            q_row = self.q_values[row]
+            for col in np.flatnonzero(q_row):
+                q_values_serialized[f"{user_id}_{item_ids[col]}"] = float(q_row[col])
+            
+            pref_row = self.user_preferences[row]
+            cols = np.flatnonzero(pref_row)
+            if cols.shape[0]:
+                user_preferences_serialized[str(user_id)] = {
+                    str(item_ids[col]): float(pref_row[col])
+                    for col in cols
+                }
+        
+        item_popularity_serialized = {
+            str(item_ids[col]): float(self.item_popularity[col])
+            for col in np.flatnonzero(self.item_popularity)
+        }
+        
+        return {
+            'q_values': q_values_serialized,
+            'user_preferences': user_preferences_serialized,
+            'item_popularity': item_popularity_serialized,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def load_state_json(self, filepath: str = "rl_state.json") -> None:
         """
          FIXED: Properly deserialize RL state from JSON
         """
         try:
-            with open(filepath, 'r') as f:
-                state = json.load(f)
+            with open(filepath, 'rb') as f:
+                state = fastjson.loads(f.read())
+            
+            logger.debug("Loading RL state from %s", filepath)
             
-            print(f" Loading RL state from {filepath}...")
+            self._reset_state()
             
             # FIX: Restore Q-values from string keys
-            self.q_values = defaultdict(float)
-            for key, value in state.get('q_values', {}).items():
+            q_values = state.get('q_values', {})
+            for key, value in q_values.items():
                 try:
                     user_id, item_id = map(int, key.split('_'))
-                    self.q_values[(user_id, item_id)] = float(value)
+                    # Indices first: assigning a row/column may reallocate the matrix
+                    row, col = self._user_row(user_id), self._item_col(item_id)
+                    self.q_values[row, col] = float(value)
                 except Exception as e:
-                    print(f"   ⚠️ Error parsing Q-value key '{key}': {e}")
+                    logger.warning("Error parsing Q-value key '%s': %s", key, e)
             
             # FIX: Restore user preferences
-            self.user_preferences = defaultdict(lambda: defaultdict(float))
-            for user_id_str, prefs in state.get('user_preferences', {}).items():
+            user_preferences = state.get('user_preferences', {})
+            for user_id_str, prefs in user_preferences.items():
                 try:
-                    user_id = int(user_id_str)
+                    row = self._user_row(int(user_id_str))
                     for item_id_str, value in prefs.items():
-                        item_id = int(item_id_str)
-                        self.user_preferences[user_id][item_id] = float(value)
+                        col = self._item_col(int(item_id_str))
+                        self.user_preferences[row, col] = float(value)
                 except Exception as e:
-                    print(f"   ⚠️ Error parsing preferences for user '{user_id_str}': {e}")
+                    logger.warning("Error parsing preferences for user '%s': %s", user_id_str, e)
             
             # FIX: Restore item popularity
-            self.item_popularity = defaultdict(float)
-            for item_id_str, value in state.get('item_popularity', {}).items():
+            item_popularity = state.get('item_popularity', {})
+            for item_id_str, value in item_popularity.items():
                 try:
-                    item_id = int(item_id_str)
-                    self.item_popularity[item_id] = float(value)
+                    col = self._item_col(int(item_id_str))
+                    self.item_popularity[col] = float(value)
                 except Exception as e:
-                    print(f"  Error parsing popularity for item '{item_id_str}': {e}")
+                    logger.warning("Error parsing popularity for item '%s': %s", item_id_str, e)
             
-            print(f" RL state loaded successfully!")
-            print(f"   Q-values: {len(self.q_values)}")
-            print(f"   Users: {len(self.user_preferences)}")
-            print(f"   Items: {len(self.item_popularity)}")
+            logger.info("RL state loaded (%d Q-values, %d users, %d items)",
+                        len(q_values), len(user_preferences), len(item_popularity))
             
         except FileNotFoundError:
-            print(f"RL state file not found ({filepath}) - starting fresh")
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse RL state JSON: {e}")
+            logger.info("RL state file not found (%s) - starting fresh", filepath)
+        except fastjson.JSONDecodeError as e:
+            logger.error("Failed to parse RL state JSON: %s", e)
         except Exception as e:
-            print(f"Failed to load RL state: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to load RL state: %s", e)
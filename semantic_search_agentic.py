@@ -3,12 +3,15 @@ SEMANTIC SEARCH - Convert Your System to TRUE AGENTIC AI
 This makes recommendations context-aware and intelligent
 """
 
+import heapq
+from operator import itemgetter
+
 import numpy as np
 from typing import List, Dict
-import json
 from sentence_transformers import SentenceTransformer
 from database.db_manager import DatabaseManager
 from vector_store.chroma_manager import ChromaDBManager
+from utils import fastjson
 
 
 class SemanticMenuSearch:
@@ -21,8 +24,8 @@ class SemanticMenuSearch:
         """Initialize embeddings model"""
         # Use lightweight embedding model
         self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.db = DatabaseManager()
-        self.chroma = ChromaDBManager()
+        self.db = DatabaseManager.get_shared()
+        self.chroma = ChromaDBManager.get_shared()
         print("Semantic Search Engine Initialized")
 
     def get_all_menu_items(self) -> List[Dict]:
@@ -100,11 +103,8 @@ class SemanticMenuSearch:
                 'item': data['item']
             })
         
-        # Sort by similarity (highest first)
-        scores.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        # Return top K
-        results = scores[:top_k]
+        # Top K by similarity (highest first) - partial selection, no full sort
+        results = heapq.nlargest(top_k, scores, key=itemgetter('similarity'))
         
         print(f"   ✓ Top {len(results)} matches by semantic similarity:")
         for i, result in enumerate(results, 1):
@@ -201,7 +201,7 @@ class SemanticMenuSearch:
             # Check dietary restrictions
             tags = item.get('tags', [])
             if isinstance(tags, str):
-                tags = json.loads(tags)
+                tags = fastjson.loads(tags)
             
             if preferences.get('vegetarian') and 'non-vegetarian' in tags:
                 continue  # Skip non-vegetarian
@@ -0,0 +1,165 @@
+"""
+Session Store - Session metadata in Redis, live orchestrators in a bounded LRU
+
+Session metadata (user, orchestrator type) is small and goes to Redis as JSON
+under sess:{uuid} with a sliding TTL, so any worker can serve any session.
+Orchestrators hold LLM clients and DB connections and can't be serialized;
+each process keeps the most recently used ones and rebuilds the rest from
+their metadata on demand.
+
+Without REDIS_URL (or the redis package) metadata is kept in process memory,
+which behaves like the old per-process sessions dict.
+"""
+
+import logging
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from utils import fastjson
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.environ.get("REDIS_URL")
+SESSION_TTL = 30 * 60          # seconds of inactivity before a session expires
+MAX_LIVE_ORCHESTRATORS = 256   # per process
+
+
+class SessionStore:
+    """Looks sessions up in the local LRU first, then in Redis"""
+
+    def __init__(self, factory: Callable, redis_url: Optional[str] = REDIS_URL,
+                 ttl: int = SESSION_TTL, max_live: int = MAX_LIVE_ORCHESTRATORS):
+        """
+        Args:
+            factory: Builds an orchestrator from (orchestrator_type, user_id)
+            redis_url: Redis connection URL (None keeps metadata in memory)
+            ttl: Session lifetime in seconds, refreshed on every access
+            max_live: Orchestrators kept alive in this process
+        """
+        self.factory = factory
+        self.ttl = ttl
+        self.max_live = max_live
+        self._live = OrderedDict()   # session_id -> session dict
+        self._local_meta = {}        # session_id -> (expires_at, metadata)
+        self._lock = threading.Lock()
+
+        self._redis = None
+        if redis_url and REDIS_AVAILABLE:
+            pool = redis.ConnectionPool.from_url(redis_url, max_connections=32)
+            self._redis = redis.Redis(connection_pool=pool)
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self._redis is not None else "memory"
+
+    def create(self, session_id: str, orchestrator, user_id: int, orchestrator_type: str) -> Dict:
+        """Register a freshly built orchestrator under session_id"""
+        metadata = {'user_id': user_id, 'orchestrator_type': orchestrator_type}
+        self._save_metadata(session_id, metadata)
+        session = {'orchestrator': orchestrator, **metadata}
+        self._put_live(session_id, session)
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """
+        Session dict ({'orchestrator', 'user_id', 'orchestrator_type'}) or None
+
+        Blocking (Redis round trip, possibly an orchestrator rebuild) - call it
+        from the threadpool.
+        """
+        if not session_id:
+            return None
+
+        with self._lock:
+            session = self._live.get(session_id)
+            if session is not None:
+                self._live.move_to_end(session_id)
+
+        metadata = self._touch_metadata(session_id)
+        if metadata is None:
+            # Expired or unknown - drop any stale local orchestrator too
+            if session is not None:
+                self._drop_live(session_id)
+            return None
+        if session is not None:
+            return session
+
+        # Known session, but built by another worker or evicted here
+        orchestrator = self.factory(metadata['orchestrator_type'], metadata['user_id'])
+        return self._put_live(session_id, {'orchestrator': orchestrator, **metadata})
+
+    # ---- metadata ----
+
+    def _key(self, session_id: str) -> str:
+        return f"sess:{session_id}"
+
+    def _save_metadata(self, session_id: str, metadata: Dict):
+        if self._redis is not None:
+            self._redis.set(self._key(session_id), fastjson.dumps_bytes(metadata), ex=self.ttl)
+        else:
+            with self._lock:
+                self._local_meta[session_id] = (time.monotonic() + self.ttl, metadata)
+
+    def _touch_metadata(self, session_id: str) -> Optional[Dict]:
+        """Load metadata and slide its expiry forward"""
+        if self._redis is not None:
+            pipe = self._redis.pipeline()
+            pipe.get(self._key(session_id))
+            pipe.expire(self._key(session_id), self.ttl)
+            raw, _ = pipe.execute()
+            return fastjson.loads(raw) if raw else None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local_meta.get(session_id)
+            if entry is None:
+                return None
+            expires_at, metadata = entry
+            if expires_at < now:
+                del self._local_meta[session_id]
+                return None
+            self._local_meta[session_id] = (now + self.ttl, metadata)
+            return metadata
+
+    # ---- live orchestrators ----
+
+    def _put_live(self, session_id: str, session: Dict) -> Dict:
+        evicted = []
+        with self._lock:
+            existing = self._live.get(session_id)
+            if existing is not None:
+                # Another request rebuilt it first - keep theirs
+                evicted.append(session)
+                session = existing
+            else:
+                self._live[session_id] = session
+            self._live.move_to_end(session_id)
+            while len(self._live) > self.max_live:
+                _, old = self._live.popitem(last=False)
+                evicted.append(old)
+
+        for old in evicted:
+            self._close(old)
+        return session
+
+    def _drop_live(self, session_id: str):
+        with self._lock:
+            session = self._live.pop(session_id, None)
+        if session is not None:
+            self._close(session)
+
+    def _close(self, session: Dict):
+        """Release the orchestrator's DB connections and save its RL state"""
+        try:
+            session['orchestrator'].cleanup()
+        except Exception as e:
+            logger.warning("Session cleanup failed: %s", e)
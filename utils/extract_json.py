@@ -0,0 +1,50 @@
+"""
+JSON Object Extraction
+Single-pass scan for the largest balanced {...} object in model output
+
+Tracks nesting depth and string/escape state so braces inside strings are
+ignored and "{...} some commentary {...}" picks the right object instead of
+spanning both. A precompiled regex jumps straight between the characters that
+matter ({, }, ", and escape sequences), so ordinary text is skipped in C.
+"""
+
+import re
+
+_STRUCTURAL = re.compile(r'\\.|[{}"]', re.DOTALL)
+
+
+def extract_json(text):
+    """
+    Locate the largest balanced top-level JSON object
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        (start, end) slice bounds, or None if no complete object is present
+    """
+    best = None
+    depth = 0
+    start = 0
+    in_string = False
+
+    for match in _STRUCTURAL.finditer(text):
+        token = match.group()
+        if in_string:
+            if token == '"':
+                in_string = False
+        elif token == '"':
+            # Quotes in surrounding prose don't open strings
+            in_string = depth > 0
+        elif token == '{':
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif token == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                end = match.end()
+                if best is None or end - start > best[1] - best[0]:
+                    best = (start, end)
+
+    return best
@@ -0,0 +1,57 @@
+"""
+Fast Intent
+Answers bare greetings and obviously non-food requests without the LLM
+
+Returns the same dict shape the conversation agent produces, with the canned
+replies from its prompt examples. Rules are deliberately narrow: a greeting
+only matches when the message is nothing but a greeting ("hi there!", not
+"hi, I want biryani"), and an off-topic keyword only counts when the message
+mentions nothing food-related. Anything else goes to the conversation agent.
+"""
+
+import re
+
+_GREETING_RE = re.compile(
+    r"^\s*(?:hi|hello|hey|hiya|namaste|good (?:morning|afternoon|evening))"
+    r"(?:\s+there)?[\s!.,]*$",
+    re.IGNORECASE
+)
+_OFF_TOPIC_RE = re.compile(
+    r"\b(?:laptops?|computers?|smartphones?|iphones?|flights?|weather|stocks?|bitcoin|crypto|homework)\b",
+    re.IGNORECASE
+)
+_FOOD_RE = re.compile(
+    r"\b(?:food|eat|hungry|order|menu|dish|meal|snack|drink|restaurant|deliver|cart|recommend)",
+    re.IGNORECASE
+)
+
+GREETING_REPLY = (
+    "Hello! Welcome to our food ordering service! I'm here to help you discover "
+    "and order delicious meals. What are you in the mood for today?"
+)
+OUT_OF_DOMAIN_REPLY = (
+    "I apologize, but I'm specialized in food ordering only. I can help you find "
+    "delicious meals from nearby restaurants! Would you like to explore our menu "
+    "or get personalized food recommendations?"
+)
+
+
+def _result(user_input, intent, reply, domain_valid):
+    return {
+        "intent": intent,
+        "user_query": user_input,
+        "extracted_info": {},
+        "next_agent": "conversation_agent",
+        "conversational_response": reply,
+        "confidence": 1.0,
+        "domain_valid": domain_valid
+    }
+
+
+def match_fast_intent(user_input):
+    """Intent result for a greeting or clearly off-topic message, or None"""
+    if _GREETING_RE.match(user_input):
+        return _result(user_input, "greeting", GREETING_REPLY, True)
+    if _OFF_TOPIC_RE.search(user_input) and not _FOOD_RE.search(user_input):
+        return _result(user_input, "out_of_domain", OUT_OF_DOMAIN_REPLY, False)
+    return None
@@ -0,0 +1,97 @@
+"""
+Conversation History Eviction
+Bounds the history sent to the model without dropping load-bearing turns
+
+A plain history[-5:] slice can keep five chatty turns and lose the one that
+said what is in the cart. The pass below keeps a short recent window, shrinks
+the noise inside it, and pins the latest cart/order turns verbatim even when
+they have scrolled out of the window.
+
+Phases:
+    1. Failed responses collapse to a one-line marker
+    2. Long listings (recommendation bullets) older than the last two turns
+       keep only their first line
+    3. Everything outside the recent window is dropped...
+    4. ...except the last cart snapshot and the last order/restaurant turn,
+       and a leading rolling summary ({"role": "system"}), which is never
+       shrunk
+"""
+
+import re
+
+HISTORY_WINDOW = 5
+FULL_DETAIL_TURNS = 2  # user+assistant pairs kept untouched at the tail
+
+_FAILURE_RE = re.compile(r"^(?:error:|item not found|failed to)|not available", re.IGNORECASE)
+_CART_RE = re.compile(r"cart total|added \d+x|to cart", re.IGNORECASE)
+_ORDER_RE = re.compile(r"order #\d+|restaurant", re.IGNORECASE)
+
+
+def _content(message):
+    """Message text for either history shape ({role, content} or {user, agent})"""
+    if not isinstance(message, dict):
+        return str(message)
+    if "content" in message:
+        return message.get("content") or ""
+    return message.get("agent") or ""
+
+
+def _with_content(message, text):
+    """Copy of message with its text replaced"""
+    if "content" in message:
+        return {**message, "content": text}
+    return {**message, "agent": text}
+
+
+def _shrink(message, detailed):
+    """Phases 1-2 for a single message (unchanged messages are returned as-is)"""
+    if not isinstance(message, dict) or message.get("role") == "system":
+        return message
+    text = _content(message)
+    if _FAILURE_RE.search(text):
+        first_line = text.splitlines()[0] if text else ""
+        return _with_content(message, f"[failed: {first_line[:60]}]")
+    if not detailed and text.count("\n") > 2:
+        lines = text.splitlines()
+        return _with_content(message, f"{lines[0]} [+{len(lines) - 1} lines]")
+    return message
+
+
+def evict_history(messages, window=HISTORY_WINDOW):
+    """
+    Bound a conversation history for prompting
+
+    Args:
+        messages: Full history (any sequence of message dicts)
+        window: Number of most recent messages to keep
+
+    Returns:
+        list: Pinned older messages followed by the recent window, oldest first
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+
+    split = max(len(messages) - window, 0)
+    older, recent = messages[:split], messages[split:]
+
+    # Phase 4: pin the latest cart / order turns that fell out of the window
+    pinned = []
+    if older and not any(_CART_RE.search(_content(m)) for m in recent):
+        for index in range(len(older) - 1, -1, -1):
+            if _CART_RE.search(_content(older[index])):
+                pinned.append(index)
+                break
+    if older and not any(_ORDER_RE.search(_content(m)) for m in recent):
+        for index in range(len(older) - 1, -1, -1):
+            if _ORDER_RE.search(_content(older[index])):
+                if index not in pinned:
+                    pinned.append(index)
+                break
+
+    if older and isinstance(older[0], dict) and older[0].get("role") == "system" and 0 not in pinned:
+        pinned.append(0)
+
+    kept = [older[i] for i in sorted(pinned)] + recent
+    detailed_from = len(kept) - FULL_DETAIL_TURNS * 2
+    return [_shrink(m, i >= detailed_from) for i, m in enumerate(kept)]
@@ -0,0 +1,84 @@
+"""
+Streaming JSON Parser
+Pulls completed objects out of a JSON array while the model is still writing
+
+Fed one chunk at a time, it tracks string/escape state and nesting depth so
+each element of the target array (e.g. "recommendations") can be handed to
+the caller as soon as its closing brace arrives, instead of after the whole
+response has been generated.
+"""
+
+from utils import fastjson
+
+
+class StreamingJsonParser:
+    def __init__(self, array_key="recommendations"):
+        self.array_key = array_key
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key = None      # last string seen directly in the top-level object
+        self._array_depth = None   # depth of the target array once it is open
+        self._item_start = None    # index of the '{' of the element being read
+
+    @property
+    def text(self):
+        """Everything consumed so far"""
+        return self._text
+
+    def consume(self, chunk):
+        """
+        Feed the next chunk of model output
+
+        Args:
+            chunk: Newly generated text
+
+        Returns:
+            list: Array elements completed by this chunk (possibly empty)
+        """
+        self._text += chunk
+        text = self._text
+        completed = []
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start:i]
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif c == '{' or c == '[':
+                self._depth += 1
+                if (c == '[' and self._array_depth is None and self._depth == 2
+                        and self._last_key == self.array_key):
+                    self._array_depth = self._depth
+                elif (c == '{' and self._array_depth is not None
+                        and self._depth == self._array_depth + 1):
+                    self._item_start = i
+            elif c == '}' or c == ']':
+                if self._array_depth is not None:
+                    if c == '}' and self._item_start is not None and self._depth == self._array_depth + 1:
+                        try:
+                            completed.append(fastjson.loads(text[self._item_start:i + 1]))
+                        except fastjson.JSONDecodeError:
+                            pass  # malformed element - the final parse still sees it
+                        self._item_start = None
+                    elif c == ']' and self._depth == self._array_depth:
+                        self._array_depth = None
+                self._depth -= 1
+
+        self._pos = len(text)
+        return completed
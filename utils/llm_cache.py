@@ -0,0 +1,65 @@
+"""
+LLM Response Cache
+Process-wide LRU of parsed agent responses, keyed by a hash of the request
+
+Identical requests (same model, temperature and prompt inputs) skip the model
+call entirely. Only successfully parsed responses are stored, and entries are
+deep-copied in and out so callers can't mutate a cached entry (including its
+nested recommendations / extracted_info).
+"""
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    from blake3 import blake3 as _hasher
+except ImportError:
+    _hasher = hashlib.blake2b
+
+DEFAULT_MAXSIZE = 4096
+
+
+def make_key(*parts) -> str:
+    """Hash the request parts (model, temperature, prompt inputs...) into a cache key"""
+    return _hasher("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached response for key, or None"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        """Store a parsed response (error responses are not cached)"""
+        if not isinstance(result, dict) or "error" in result:
+            return
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by all agents in the process
+llm_cache = LLMCache()
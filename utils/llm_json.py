@@ -0,0 +1,51 @@
+"""
+LLM JSON Parsing
+Turns raw model output into a dict, repairing truncated or chatty JSON
+
+Models often wrap the JSON in prose, cut it off mid-object or leave a trailing
+comma. json_repair recovers a usable dict from all of those, so a slightly
+malformed answer no longer costs the user a retry.
+"""
+
+from utils import fastjson
+from utils.extract_json import extract_json
+
+try:
+    from json_repair import repair_json
+    JSON_REPAIR_AVAILABLE = True
+except ImportError:
+    JSON_REPAIR_AVAILABLE = False
+
+
+def _extract_json(text):
+    """Largest balanced {...} object in the text, parsed strictly"""
+    span = extract_json(text)
+    if span is None:
+        return fastjson.loads(text)
+    start, end = span
+    return fastjson.loads(text[start:end])
+
+
+def parse_llm_json(text):
+    """
+    Parse model output into a dict
+
+    Args:
+        text: Raw response text from the model
+
+    Returns:
+        dict: Parsed (and, if needed, repaired) JSON object
+
+    Raises:
+        ValueError: No JSON object could be recovered
+    """
+    try:
+        result = _extract_json(text)
+    except fastjson.JSONDecodeError:
+        if not JSON_REPAIR_AVAILABLE:
+            raise
+        result = repair_json(text, return_objects=True)
+
+    if not isinstance(result, dict):
+        raise ValueError(f"Expected a JSON object, got {type(result).__name__}")
+    return result
@@ -0,0 +1,56 @@
+"""
+Logging Setup
+Non-blocking logging: request threads enqueue records, one thread writes them
+
+A QueueHandler on the root logger only does a queue put on the caller's
+thread; a QueueListener drains the queue and does the actual stream I/O, so
+slow terminal/pipe writes never stall a request.
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listener = None
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues the record untouched
+
+    The stock prepare() formats the message and traceback on the caller's
+    thread so records can be pickled; the queue here never leaves the
+    process, so formatting (including logger.exception tracebacks) is left
+    to the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=None):
+    """
+    Route all logging through a background writer thread (idempotent)
+
+    Args:
+        level: Root log level (defaults to $LOG_LEVEL or INFO)
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers[:] = [_InProcessQueueHandler(log_queue)]
+    root.setLevel(level or os.environ.get("LOG_LEVEL", "INFO").upper())
@@ -0,0 +1,76 @@
+"""
+Menu Name Index
+Resolves a dish name from a user message to a menu row without a DB query
+
+Built over DatabaseManager.get_all_menu_items() (the process-wide menu
+cache) and rebuilt whenever that cache hands back a new list. Names are
+normalized to lowercase letters and digits, so "Chicken Tikka-Masala" and
+"chicken tikka masala" share a key.
+
+Lookup order:
+    1. Exact normalized name
+    2. First menu item whose name has every word of the query, in any
+       order ("masala dosa" finds "Dosa - Masala"), via a word index
+    3. First menu item whose normalized name contains the query
+    4. Closest spelling (difflib, cutoff 0.6)
+"""
+
+import difflib
+import re
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize_name(name):
+    return _NON_WORD_RE.sub('', name.lower())
+
+
+def _words(name):
+    return set(_WORD_RE.findall(name.lower()))
+
+
+class MenuNameIndex:
+    def __init__(self, db):
+        self.db = db
+        self._rows = None
+        self._by_name = {}
+        self._by_word = {}    # word -> positions in _rows, ascending
+
+    def _index(self):
+        rows = self.db.get_all_menu_items()
+        if rows is not self._rows:
+            by_name = {}
+            by_word = {}
+            for i, row in enumerate(rows):
+                # First item wins for duplicate names, like a LIMIT 1 query
+                by_name.setdefault(normalize_name(row['name']), row)
+                for word in _words(row['name']):
+                    by_word.setdefault(word, []).append(i)
+            self._rows, self._by_name, self._by_word = rows, by_name, by_word
+        return self._by_name
+
+    def _find_by_words(self, item_name):
+        """First row (menu order) whose name contains every word of item_name"""
+        postings = [self._by_word.get(word) for word in _words(item_name)]
+        if not postings or None in postings:
+            return None
+        postings.sort(key=len)
+        common = set(postings[0]).intersection(*postings[1:])
+        return self._rows[min(common)] if common else None
+
+    def find(self, item_name):
+        """Menu row for item_name, or None"""
+        key = normalize_name(item_name or '')
+        if not key:
+            return None
+        by_name = self._index()
+        item = by_name.get(key)
+        if item is None:
+            item = self._find_by_words(item_name)
+        if item is None:
+            item = next((row for name, row in by_name.items() if key in name), None)
+        if item is None:
+            close = difflib.get_close_matches(key, by_name.keys(), n=1, cutoff=0.6)
+            item = by_name[close[0]] if close else None
+        return item
@@ -0,0 +1,80 @@
+"""
+Ollama Request Batcher
+Coalesces async generate() calls that arrive within a few milliseconds
+
+Prompts submitted during a short window are dispatched together as concurrent
+requests, so with OLLAMA_NUM_PARALLEL >= K the Ollama scheduler can pack them
+into the same forward passes instead of serving them one after another.
+"""
+
+import asyncio
+import weakref
+
+from utils.ollama_client import make_async_client
+
+# Seconds to wait for more prompts after the first one arrives
+BATCH_WINDOW = 0.008
+
+
+class OllamaBatcher:
+    def __init__(self, window=BATCH_WINDOW):
+        self.window = window
+        self._client = make_async_client()
+        self._queue = asyncio.Queue()
+        self._worker = None
+        self._inflight = set()
+
+    async def submit(self, **request):
+        """
+        Queue one generate() request and wait for its response
+
+        Args:
+            **request: Keyword arguments for AsyncClient.generate (model, prompt, options, ...)
+
+        Returns:
+            The Ollama response for this request
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+        future = loop.create_future()
+        self._queue.put_nowait((future, request))
+        return await future
+
+    async def _run(self):
+        """Collect a window's worth of requests and fire them together"""
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.window)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Don't wait for this batch before opening the next window
+            for future, request in batch:
+                task = asyncio.create_task(self._dispatch(future, request))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, future, request):
+        try:
+            response = await self._client.generate(**request)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(response)
+
+
+# asyncio primitives and the async HTTP pool are bound to one event loop
+_batchers = weakref.WeakKeyDictionary()
+
+
+def get_batcher() -> OllamaBatcher:
+    """Batcher for the running event loop (created on first use)"""
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = OllamaBatcher()
+    return batcher
@@ -0,0 +1,84 @@
+"""
+Ollama Client Factory
+Builds ollama clients whose HTTP connections are kept alive across turns
+
+ollama-python wraps httpx; extra keyword arguments are passed straight to the
+httpx client, so each agent can hold one pooled client instead of going through
+the module-level ollama.generate() on every call.
+"""
+
+import logging
+import os
+import threading
+
+import httpx
+import ollama
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Generation can take minutes on CPU; connecting should not
+OLLAMA_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+OLLAMA_LIMITS = httpx.Limits(
+    max_keepalive_connections=40,
+    max_connections=100,
+    keepalive_expiry=30.0,
+)
+
+# Set LLM_MODEL to run every agent on one shared model (no model swapping)
+MODEL_ENV_VAR = "LLM_MODEL"
+
+logger = logging.getLogger(__name__)
+
+_warmed_models = set()
+_warmup_lock = threading.Lock()
+
+
+def resolve_model(model_name, default):
+    """Explicit model name, else $LLM_MODEL, else the agent's own default"""
+    return model_name or os.environ.get(MODEL_ENV_VAR) or default
+
+
+def make_client() -> ollama.Client:
+    """Sync client with a keep-alive connection pool (host from OLLAMA_HOST)"""
+    return ollama.Client(
+        timeout=OLLAMA_TIMEOUT,
+        limits=OLLAMA_LIMITS,
+        http2=HTTP2_AVAILABLE,
+    )
+
+
+def make_async_client() -> ollama.AsyncClient:
+    """Async client with a keep-alive connection pool (host from OLLAMA_HOST)"""
+    return ollama.AsyncClient(
+        timeout=OLLAMA_TIMEOUT,
+        limits=OLLAMA_LIMITS,
+        http2=HTTP2_AVAILABLE,
+    )
+
+
+def warmup_models(models):
+    """
+    Force-load each model once per process with a 1-token generation, so the
+    first user message doesn't pay the model load time. Failures are logged,
+    not raised.
+    """
+    with _warmup_lock:
+        pending = [m for m in models if m not in _warmed_models]
+        _warmed_models.update(pending)
+
+    if not pending:
+        return
+
+    client = make_client()
+    for model in pending:
+        try:
+            client.generate(model=model, prompt="", options={"num_predict": 1})
+            logger.info("Warmed up model %s", model)
+        except Exception as e:
+            with _warmup_lock:
+                _warmed_models.discard(model)
+            logger.warning("Warmup failed for model %s: %s", model, e)
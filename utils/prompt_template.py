@@ -0,0 +1,36 @@
+"""
+Compiled Prompt Templates
+Parse a str.format template once, then render by filling slots and joining
+
+str.format re-parses the (multi-kilobyte) prompt on every call. Here the
+literal segments are split out at import time and each render is a list copy,
+a few slot assignments and one join - with output identical to .format().
+"""
+
+from string import Formatter
+
+
+class CompiledPrompt:
+    def __init__(self, template: str):
+        self.template = template
+        self._parts = []    # literal text with None placeholders for fields
+        self._slots = []    # (index in _parts, field name)
+
+        for literal, field, format_spec, conversion in Formatter().parse(template):
+            if literal:
+                self._parts.append(literal)
+            if field is None:
+                continue
+            if format_spec or conversion or not field.isidentifier():
+                raise ValueError(f"Unsupported placeholder in prompt template: {{{field}}}")
+            self._slots.append((len(self._parts), field))
+            self._parts.append(None)
+
+        self.fields = frozenset(name for _, name in self._slots)
+
+    def render(self, **values) -> str:
+        """Same result as template.format(**values)"""
+        parts = self._parts.copy()
+        for index, name in self._slots:
+            parts[index] = str(values[name])
+        return "".join(parts)
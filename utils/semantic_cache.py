@@ -0,0 +1,115 @@
+"""
+Semantic Cache
+Reuses a parsed LLM response for a near-duplicate message ("show menu" /
+"show the menu"), matched by cosine similarity of sentence embeddings
+
+Embeddings come from Chroma's default embedding function (all-MiniLM-L6-v2
+via ONNX), so no extra model dependency is needed. Entries live in
+per-namespace buckets (e.g. one per user, since responses are
+personalized), each searched with a single matrix-vector product; the
+least recently written buckets are dropped past max_namespaces. Stored
+vectors are int8-quantized with one scale per vector (a quarter of the
+float32 size); the cosine error this adds is around 1e-3, far below the
+gap between the threshold and a miss. Without chromadb the cache is a
+no-op.
+"""
+
+import logging
+import threading
+
+import numpy as np
+
+try:
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+    EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    EMBEDDINGS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.92      # cosine similarity needed for a hit
+DEFAULT_MAX_PER_NAMESPACE = 256
+DEFAULT_MAX_NAMESPACES = 4096
+
+
+class SemanticCache:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_per_namespace=DEFAULT_MAX_PER_NAMESPACE,
+                 max_namespaces=DEFAULT_MAX_NAMESPACES):
+        self.threshold = threshold
+        self.max_per_namespace = max_per_namespace
+        self.max_namespaces = max_namespaces
+        self._buckets = {}    # namespace -> (int8 codes matrix, per-row scales, [values])
+        self._lock = threading.Lock()
+        self._embed_fn = None
+        self._disabled = not EMBEDDINGS_AVAILABLE
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, text):
+        """Unit-length embedding of the normalized text, or None if unavailable"""
+        if self._disabled:
+            return None
+        try:
+            if self._embed_fn is None:
+                self._embed_fn = DefaultEmbeddingFunction()
+            vector = np.asarray(self._embed_fn([" ".join(text.lower().split())])[0], dtype=np.float32)
+        except Exception as e:
+            # Model download/ONNX failures shouldn't break the request path
+            logger.warning("Semantic cache disabled: %s", e)
+            self._disabled = True
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, namespace, text):
+        """
+        (response, embedding) for text
+
+        response is a copy of the best cached entry above the threshold, or
+        None; pass the embedding back to store() to avoid encoding twice.
+        """
+        vector = self._embed(text)
+        if vector is None:
+            return None, None
+
+        with self._lock:
+            bucket = self._buckets.get(namespace)
+            if bucket is not None:
+                codes, scales, values = bucket
+                scores = (codes @ vector) * scales
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    return dict(values[best]), vector
+            self.misses += 1
+        return None, vector
+
+    def store(self, namespace, vector, result):
+        """Remember a parsed response (error responses are not cached)"""
+        if vector is None or not isinstance(result, dict) or "error" in result:
+            return
+        # Symmetric int8 codes; code * scale reconstructs the vector
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        code = np.round(vector / scale).astype(np.int8)
+        with self._lock:
+            codes, scales, values = self._buckets.pop(
+                namespace, (np.empty((0, vector.shape[0]), np.int8), np.empty(0, np.float32), [])
+            )
+            codes = np.vstack([codes, code])
+            scales = np.append(scales, np.float32(scale))
+            values = values + [dict(result)]
+            # Oldest entries go first
+            if len(values) > self.max_per_namespace:
+                codes, scales, values = codes[1:], scales[1:], values[1:]
+            # Re-inserted at the end, so the first bucket is the stalest
+            self._buckets[namespace] = (codes, scales, values)
+            if len(self._buckets) > self.max_namespaces:
+                del self._buckets[next(iter(self._buckets))]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Shared by all orchestrators in the process
+semantic_cache = SemanticCache()
@@ -5,6 +5,9 @@ Manages ChromaDB collections for temporary vector storage
 FIXED: Added get_conversation_history() method for context retrieval
 """
 
+import logging
+import threading
+
 import numpy as np
 
 # --- PATCH for NumPy 2.x backward compatibility ---
@@ -17,10 +20,27 @@ if not hasattr(np, "uint"):
 # --------------------------------------------------
 
 import chromadb
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
 from datetime import datetime
-import json
 from typing import List, Dict, Optional
 
+from utils import fastjson
+
+logger = logging.getLogger(__name__)
+
+# Menu documents embedded (and added) per batch when indexing
+INDEX_BATCH_SIZE = 256
+
+# HNSW settings for the menu collection. The embeddings are unit length,
+# so cosine ranks like inner product; M/construction_ef favour recall,
+# which is cheap at menu scale. Fixed when the collection is created.
+MENU_HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
 
 class ChromaDBManager:
     """
@@ -28,6 +48,10 @@ class ChromaDBManager:
     FIXED: Now includes get_conversation_history() for context retrieval
     """
 
+    # Process-wide instance handed out by get_shared()
+    _shared = None
+    _shared_lock = threading.Lock()
+
     def __init__(self, persist_directory: str = "./chroma_db"):
         """
         Initialize ChromaDB client (compatible with Chroma v0.5+)
@@ -45,20 +69,55 @@ class ChromaDBManager:
         )
 
         self.menu_collection = self._get_or_create_collection(
-            "menu_items", "Store menu items for semantic search"
+            "menu_items", "Store menu items for semantic search", MENU_HNSW_METADATA
         )
 
-        print(f"✅ Initialized ChromaDB at: {persist_directory}")
+        # Same model the collections embed documents with (created lazily)
+        self._embed_fn = None
+
+        logger.info("Initialized ChromaDB at %s", persist_directory)
+
+    @classmethod
+    def get_shared(cls) -> "ChromaDBManager":
+        """
+        The process-wide ChromaDBManager (default persist directory)
 
-    def _get_or_create_collection(self, name: str, description: str):
-        """Get existing collection or create new one"""
+        Sessions only read and add through the collection handles, so one
+        client and one loaded embedding model can serve them all.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def _embed(self, texts: List[str]) -> List:
+        """Embed texts with the collections' default embedding function"""
+        if self._embed_fn is None:
+            self._embed_fn = DefaultEmbeddingFunction()
+        return self._embed_fn(texts)
+
+    def _get_or_create_collection(self, name: str, description: str, index_metadata: Optional[Dict] = None):
+        """Get existing collection or create new one (index_metadata applies on create)"""
         try:
             return self.client.get_collection(name=name)
         except Exception:
             return self.client.create_collection(
-                name=name, metadata={"description": description}
+                name=name, metadata={"description": description, **(index_metadata or {})}
             )
 
+    def menu_index_outdated(self) -> bool:
+        """Whether the menu collection predates MENU_HNSW_METADATA's distance space"""
+        metadata = self.menu_collection.metadata or {}
+        return metadata.get("hnsw:space", "l2") != MENU_HNSW_METADATA["hnsw:space"]
+
+    def reset_menu_collection(self):
+        """Drop and recreate the (empty) menu collection with the current index settings"""
+        self.client.delete_collection(name="menu_items")
+        self.menu_collection = self._get_or_create_collection(
+            "menu_items", "Store menu items for semantic search", MENU_HNSW_METADATA
+        )
+
     # ============================================
     # CONVERSATION HISTORY STORAGE & RETRIEVAL
     # ============================================
@@ -95,7 +154,7 @@ class ChromaDBManager:
             ids=[doc_id],
         )
 
-        print(f"✓ Stored conversation: {doc_id}")
+        logger.debug("Stored conversation %s", doc_id)
 
     def get_conversation_history(
         self, user_id: int, session_id: str, limit: int = 5
@@ -149,11 +208,11 @@ class ChromaDBManager:
                     "timestamp": metadata.get("timestamp", "")
                 })
 
-            print(f"✓ Retrieved {len(history)} conversation turns from history")
+            logger.debug("Retrieved %d conversation turns from history", len(history))
             return history[-limit*2:]  # Return last limit messages
 
         except Exception as e:
-            print(f"⚠️ ChromaDB history retrieval failed: {e}")
+            logger.warning("ChromaDB history retrieval failed: %s", e)
             return []
 
     def get_relevant_conversations(
@@ -216,7 +275,7 @@ class ChromaDBManager:
             ids=[doc_id],
         )
 
-        print(f"✓ Stored preference: {preference_type}={preference_value} for user {user_id}")
+        logger.debug("Stored preference %s=%s for user %s", preference_type, preference_value, user_id)
 
     def get_user_preferences(
         self, user_id: int, preference_type: Optional[str] = None
@@ -244,7 +303,14 @@ class ChromaDBManager:
     # ============================================
 
     def index_menu_items(self, menu_items: List[Dict]):
-        """Index menu items for semantic search"""
+        """
+        Index menu items for semantic search
+
+        Documents are embedded and added INDEX_BATCH_SIZE at a time, which
+        keeps each add under Chroma's batch limit on large menus. Identical
+        documents (the same dish listed by several restaurants) are
+        embedded once.
+        """
         documents, metadatas, ids = [], [], []
 
         for item in menu_items:
@@ -262,15 +328,26 @@ class ChromaDBManager:
                 "restaurant_name": item.get("restaurant_name", ""),
                 "price": float(item.get("price", 0)),
                 "cuisine_type": item.get("cuisine_type", ""),
-                "tags": json.dumps(item.get("tags", [])),
+                "tags": fastjson.dumps(item.get("tags") or []),
             })
             ids.append(f"item_{item['item_id']}")
 
-        self.menu_collection.add(
-            documents=documents, metadatas=metadatas, ids=ids
-        )
+        unique_documents = list(dict.fromkeys(documents))
+        embedding_by_document = {}
+        for start in range(0, len(unique_documents), INDEX_BATCH_SIZE):
+            batch = unique_documents[start:start + INDEX_BATCH_SIZE]
+            embedding_by_document.update(zip(batch, self._embed(batch)))
+
+        for start in range(0, len(ids), INDEX_BATCH_SIZE):
+            end = start + INDEX_BATCH_SIZE
+            self.menu_collection.add(
+                documents=documents[start:end],
+                embeddings=[embedding_by_document[doc] for doc in documents[start:end]],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end],
+            )
 
-        print(f"✓ Indexed {len(menu_items)} menu items")
+        logger.info("Indexed %d menu items (%d unique embeddings)", len(menu_items), len(unique_documents))
 
     def search_menu_items(
         self,
@@ -297,7 +374,7 @@ class ChromaDBManager:
                 metadata = results["metadatas"][0][i]
 
                 try:
-                    tags = json.loads(metadata.get("tags", "[]"))
+                    tags = fastjson.loads(metadata.get("tags") or "[]")
                 except Exception:
                     tags = []
 
@@ -320,13 +397,52 @@ class ChromaDBManager:
 
         return items
 
+    def get_menu_embeddings(self, item_ids: List[int]) -> Dict[int, np.ndarray]:
+        """Stored embeddings for the given menu items (missing ones are skipped)"""
+        if not item_ids:
+            return {}
+        results = self.menu_collection.get(
+            ids=[f"item_{item_id}" for item_id in item_ids],
+            include=["embeddings"],
+        )
+        return {
+            int(doc_id[len("item_"):]): np.asarray(embedding, dtype=np.float32)
+            for doc_id, embedding in zip(results["ids"], results["embeddings"])
+        }
+
+    def query_menu_ids(
+        self,
+        query: str,
+        preference_embedding: Optional[np.ndarray] = None,
+        n_results: int = 50,
+    ) -> List[int]:
+        """
+        Approximate nearest-neighbour shortlist of menu item IDs
+
+        The query text is embedded and, when given, blended with a unit
+        preference vector so results lean toward what the user has picked
+        before.
+        """
+        vector = np.asarray(self._embed([query])[0], dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        if preference_embedding is not None:
+            vector = vector + preference_embedding
+            vector /= np.linalg.norm(vector) or 1.0
+
+        results = self.menu_collection.query(
+            query_embeddings=[vector.tolist()],
+            n_results=n_results,
+            include=[],
+        )
+        return [int(doc_id[len("item_"):]) for doc_id in results["ids"][0]]
+
     # ============================================
     # UTILITIES
     # ============================================
 
     def clear_session_data(self, session_id: str):
         """Clear all data for a session"""
-        print(f"⚠️ Manual session cleanup needed for session {session_id}")
+        logger.warning("Manual session cleanup needed for session %s", session_id)
 
     def get_collection_stats(self):
         """Get statistics about all collections"""
@@ -342,6 +458,6 @@ class ChromaDBManager:
             self.client.delete_collection("conversations")
             self.client.delete_collection("user_preferences")
             self.client.delete_collection("menu_items")
-            print("✓ All collections deleted")
+            logger.info("All collections deleted")
         except Exception as e:
-            print(f"Error deleting collections: {e}")
\ No newline at end of file
+            logger.error("Error deleting collections: %s", e)
\ No newline at end of file